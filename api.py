@@ -0,0 +1,202 @@
+# api.py
+"""Headless JSON prediction API sharing predictor.py with the Streamlit app.
+
+Run with:  python api.py --host 127.0.0.1 --port 8000
+
+Endpoints
+  GET  /health    -> {"status": "ok", "num_features": 60}
+  GET  /stats     -> prediction / contribution cache counters, micro-batching queue and audit log statistics
+  GET  /metrics   -> per-stage latency histograms in the Prometheus text format (see metrics.py)
+  POST /predict   single:  {"floor_area_sqm": 90, "storey_avg": 10, "sale_year": 2025, "sale_month": 6,
+                            "flat_type": "4 ROOM", "flat_model": "IMPROVED",
+                            "town": "TAMPINES", "lease_commence_date": 1990}
+                           (or "postal": "520123" in place of town / lease_commence_date)
+                  batch:   {"instances": [{...}, {...}]}
+
+Latency budget (server-side, excluding network), measured on one core with the bundled model:
+  single request                 p99 <= 25 ms
+  batch of up to 1,000 instances p99 <= 250 ms
+Requests that exceed their budget are logged at WARNING level; every response carries "latency_ms".
+Single requests on concurrent connections are merged into one booster call (batch_service.py).
+Every prediction, including rejected inputs, is appended to the audit log in the background (audit_log.py).
+"""
+import argparse
+import json
+import logging
+import signal
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import metrics
+import predictor
+from audit_log import AuditLog
+from batch_service import MicroBatchPredictor
+
+LATENCY_BUDGET_SINGLE_MS = 25.0
+LATENCY_BUDGET_BATCH_MS = 250.0
+MAX_BATCH_SIZE = 1000
+MAX_BODY_BYTES = 4 * 1024 * 1024
+
+logger = logging.getLogger("hdb_api")
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    price_predictor = None  # set by serve()
+    batch_service = None
+    audit_log = None
+    server_version = "HDBPricePredictor/1.0"
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_text(self, status, text, content_type):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok", "num_features": predictor.NUM_FEATURES})
+        elif self.path == "/stats":
+            self._send_json(200, {**self.price_predictor.cache_stats(), "batching": self.batch_service.stats(),
+                                  "audit_log": self.audit_log.stats()})
+        elif self.path == "/metrics":
+            self._send_text(200, metrics.STAGE_METRICS.render_prometheus(), metrics.PROMETHEUS_CONTENT_TYPE)
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        with metrics.stage("request"):
+            self._predict()
+
+    def _predict(self):
+        start = time.perf_counter()
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            self._send_json(400, {"error": "Content-Length must be an integer."})
+            return
+        if length < 0:
+            self._send_json(400, {"error": "Content-Length must not be negative."})
+            return
+        if length > MAX_BODY_BYTES:
+            self._send_json(413, {"error": f"Request body exceeds {MAX_BODY_BYTES} bytes."})
+            return
+        try:
+            payload = json.loads(self.rfile.read(length) or b"null")
+        except json.JSONDecodeError as e:
+            self._send_json(400, {"error": f"Invalid JSON: {e}"})
+            return
+        if not isinstance(payload, dict):
+            self._send_json(400, {"error": "Request body must be a JSON object."})
+            return
+
+        if "instances" in payload:
+            instances = payload["instances"]
+            if not isinstance(instances, list):
+                self._send_json(400, {"error": "'instances' must be a list."})
+                return
+            if len(instances) > MAX_BATCH_SIZE:
+                self._send_json(413, {"error": f"Batch size {len(instances)} exceeds limit of {MAX_BATCH_SIZE}."})
+                return
+            try:
+                predictions, errors = self.price_predictor.predict_records(instances)
+            except Exception as e:
+                # Invalid rows are reported per row above; this is the booster call itself failing
+                logger.exception("Batch prediction of %d row(s) failed", len(instances))
+                self.audit_log.record_batch("api", self.price_predictor.model_version, instances,
+                                            [None] * len(instances), [f"Prediction failed: {e}"] * len(instances),
+                                            (time.perf_counter() - start) * 1000.0)
+                self._send_json(500, {"error": f"Prediction failed: {e}"})
+                return
+            latency_ms = (time.perf_counter() - start) * 1000.0
+            self.audit_log.record_batch("api", self.price_predictor.model_version, instances, predictions, errors, latency_ms)
+            self._check_budget(latency_ms, LATENCY_BUDGET_BATCH_MS, len(instances))
+            self._send_json(200, {
+                "predictions": [{"predicted_price": p, "error": e} for p, e in zip(predictions, errors)],
+                "latency_ms": round(latency_ms, 3),
+            })
+        else:
+            try:
+                row = predictor.encode_record(payload, self.price_predictor.postal_data)
+                prediction = self.batch_service.predict_row(self.price_predictor, row)
+            except (ValueError, TypeError, OverflowError) as e:
+                self.audit_log.record("api", self.price_predictor.model_version, payload, None,
+                                      (time.perf_counter() - start) * 1000.0, error=str(e))
+                self._send_json(422, {"error": str(e)})
+                return
+            except Exception as e:
+                logger.exception("Prediction failed")
+                self.audit_log.record("api", self.price_predictor.model_version, payload, None,
+                                      (time.perf_counter() - start) * 1000.0, error=f"Prediction failed: {e}")
+                self._send_json(500, {"error": f"Prediction failed: {e}"})
+                return
+            latency_ms = (time.perf_counter() - start) * 1000.0
+            self.audit_log.record("api", self.price_predictor.model_version, payload, prediction, latency_ms)
+            self._check_budget(latency_ms, LATENCY_BUDGET_SINGLE_MS, 1)
+            self._send_json(200, {"predicted_price": prediction, "latency_ms": round(latency_ms, 3)})
+
+    def _check_budget(self, latency_ms, budget_ms, n_rows):
+        if latency_ms > budget_ms:
+            logger.warning("Prediction of %d row(s) took %.1f ms (budget %.0f ms)", n_rows, latency_ms, budget_ms)
+
+
+class PredictionServer(ThreadingHTTPServer):
+    request_queue_size = 128  # listen backlog; the default of 5 resets bursts of concurrent clients
+    daemon_threads = True
+
+
+def serve(host="127.0.0.1", port=8000, price_predictor=None, engine="xgboost"):
+    startup_timings = predictor.StartupTimings()
+    if price_predictor is None:
+        with startup_timings.phase("import ML libraries"):
+            predictor.import_dependencies(engine, frames=False)
+        with startup_timings.phase("load artifacts"):
+            price_predictor = predictor.HDBPricePredictor.from_files(engine=engine)
+    with startup_timings.phase("first predict (warm-up)"):
+        price_predictor.warm_up()
+    logger.info("Startup timings:\n%s", startup_timings.report())
+    PredictionHandler.price_predictor = price_predictor
+    PredictionHandler.batch_service = MicroBatchPredictor().start()
+    PredictionHandler.audit_log = AuditLog(postal_data=price_predictor.postal_data).start()
+    httpd = PredictionServer((host, port), PredictionHandler)
+    if threading.current_thread() is threading.main_thread():
+        # SIGTERM (docker stop) ends serve_forever like Ctrl+C, so the cleanup below still runs.
+        # shutdown() waits for serve_forever to return, so it must not run on the thread serving it.
+        signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(target=httpd.shutdown, daemon=True).start())
+    logger.info("Serving predictions on http://%s:%d", host, port)
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        PredictionHandler.batch_service.stop()
+        PredictionHandler.audit_log.stop()
+        logger.info("Stopped; audit log: %s", PredictionHandler.audit_log.stats())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HDB resale price prediction HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--engine", choices=["xgboost", "numpy"], default="xgboost",
+                        help="'numpy' serves from model_trees.npz (see tree_engine.py)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    serve(args.host, args.port, engine=args.engine)
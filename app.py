@@ -1,18 +1,27 @@
 # app.py
+import time
+_SCRIPT_START = time.perf_counter()
+
 import streamlit as st
 import numpy as np
-import pandas as pd
-import joblib
 import os
-import json
-import warnings
+from contextlib import nullcontext
 from datetime import datetime, timedelta
 from streamlit_option_menu import option_menu
 
-# XGBoost import
-import xgboost as xgb
+# pandas, altair and the ML libraries are imported where used so they stay off the first paint
+import predictor
+import metrics
+import market_matrix
+import model_registry
+from batch_service import MicroBatchPredictor
+from audit_log import AuditLog
+from postal_index import PostalIndex
+import transaction_store
+import map_clusters
+import styles
+_IMPORT_SECONDS = time.perf_counter() - _SCRIPT_START
 
-warnings.filterwarnings("ignore", category=UserWarning, message=".*Calling st.rerun().*")
 
 st.set_page_config(
     layout="wide",
@@ -21,12 +30,19 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+@st.cache_resource
+def load_startup_timings():
+    """Process-wide cold-start breakdown, shown in the sidebar and printed to the server log."""
+    return predictor.StartupTimings()
+
+startup_timings = load_startup_timings()
+startup_timings.record("import app modules", _IMPORT_SECONDS)
+
 # Initialize theme state
 if 'theme' not in st.session_state:
     st.session_state.theme = 'light'
 
-PAGE_OPTIONS_LIST = ["Make Prediction", "Transaction Map", "About"]
-DATA_INGESTION_DATE = "16-06-2025"
+PAGE_OPTIONS_LIST = ["Make Prediction", "Market Overview", "Transaction Map", "About"]
 
 if 'active_page' not in st.session_state:
     st.session_state.active_page = PAGE_OPTIONS_LIST[0]
@@ -41,262 +57,288 @@ def toggle_theme():
     else:
         st.session_state.theme = 'light'
 
+# Callbacks run before the script, so the menu below is already drawn with the predictor selected
+def return_to_predictor():
+    st.session_state.active_page = PAGE_OPTIONS_LIST[0]
+    st.session_state.menu_key_counter += 1
+
 current_theme = st.session_state.theme
-theme_colors = {
-    'light': {
-        'bg': '#FFFFFF', 'text': '#000000', 'primary': '#1E88E5', 'secondary': '#0D47A1',
-        'success': '#43A047', 'info_bg': '#E3F2FD', 'info_text': '#000000',
-        'info_border': '#1E88E5', 'prediction_bg': '#E8F5E9', 'prediction_border': '#43A047',
-        'sidebar_bg': '#F0F2F6', 'sidebar_text': '#000000'
-    },
-    'dark': {
-        'bg': '#121212', 'text': '#FFFFFF', 'primary': '#90CAF9', 'secondary': '#64B5F6',
-        'success': '#81C784', 'info_bg': '#0A1929', 'info_text': '#E1E1E1',
-        'info_border': '#90CAF9', 'prediction_bg': '#0A2018', 'prediction_border': '#81C784',
-        'sidebar_bg': '#1E1E1E', 'sidebar_text': '#FFFFFF'
-    }
-}
-colors = theme_colors[current_theme]
-
-hide_streamlit_style = f"""
-<style>
-#MainMenu {{visibility: hidden;}}
-footer {{visibility: hidden;}}
-header {{visibility: hidden;}}
-
-.stApp {{
-    max-width: 1200px;
-    margin: 0 auto;
-    background-color: {colors['bg']};
-    color: {colors['text']};
-}}
-
-/* Sidebar Styling */
-[data-testid="stSidebar"] {{
-    background-color: {colors['sidebar_bg']};
-}}
-[data-testid="stSidebar"] [data-testid="stMarkdownContainer"] p,
-[data-testid="stSidebar"] [data-testid="stMarkdownContainer"] h3 {{ 
-    color: {colors['sidebar_text']} !important;
-}}
-[data-testid="stSidebar"] .stButton > button {{ 
-    color: {colors['sidebar_text']} !important; 
-}}
-[data-testid="stSidebar"] div[data-testid="stToggle"] span {{
-    color: {colors['sidebar_text']} !important;
-}}
-[data-testid="stSidebar"] div[data-testid="stToggle"] label {{
-    color: {colors['sidebar_text']} !important;
-}}
-
-@media (max-width: 768px) {{
-    .stApp {{ padding: 10px; }}
-    .main-header {{ font-size: 24px !important; }}
-    .sub-header {{ font-size: 18px !important; }}
-}}
-.main-header {{ color: {colors['primary']}; font-size: 36px; font-weight: 700; }}
-.sub-header {{ color: {colors['secondary']}; font-size: 22px; font-weight: 600; }}
-.info-box {{
-    background-color: {colors['info_bg']}; color: {colors['info_text']};
-    padding: 15px; border-radius: 10px; border-left: 5px solid {colors['info_border']};
-    margin-bottom: 20px;
-}}
-.prediction-card {{
-    background-color: {colors['prediction_bg']}; padding: 20px; border-radius: 10px;
-    text-align: center; margin: 20px 0; border-left: 5px solid {colors['prediction_border']};
-    box-shadow: 0 4px 6px rgba(0,0,0,0.1); color: {colors['text']};
-}}
-.stMarkdown, body {{ color: {colors['text']} !important; }}
-
-/* Labels for input widgets */
-.stTextInput label, 
-.stNumberInput label, 
-.stSelectbox label, 
-.stDateInput label,
-.stTimeInput label,
-.stMultiSelect label,
-.stTextArea label,
-.stRadio label,
-.stCheckbox label {{
-    color: {colors['text']} !important;
-}}
-div[data-testid="stCheckbox"] label div[data-testid="stMarkdownContainer"] p {{
-    color: {colors['text']} !important;
-}}
-
-.stTextInput div[data-baseweb="input"] > input,
-.stNumberInput div[data-baseweb="input"] > input,
-.stTextArea div[data-baseweb="input"] > textarea {{
-    color: {colors['text']} !important;
-    background-color: {colors['bg']} !important; 
-    border: 1px solid {colors['secondary']} !important; 
-}}
-.stSelectbox div[data-baseweb="select"] > div,
-.stMultiSelect div[data-baseweb="select"] > div {{
-    color: {colors['text']} !important;
-    background-color: {colors['bg']} !important;
-    border: 1px solid {colors['secondary']} !important;
-}}
-div[data-baseweb="popover"] ul li {{
-    background-color: {colors['bg']} !important;
-    color: {colors['text']} !important;
-}}
-div[data-baseweb="popover"] ul li:hover {{
-    background-color: {colors['secondary']} !important;
-    color: {'#FFFFFF' if current_theme == 'dark' else '#000000'} !important;
-}}
-.stButton > button {{
-    color: {'#FFFFFF' if colors['primary'] not in ['#FFFFFF', '#E1E1E1', '#f0f2f6'] else '#000000'} !important; 
-    background-color: {colors['primary']} !important;
-    border: 1px solid {colors['primary']} !important;
-}}
-.stButton > button:hover {{
-    background-color: {colors['secondary']} !important;
-    border: 1px solid {colors['secondary']} !important;
-}}
-.stButton > button:focus {{
-    box-shadow: 0 0 0 0.2rem {colors['primary']}40 !important;
-}}
-div[data-testid="stOptionMenu"] button {{
-    color: {colors['text']} !important; 
-    border-bottom: 2px solid transparent; 
-    border-radius: 0 !important; 
-    margin-right: 2px; 
-    padding: 10px 15px;
-}}
-div[data-testid="stOptionMenu"] button:hover {{
-    color: {colors['primary']} !important; 
-    background-color: transparent !important; 
-}}
-div[data-testid="stOptionMenu"] button[aria-selected="true"] {{
-    color: {colors['primary']} !important; 
-    border-bottom-color: {colors['primary']} !important; 
-    font-weight: bold;
-}}
-@media (max-width: 768px) {{
-    .stApp {{ padding: 10px; }}
-    .main-header {{ font-size: 24px !important; }}
-    .sub-header {{ font-size: 18px !important; }}
-    .mobile-return-button-container {{
-        position: fixed; bottom: 20px; right: 20px; z-index: 10000;
-    }}
-    .mobile-return-button-container div[data-testid="stButton"] > button {{
-        border-radius: 50%; width: 50px; height: 50px; padding: 0; font-size: 22px; 
-        line-height: 50px; text-align: center; 
-        background-color: {colors['primary']} !important; color: white !important; 
-        border: none; box-shadow: 0 4px 8px rgba(0,0,0,0.2);
-    }}
-    .mobile-return-button-container div[data-testid="stButton"] > button:hover {{
-        background-color: {colors['secondary']} !important;
-    }}
-    div[data-testid="stOptionMenu"] {{
-        display: flex !important;
-        flex-wrap: wrap !important; 
-        justify-content: space-around !important; 
-        width: 100% !important;
-        padding-bottom: 5px;
-    }}
-    div[data-testid="stOptionMenu"] button {{
-        font-size: 0.8rem !important;
-        padding: 8px 5px !important;
-        margin: 2px !important; 
-        flex-grow: 1;
-        flex-basis: auto;
-        min-width: calc(33% - 10px);
-        text-align: center;
-        line-height: 1.2;
-    }}
-}}
-@media (min-width: 769px) {{
-    .mobile-return-button-container {{ display: none; }}
-}}
-</style>
-"""
-st.markdown(hide_streamlit_style, unsafe_allow_html=True)
+colors = styles.THEME_COLORS[current_theme]
+st.markdown(styles.stylesheet(current_theme), unsafe_allow_html=True)
 
 # --- Configuration & Helper Functions ---
-SCALER_PATH = "scaler.joblib"
-POSTAL_DATA_PATH = "postal_data.json"
-MODEL_LOCAL_PATH = "model.bst"
-MODEL_TYPE = "XGBoost (Locally Loaded)"
-FEATURE_NAMES = ['floor_area_sqm', 'postal', 'storey_avg', 'sale_year', 'sale_month', 'remaining_lease_years', 'flat_type_1 ROOM', 'flat_type_2 ROOM', 'flat_type_3 ROOM', 'flat_type_4 ROOM', 'flat_type_5 ROOM', 'flat_type_EXECUTIVE', 'flat_type_MULTI-GENERATION', 'flat_model_2-ROOM', 'flat_model_3GEN', 'flat_model_ADJOINED FLAT', 'flat_model_APARTMENT', 'flat_model_DBSS', 'flat_model_IMPROVED', 'flat_model_IMPROVED-MAISONETTE', 'flat_model_MAISONETTE', 'flat_model_MODEL A', 'flat_model_MODEL A-MAISONETTE', 'flat_model_MODEL A2', 'flat_model_MULTI GENERATION', 'flat_model_NEW GENERATION', 'flat_model_PREMIUM APARTMENT', 'flat_model_PREMIUM APARTMENT LOFT', 'flat_model_PREMIUM MAISONETTE', 'flat_model_SIMPLIFIED', 'flat_model_STANDARD', 'flat_model_TERRACE', 'flat_model_TYPE S1', 'flat_model_TYPE S2', 'town_ANG MO KIO', 'town_BEDOK', 'town_BISHAN', 'town_BUKIT BATOK', 'town_BUKIT MERAH', 'town_BUKIT PANJANG', 'town_BUKIT TIMAH', 'town_CENTRAL AREA', 'town_CHOA CHU KANG', 'town_CLEMENTI', 'town_GEYLANG', 'town_HOUGANG', 'town_JURONG EAST', 'town_JURONG WEST', 'town_KALLANG/WHAMPOA', 'town_MARINE PARADE', 'town_PASIR RIS', 'town_PUNGGOL', 'town_QUEENSTOWN', 'town_SEMBAWANG', 'town_SENGKANG', 'town_SERANGOON', 'town_TAMPINES', 'town_TOA PAYOH', 'town_WOODLANDS', 'town_YISHUN']
+SCALER_PATH = predictor.SCALER_PATH
+POSTAL_DATA_PATH = predictor.POSTAL_DATA_PATH
+MODEL_LOCAL_PATH = predictor.MODEL_LOCAL_PATH
+FEATURE_NAMES = predictor.FEATURE_NAMES
 
 if len(FEATURE_NAMES) != 60:
     st.error(f"Feature count mismatch! Expected 60 but got {len(FEATURE_NAMES)}")
-NUM_FEATURES = len(FEATURE_NAMES)
+NUM_FEATURES = predictor.NUM_FEATURES
 
 
-@st.cache_resource
-def load_xgboost_model_local():
-    try:
-        if not os.path.exists(MODEL_LOCAL_PATH):
-            st.error(f"Model file not found at {MODEL_LOCAL_PATH}. Please ensure it's in the same directory as app.py.")
-            return None
-        
-        xgb_model = xgb.Booster()
-        xgb_model.load_model(MODEL_LOCAL_PATH)
-        
-        # Optional: Debug model features
-        try:
-            num_model_features = xgb_model.num_features()
-            if num_model_features != NUM_FEATURES:
-                st.warning(f"Model feature count ({num_model_features}) does not match expected ({NUM_FEATURES}). This WILL cause errors.")
-        except Exception as e_feat:
-            st.warning(f"DEBUG: Could not get feature count from model: {e_feat}")
-
-        return xgb_model
-    except Exception as e:
-        st.error(f"Error loading local XGBoost model ({MODEL_LOCAL_PATH}): {e}")
-        return None
-
-def extract_categories(prefix, feature_list):
-    categories = [feature[len(prefix):] for feature in feature_list if feature.startswith(prefix)]
-    return sorted(categories)
+@st.cache_resource(show_spinner=False)
+def import_ml_libraries():
+    with startup_timings.phase("import ML libraries"):
+        predictor.import_dependencies()
 
-FLAT_TYPES = extract_categories("flat_type_", FEATURE_NAMES)
-FLAT_MODELS = extract_categories("flat_model_", FEATURE_NAMES)
-TOWNS = extract_categories("town_", FEATURE_NAMES)
+FLAT_TYPES = predictor.FLAT_TYPES
+FLAT_MODELS = predictor.FLAT_MODELS
+TOWNS = predictor.TOWNS
 
 current_date = datetime.now()
 FUTURE_YEARS = list(range(current_date.year - 10, current_date.year + 10))
-MONTHS = ["January", "February", "March", "April", "May", "June",
-          "July", "August", "September", "October", "November", "December"]
-MONTH_TO_NUM = {month: i + 1 for i, month in enumerate(MONTHS)}
+MONTHS = predictor.MONTHS
+MONTH_TO_NUM = predictor.MONTH_TO_NUM
 
 def sqm_to_sqft(sqm): return sqm * 10.7639
 def sqft_to_sqm(sqft): return sqft / 10.7639
 
-@st.cache_resource
-def load_scaler():
-    try:
-        if not os.path.exists(SCALER_PATH):
-            st.error(f"Scaler file not found at {SCALER_PATH}. Please ensure it's in the same directory as app.py.")
-            st.stop() 
-        return joblib.load(SCALER_PATH)
-    except Exception as e: st.error(f"Error loading scaler ({SCALER_PATH}): {e}"); st.stop()
-
 @st.cache_resource
 def load_postal_data():
     try:
-        if not os.path.exists(POSTAL_DATA_PATH):
+        if not os.path.exists(POSTAL_DATA_PATH) and not os.path.exists(predictor.POSTAL_INDEX_PATH):
             st.error(f"Postal data file not found at {POSTAL_DATA_PATH}. Please ensure it's in the same directory as app.py.")
             return {} 
-        with open(POSTAL_DATA_PATH, 'r') as f: return json.load(f)
+        with startup_timings.phase("load postal data"):
+            return predictor.load_postal_data(POSTAL_DATA_PATH)
     except Exception as e: st.error(f"Error loading postal data ({POSTAL_DATA_PATH}): {e}"); return {}
 
+@st.cache_resource
+def load_model_registry(_postal_data):
+    """Load the newest valid bundle from model_registry/ (or model.bst + scaler.joblib when it is empty),
+    then keep polling for new versions in the background. Loading includes a warm-up prediction."""
+    registry = model_registry.ModelRegistry(postal_data=_postal_data)
+    registry.check(timings=startup_timings)
+    registry.start()
+    print(f"Startup timings:\n{startup_timings.report()}", flush=True)
+    return registry
+
+@st.cache_resource
+def load_batch_service():
+    """One queue for every session: concurrent single predictions are merged into one booster call."""
+    return MicroBatchPredictor().start()
+
+@st.cache_resource
+def load_audit_log(_postal_data):
+    """One background writer for every session: each prediction is queued and appended to audit_log/ in batches."""
+    return AuditLog(postal_data=_postal_data).start()
+
+@st.cache_resource
+def start_metrics_server():
+    """Serve the per-stage latency histograms at http://127.0.0.1:$HDB_METRICS_PORT/metrics when the variable is set."""
+    port = os.environ.get("HDB_METRICS_PORT")
+    if not port:
+        return None
+    try:
+        return metrics.start_http_server(int(port))
+    except (OSError, ValueError) as e:
+        print(f"Metrics endpoint not started on port {port}: {e}", flush=True)
+        return None
+
+@st.cache_resource
+def freeze_startup_heap():
+    """With HDB_GC_FREEZE=1, move everything loaded at startup (libraries, model, postal data) out of the
+    garbage collector's view. Returns the number of frozen objects, 0 when not enabled.
+
+    Streamlit runs gc.collect() after every script and fragment run. Without this, each of those walks
+    the whole startup heap, which takes about 0.1 s on one core however little the run did. It is opt-in
+    because it affects the whole process: frozen objects are never collected, so reference cycles in a
+    model that a registry hot swap later replaces stay in memory."""
+    if os.environ.get("HDB_GC_FREEZE") != "1":
+        return 0
+    import gc
+    gc.collect()
+    gc.freeze()
+    return gc.get_freeze_count()
+
 # --- Load resources ---
-scaler = load_scaler()
-postal_data = load_postal_data()
-xgb_model_loaded = load_xgboost_model_local() 
+# The header goes out before the ML libraries and model load, so a cold start paints the page
+# straight away and shows a spinner instead of a blank tab for the ~2 s those take
+st.markdown('<h1 class="main-header">HDB Resale Price Predictor</h1>', unsafe_allow_html=True)
+cold_start = "import ML libraries" not in startup_timings.phases
+with st.spinner("Loading the price model...") if cold_start else nullcontext():
+    import_ml_libraries()
+    postal_data = load_postal_data()
+    registry = load_model_registry(postal_data)
+# Read once per run: a background swap takes effect on the next full rerun, never mid-run (fragment reruns keep the last one)
+price_predictor, active_bundle = registry.active()
+batch_service = load_batch_service()
+audit_log = load_audit_log(postal_data)
+metrics_server = start_metrics_server()
+startup_heap_objects = freeze_startup_heap()
+xgb_model_loaded = price_predictor.model if price_predictor is not None else None
+if price_predictor is None:
+    for version, error in registry.rejected.items():
+        st.error(f"Error loading model version {version}: {error}")
+MODEL_TYPE = active_bundle.model_type if active_bundle else model_registry.DEFAULT_MODEL_TYPE
+DATA_INGESTION_DATE = active_bundle.data_ingestion_date if active_bundle else "unknown"
+MODEL_VERSION = active_bundle.version if active_bundle else "unavailable"
 
 def validate_postal_code(postal_code):
-    if not postal_code or not postal_code.isdigit() or len(postal_code) != 6:
-        return None, "Please enter a valid 6-digit postal code."
-    if not postal_data:
-        return None, "Postal code database not loaded. Cannot validate."
-    if postal_code not in postal_data:
-        return None, f"Postal code {postal_code} not found in our database."
-    return postal_data[postal_code][0], None
+    return predictor.validate_postal_code(postal_code, postal_data)
+
+def prediction_input_error(use_postal, postal_code):
+    """Message for the first form problem that blocks a prediction, or None."""
+    if use_postal and st.session_state.postal_validation_error:
+        return "Please enter a valid postal code before making a prediction."
+    if use_postal and not postal_code:
+        return "Postal code is enabled but not entered. Please enter a postal code."
+    if not st.session_state.selected_town and not use_postal:
+        return "Please select a town."
+    if not st.session_state.selected_town and use_postal and not postal_code:
+        return "Please enter a postal code so town can be auto-filled."
+    if xgb_model_loaded is None:
+        return "Model is not available. Prediction cannot be made. Please ensure 'model.bst' is in the correct location and check application logs."
+    return None
+
+@st.cache_resource
+def load_transaction_store():
+    """Memory-mapped transactions.bin, opened on the first map page visit after it has been built.
+
+    Raises FileNotFoundError until then. Exceptions are not cached, so a store built while the
+    app runs is picked up on the next visit; rebuilding one that is already open needs a restart."""
+    if not os.path.exists(transaction_store.TRANSACTION_STORE_PATH):
+        raise FileNotFoundError(f"No transaction store at {transaction_store.TRANSACTION_STORE_PATH}.")
+    with metrics.stage("load_transaction_store"):
+        return transaction_store.TransactionStore.open(transaction_store.TRANSACTION_STORE_PATH)
+
+@st.cache_resource
+def load_cluster_index(_txn_store):
+    """Per-zoom cluster grids over the store's postal code positions, priced by each code's recent median."""
+    with metrics.stage("load_cluster_index"):
+        labels = [f"{code:06d}" for code in _txn_store.postal.tolist()]
+        towns = [(postal_data.get(label) or [{"town": None}])[0]["town"] for label in labels]
+        return map_clusters.ClusterIndex(labels, _txn_store.latitude, _txn_store.longitude,
+                                         _txn_store.recent_median_prices(), np.diff(_txn_store.offsets.astype(np.int64)),
+                                         groups=towns)
+
+MAP_ALL_TOWNS = "All of Singapore"
+MAP_TOWN_ZOOM = 14
+MAP_DEFAULT_ZOOM = map_clusters.MIN_ZOOM + 1
+MAP_PRICE_RANGE = (300_000, 1_200_000)  # colour ramp from blue (low) to red (high)
+
+def focus_map_on_postal():
+    if st.session_state.map_postal_input.strip():
+        st.session_state.map_zoom = map_clusters.MARKER_ZOOM
+
+def focus_map_on_town():
+    st.session_state.map_zoom = MAP_DEFAULT_ZOOM if st.session_state.map_centre == MAP_ALL_TOWNS else MAP_TOWN_ZOOM
+
+def map_price_colour(price):
+    if price is None:
+        return [150, 150, 150, 200]
+    t = min(max((price - MAP_PRICE_RANGE[0]) / (MAP_PRICE_RANGE[1] - MAP_PRICE_RANGE[0]), 0.0), 1.0)
+    return [int(30 + 199 * t), int(136 - 79 * t), int(229 - 176 * t), 210]
+
+def cluster_map_deck(kind, rows, latitude, longitude, zoom, highlight=None):
+    """pydeck map of the clusters or markers returned by ClusterIndex.query(), without a basemap (works offline).
+
+    Rows carry only what the layers draw, with positions rounded to about a metre, and the
+    spec is sent minified (pydeck indents it, which doubles the payload)."""
+    import json
+    import pydeck as pdk
+
+    points = []
+    for row in rows:
+        price = row["median_price"]
+        point = {"position": [round(row["longitude"], 5), round(row["latitude"], 5)], "fill": map_price_colour(price),
+                 "price": f"S$ {price:,.0f}" if price is not None else "no transactions"}
+        if kind == "clusters":
+            point.update(radius=min(32, 8 + int(4 * np.log2(row["count"]))), count=f"{row['count']:,}")
+        else:
+            point.update(radius=7, postal=row["postal"], count=f"{row['transactions']:,}")
+        points.append(point)
+    layers = [pdk.Layer("ScatterplotLayer", points, get_position="position", get_fill_color="fill", get_radius="radius",
+                        radius_units="pixels", pickable=True, stroked=True, get_line_color=[255, 255, 255],
+                        line_width_min_pixels=1)]
+    if kind == "clusters":
+        layers.append(pdk.Layer("TextLayer", [{"position": p["position"], "count": p["count"]} for p in points],
+                                get_position="position", get_text="count", get_size=12, get_color=[255, 255, 255]))
+        tooltip = "<b>{count}</b> postal code(s)<br/>Median price {price}"
+    else:
+        tooltip = f"<b>{{postal}}</b><br/>{{count}} transactions<br/>Median of latest {transaction_store.DEFAULT_LATEST}: {{price}}"
+    if highlight is not None:
+        layers.append(pdk.Layer("ScatterplotLayer", [{"position": [highlight[1], highlight[0]]}], get_position="position",
+                                get_radius=12, radius_units="pixels", filled=False, stroked=True,
+                                get_line_color=[int(colors['primary'][i:i + 2], 16) for i in (1, 3, 5)],
+                                line_width_min_pixels=3))
+    deck = pdk.Deck(layers=layers, map_style=None, height=map_clusters.VIEWPORT_PIXELS[1],
+                    initial_view_state=pdk.ViewState(latitude=latitude, longitude=longitude, zoom=zoom),
+                    tooltip={"html": tooltip})
+    spec = json.dumps(json.loads(deck.to_json()), separators=(",", ":"))
+    deck.to_json = lambda: spec  # st.pydeck_chart sends whatever to_json() returns
+    return deck
+
+POSTAL_SUGGESTION_LIMIT = 10
+
+@st.cache_resource
+def load_postal_suggester(_postal_data):
+    if isinstance(_postal_data, PostalIndex):
+        return _postal_data
+    return PostalIndex.from_postal_data(_postal_data) if _postal_data else None
+
+postal_suggester = load_postal_suggester(postal_data)
+
+def apply_postal_suggestion():
+    chosen = st.session_state.postal_suggestion_select
+    if chosen:
+        st.session_state.postal_code_input = chosen
+    st.session_state.postal_suggestion_select = None
+
+# Sensitivity grid spans the floor area and storey widget ranges
+SENSITIVITY_FLOOR_AREAS = np.arange(20.0, 300.0 + 1, 5.0)
+SENSITIVITY_STOREYS = np.arange(1.0, 50.0 + 1, 1.0)
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def compute_sensitivity_grid(model_version, town, flat_type, flat_model, sale_year, sale_month, lease_commencement_year, postal_code):
+    """Long-form (floor_area_sqm, storey_avg, predicted_price) frame, cached per model version and
+    unit/sale-date key so moving the floor area or storey inputs does not rescore the grid."""
+    grid = price_predictor.predict_area_storey_grid(
+        SENSITIVITY_FLOOR_AREAS, SENSITIVITY_STOREYS,
+        sale_year=sale_year, sale_month=sale_month, lease_commencement_year=lease_commencement_year,
+        town=town, flat_type=flat_type, flat_model=flat_model, postal_code=postal_code
+    )
+    import pandas as pd
+    area_grid, storey_grid = np.meshgrid(SENSITIVITY_FLOOR_AREAS, SENSITIVITY_STOREYS)
+    return pd.DataFrame({"floor_area_sqm": area_grid.ravel(), "storey_avg": storey_grid.ravel(), "predicted_price": grid.ravel()})
+
+@st.cache_resource
+def sensitivity_chart_spec():
+    """Vega-Lite spec of the sensitivity heatmap and its marker, built with Altair once per process.
+
+    Every input change reruns the grid, and Altair's to_dict() of a 2,850-cell chart costs tens of ms.
+    The grid frame is passed separately (sent as Arrow), and each run only sets the marker's filter."""
+    import altair as alt
+    heatmap = alt.Chart().mark_rect().encode(
+        x=alt.X("floor_area_sqm:O", title="Floor Area (sqm)", axis=alt.Axis(values=SENSITIVITY_FLOOR_AREAS[::4].tolist())),
+        y=alt.Y("storey_avg:O", title="Storey (Average)", sort="descending", axis=alt.Axis(values=SENSITIVITY_STOREYS[::5].tolist())),
+        color=alt.Color("predicted_price:Q", title="Price (S$)", scale=alt.Scale(scheme="viridis")),
+        tooltip=[alt.Tooltip("floor_area_sqm:Q", title="Floor Area (sqm)"), alt.Tooltip("storey_avg:Q", title="Storey"),
+                 alt.Tooltip("predicted_price:Q", title="Price (S$)", format=",.0f")]
+    )
+    marker = alt.Chart().mark_point(shape="diamond", size=120, color="red", filled=True).encode(
+        x="floor_area_sqm:O", y=alt.Y("storey_avg:O", sort="descending")
+    )
+    spec = (heatmap + marker).to_dict()
+    spec.pop("datasets", None)  # Altair's placeholder for the missing data; both layers use the frame passed in
+    for layer in spec["layer"]:
+        layer.pop("data", None)
+    return spec
+
+@st.cache_data(max_entries=4, show_spinner="Updating market overview...")
+def load_market_snapshot(model_version, sale_year, sale_month):
+    """Read the precomputed matrix for this model version and month, refreshing only stale cells if needed."""
+    snapshot = market_matrix.get_snapshot(market_matrix.load_store(), model_version, sale_year, sale_month)
+    if snapshot is None:
+        snapshot, _ = market_matrix.refresh(price_predictor, sale_year, sale_month)
+    return snapshot
+
+def read_bulk_file(uploaded_file):
+    import pandas as pd
+    if uploaded_file.name.lower().endswith(".parquet"):
+        return pd.read_parquet(uploaded_file)
+    return pd.read_csv(uploaded_file, dtype={'postal': str})
 
 if 'selected_town' not in st.session_state: st.session_state.selected_town = None
 if 'lease_commencement_year' not in st.session_state: st.session_state.lease_commencement_year = 1966
@@ -311,22 +353,64 @@ with st.sidebar:
         on_change=toggle_theme,
         key="theme_toggle_sidebar"
     )
-    if st.button("🏠 Return to Predictor"):
-        st.session_state.active_page = PAGE_OPTIONS_LIST[0]
-        st.session_state.menu_key_counter += 1
-        st.rerun()
+    st.button("🏠 Return to Predictor", on_click=return_to_predictor)
+    if price_predictor is not None:
+        with st.expander("Cache Statistics"):
+            cache_stats = price_predictor.cache_stats()
+            st.caption(f"Model version: {cache_stats['model_version']}")
+            for cache_name in ["prediction", "contribution"]:
+                stats = cache_stats[cache_name]
+                st.markdown(f"**{cache_name.title()} cache** — {stats['size']:,}/{stats['maxsize']:,} entries  \n"
+                            f"Hits: {stats['hits']:,} · Misses: {stats['misses']:,} · Evictions: {stats['evictions']:,} · "
+                            f"Hit rate: {stats['hit_rate']:.1%}")
+    with st.expander("Prediction Batching"):
+        batch_stats = batch_service.stats()
+        st.caption(f"Merge window {batch_stats['max_wait_ms']:.1f} ms · booster threads {batch_stats['nthread']}")
+        st.markdown(f"Queue depth: {batch_stats['queue_depth']} (max {batch_stats['max_queue_depth']})  \n"
+                    f"Requests: {batch_stats['requests']:,} in {batch_stats['batches']:,} batches · "
+                    f"mean size {batch_stats['mean_batch_size']:.1f} · largest {batch_stats['largest_batch']}  \n"
+                    f"Mean queue wait: {batch_stats['mean_queue_wait_ms']:.2f} ms")
+        histogram = " · ".join(f"{bucket}: {count:,}" for bucket, count in batch_stats['batch_size_histogram'].items() if count)
+        st.markdown(f"Batch sizes: {histogram or 'none yet'}")
+    with st.expander("Audit Log"):
+        audit_stats = audit_log.stats()
+        st.caption(f"Writing to {audit_stats['directory']} · back-pressure policy '{audit_stats['policy']}'")
+        st.markdown(f"Predictions recorded: {audit_stats['recorded']:,} · written: {audit_stats['written']:,} "
+                    f"in {audit_stats['row_groups']:,} row groups · dropped: {audit_stats['dropped']:,}  \n"
+                    f"Queued: {audit_stats['pending_rows']:,}/{audit_stats['max_pending_rows']:,} rows · "
+                    f"completed files: {audit_stats['files']}")
+        if audit_stats['last_error']:
+            st.markdown(f"Last write error: {audit_stats['last_error']}")
+    with st.expander("Model Registry"):
+        registry_status = registry.status()
+        st.caption(f"Serving version {registry_status['active_version'] or 'none'} · "
+                   f"{registry_status['swaps']} load(s) · last checked {registry_status['last_checked'] or 'never'}")
+        st.markdown(f"Published versions: {', '.join(registry_status['available_versions']) or 'none (using model.bst)'}")
+        for version, error in registry_status['rejected'].items():
+            st.markdown(f"Rejected **{version}**: {error}")
+    with st.expander("Latency Metrics"):
+        endpoint = f"http://127.0.0.1:{metrics_server.server_address[1]}/metrics" if metrics_server else "set HDB_METRICS_PORT to export"
+        st.caption(f"Per-stage latency for this server process · Prometheus: {endpoint}")
+        stage_rows = [f"| {row['stage']} | {row['count']:,} | {row['p50_ms']:.3f} | {row['p99_ms']:.3f} | {row['max_ms']:.3f} |"
+                      for row in metrics.STAGE_METRICS.summary()]
+        if stage_rows:
+            st.markdown("| Stage | Count | p50 (ms) | p99 (ms) | Max (ms) |\n|---|---:|---:|---:|---:|\n" + "\n".join(stage_rows))
+        else:
+            st.markdown("No stages recorded yet.")
+    with st.expander("Startup Timing"):
+        st.caption("Cold start of this server process")
+        st.code(startup_timings.report(), language=None)
 
 # --- Main App UI ---
-st.markdown('<h1 class="main-header">HDB Resale Price Predictor</h1>', unsafe_allow_html=True)
 with st.container():
     st.markdown(f"""
     <div class="info-box">
-        <p><strong>Model:</strong> {MODEL_TYPE} | <strong>Data Last Updated:</strong> {DATA_INGESTION_DATE}</p>
+        <p><strong>Model:</strong> {MODEL_TYPE} | <strong>Version:</strong> {MODEL_VERSION} | <strong>Data Last Updated:</strong> {DATA_INGESTION_DATE}</p>
         <p><strong>Powered by AI, this cutting-edge predictor leverages an XGBoost model trained on extensive historical resale transaction records to estimate HDB resale prices with precision.</strong></p>
     </div>
     """, unsafe_allow_html=True)
 
-icons_list = ['pencil-square', 'geo-alt-fill', 'info-circle-fill']
+icons_list = ['pencil-square', 'grid-3x3-gap-fill', 'geo-alt-fill', 'info-circle-fill']
 try:
     default_nav_index = PAGE_OPTIONS_LIST.index(st.session_state.active_page)
 except ValueError:
@@ -345,66 +429,82 @@ selected_page_from_menu = option_menu(
     key=current_menu_key
 )
 
+# The new page is drawn in this same run; the menu picks up its default index on the next one
 if selected_page_from_menu != st.session_state.active_page:
     st.session_state.active_page = selected_page_from_menu
-    st.rerun()
 
 if st.session_state.active_page == PAGE_OPTIONS_LIST[0]: # "Make Prediction"
+    import xgboost as xgb  # already loaded by import_ml_libraries(); named for the XGBoostError handlers below
+
+    # The form is one fragment: changing an input, typing a postal code or pressing Predict reruns
+    # prediction_form() only, not the header, stylesheet, sidebar and menu. The inputs, the Predict
+    # result and the sensitivity grid are all in it, so the grid always matches the inputs on screen.
+    # As before, the result card shows on the run where Predict was pressed. (Streamlit 1.33 cannot
+    # nest fragments or have one fragment rerun another, so these parts cannot be split up safely.)
+    def unit_inputs():
+        st.markdown('<h2 class="sub-header">Expected Sale Date</h2>', unsafe_allow_html=True)
+        sale_date_col1, sale_date_col2 = st.columns(2)
+        with sale_date_col1:
+            try:
+                default_year_idx = FUTURE_YEARS.index(current_date.year)
+            except ValueError:
+                default_year_idx = len(FUTURE_YEARS) // 2
+            selected_year = st.selectbox("Year", FUTURE_YEARS, index=default_year_idx, key="sale_year_select")
+        with sale_date_col2:
+            selected_month = st.selectbox("Month", MONTHS, index=current_date.month -1, key="sale_month_select")
 
-    st.markdown('<h2 class="sub-header">Expected Sale Date</h2>', unsafe_allow_html=True)
-    sale_date_col1, sale_date_col2 = st.columns(2) 
-    with sale_date_col1:
-        try:
-            default_year_idx = FUTURE_YEARS.index(current_date.year)
-        except ValueError:
-            default_year_idx = len(FUTURE_YEARS) // 2
-        selected_year = st.selectbox("Year", FUTURE_YEARS, index=default_year_idx, key="sale_year_select") 
-    with sale_date_col2:
-        selected_month = st.selectbox("Month", MONTHS, index=current_date.month -1, key="sale_month_select") 
-    
-    st.markdown("---")
-    
-    col1, col2 = st.columns([1, 1])
-    with col1:
         st.markdown('<h2 class="sub-header">Property Details</h2>', unsafe_allow_html=True)
         use_sqft = st.toggle("Use Square Feet (sqft)", value=False, key="sqft_toggle")
+        floor_area_sqft = None
         if use_sqft:
             floor_area_sqft = st.number_input("Floor Area (sqft)", min_value=215.0, max_value=3230.0, value=969.0, step=10.0)
             floor_area = sqft_to_sqm(floor_area_sqft)
         else:
             floor_area = st.number_input("Floor Area (sqm)", min_value=20.0, max_value=300.0, value=90.0, step=1.0)
-
-        lease_commencement_year = st.number_input(
-            "Lease Commencement Year", min_value=1966, max_value=current_date.year,
-            value=st.session_state.lease_commencement_year, step=1,
-            help="Enter the year the flat's 99-year lease started.", key="lease_year_input"
-        )
         storey = st.number_input("Storey (Average)", min_value=1.0, max_value=50.0, value=10.0, step=1.0)
+        selected_flat_type = st.selectbox("Flat Type", FLAT_TYPES, index=FLAT_TYPES.index("4 ROOM") if "4 ROOM" in FLAT_TYPES else 0)
+        selected_flat_model = st.selectbox("Flat Model", FLAT_MODELS, index=FLAT_MODELS.index("IMPROVED") if "IMPROVED" in FLAT_MODELS else 0)
+
+        return selected_year, selected_month, use_sqft, floor_area, floor_area_sqft, storey, selected_flat_type, selected_flat_model
 
-    with col2:
-        st.markdown('<h2 class="sub-header">Location & Type</h2>', unsafe_allow_html=True)
+    def location_inputs():
+        """Postal lookup runs before the town and lease widgets are drawn, so a new match shows up in this run."""
+        st.markdown('<h2 class="sub-header">Location & Lease</h2>', unsafe_allow_html=True)
         use_postal = st.toggle("Enter Postal Code Instead of Town", value=False, key="postal_toggle")
         postal_error_container = st.empty()
-        
+
         if use_postal:
             postal_code = st.text_input("Postal Code", placeholder="e.g., 760123", key="postal_code_input")
+            postal_suggestions, postal_match_count = ([], 0)
+            if postal_code and postal_suggester is not None and len(postal_code) < 6:
+                postal_suggestions, postal_match_count = postal_suggester.suggest(postal_code, limit=POSTAL_SUGGESTION_LIMIT)
             if postal_code:
                 postal_info, error_msg = validate_postal_code(postal_code)
                 if error_msg:
-                    postal_error_container.error(error_msg)
+                    if postal_suggestions:
+                        postal_error_container.info(f"{postal_match_count:,} postal code(s) start with {postal_code}. Pick one below or keep typing.")
+                    else:
+                        postal_error_container.error(error_msg)
                     st.session_state.postal_validation_error = error_msg
                     st.session_state.selected_town = None
                 else:
                     postal_error_container.success(f"Postal code validated: {postal_code}")
                     st.session_state.postal_validation_error = None
                     if postal_info:
-                        town_changed = st.session_state.selected_town != postal_info["town"]
-                        lease_year_changed = st.session_state.lease_commencement_year != int(postal_info["lease_commence_date"])
-                        if town_changed or lease_year_changed:
-                            st.session_state.selected_town = postal_info["town"]
-                            st.session_state.lease_commencement_year = int(postal_info["lease_commence_date"])
-                            st.rerun()
-            
+                        st.session_state.selected_town = postal_info["town"]
+                        st.session_state.lease_commencement_year = int(postal_info["lease_commence_date"])
+
+            if postal_suggestions:
+                suggestion_labels = {
+                    sug["postal"]: f'{sug["postal"]} — {sug["town"]} (lease from {sug["lease_commence_date"]})'
+                    for sug in postal_suggestions
+                }
+                st.selectbox(
+                    "Matching Postal Codes", [None] + list(suggestion_labels),
+                    format_func=lambda code: "Select a postal code..." if code is None else suggestion_labels[code],
+                    key="postal_suggestion_select", on_change=apply_postal_suggestion
+                )
+
             town_display_index = TOWNS.index(st.session_state.selected_town) if st.session_state.selected_town and st.session_state.selected_town in TOWNS else 0
             st.selectbox(
                 "Town", TOWNS, index=town_display_index,
@@ -419,137 +519,332 @@ if st.session_state.active_page == PAGE_OPTIONS_LIST[0]: # "Make Prediction"
                  st.session_state.selected_town = selected_town_manual
             postal_code = None # Ensure postal code is None if not using postal toggle
 
-        selected_flat_type = st.selectbox("Flat Type", FLAT_TYPES, index=FLAT_TYPES.index("4 ROOM") if "4 ROOM" in FLAT_TYPES else 0)
-        selected_flat_model = st.selectbox("Flat Model", FLAT_MODELS, index=FLAT_MODELS.index("IMPROVED") if "IMPROVED" in FLAT_MODELS else 0)
+        st.number_input(
+            "Lease Commencement Year", min_value=1966, max_value=current_date.year,
+            value=st.session_state.lease_commencement_year, step=1,
+            help="Enter the year the flat's 99-year lease started.", key="lease_year_input"
+        )
+        return use_postal, postal_code
+
+    def prediction_result(selected_year, selected_month, use_sqft, floor_area, floor_area_sqft, storey,
+                          selected_flat_type, selected_flat_model, use_postal, postal_code):
+        st.markdown("") 
+        predict_col1, predict_col2, predict_col3 = st.columns([1, 2, 1])
+        with predict_col2:
+            predict_button = st.button("🔮 Predict Resale Price", type="primary", use_container_width=True)
+
+        if predict_button:
+            predict_start = time.perf_counter()
+            audit_inputs = {
+                "floor_area_sqm": floor_area, "storey_avg": storey,
+                "sale_year": selected_year, "sale_month": MONTH_TO_NUM[selected_month],
+                "lease_commence_date": st.session_state.lease_commencement_year,
+                "town": st.session_state.selected_town, "flat_type": selected_flat_type, "flat_model": selected_flat_model,
+                "postal": postal_code if use_postal else None,
+            }
+
+            def audit(prediction, error=None):
+                """Queue this Predict press for the audit log, failed ones included, as api.py does."""
+                audit_log.record("app", price_predictor.model_version if price_predictor is not None else None,
+                                 audit_inputs, prediction, (time.perf_counter() - predict_start) * 1000.0, error=error)
+
+            with metrics.stage("validate_input"):
+                input_error = prediction_input_error(use_postal, postal_code)
+            if input_error:
+                audit(None, input_error)
+                st.error(input_error)
+            else:
+                with st.spinner("Analyzing market data..."):
+                    lease_commencement_year_value = st.session_state.lease_commencement_year
+                    calculated_remaining_lease_years = float(predictor.remaining_lease_years(selected_year, lease_commencement_year_value))
+
+                    town_to_use = st.session_state.selected_town
+                    if not town_to_use: 
+                        audit(None, "Town information is missing.")
+                        st.error("Town information is missing. Cannot proceed.")
+                        st.stop()
 
-    st.markdown("") 
-    predict_col1, predict_col2, predict_col3 = st.columns([1, 2, 1])
-    with predict_col2:
-        predict_button = st.button("🔮 Predict Resale Price", type="primary", use_container_width=True)
-
-    if predict_button:
-        if use_postal and st.session_state.postal_validation_error:
-            st.error("Please enter a valid postal code before making a prediction.")
-        elif use_postal and not postal_code: 
-             st.error("Postal code is enabled but not entered. Please enter a postal code.")
-        elif not st.session_state.selected_town and not use_postal:
-             st.error("Please select a town.")
-        elif not st.session_state.selected_town and use_postal and not postal_code: 
-            st.error("Please enter a postal code so town can be auto-filled.")
-        elif xgb_model_loaded is None: 
-            st.error("Model is not available. Prediction cannot be made. Please ensure 'model.bst' is in the correct location and check application logs.")
-        else:
-            with st.spinner("Analyzing market data..."):
-                lease_commencement_year_value = st.session_state.lease_commencement_year
-                lease_duration_at_sale = float(selected_year) - float(lease_commencement_year_value)
-                calculated_remaining_lease_years = np.clip(99.0 - lease_duration_at_sale, 10.0, 99.0)
-        
-                input_values = {
-                    'floor_area_sqm': float(floor_area),
-                    'postal': float(postal_code) if postal_code and postal_code.isdigit() else 0.0, 
-                    'remaining_lease_years': float(calculated_remaining_lease_years),
-                    'storey_avg': float(storey),
-                    'sale_year': float(selected_year),
-                    'sale_month': float(MONTH_TO_NUM[selected_month])
-                }
-                final_input_for_model = {feat: 0.0 for feat in FEATURE_NAMES}
-                for key, value in input_values.items():
-                    if key in final_input_for_model: final_input_for_model[key] = value
-
-                town_to_use = st.session_state.selected_town
-                if not town_to_use: 
-                    st.error("Town information is missing. Cannot proceed.")
-                    st.stop()
-
-                for prefix, selected_val, values_list in [
-                    ("town_", town_to_use, TOWNS),
-                    ("flat_type_", selected_flat_type, FLAT_TYPES),
-                    ("flat_model_", selected_flat_model, FLAT_MODELS)
-                ]:
-                    feature_name = f"{prefix}{selected_val}"
-                    if feature_name in final_input_for_model:
-                        final_input_for_model[feature_name] = 1.0
-                    else: st.warning(f"Selected value '{selected_val}' (feature: {feature_name}) not in model's FEATURE_NAMES. This may affect prediction accuracy.")
-                
+                    prediction = None
+                    try:
+                        prediction = batch_service.predict_features(
+                            price_predictor,
+                            floor_area_sqm=floor_area, storey_avg=storey,
+                            sale_year=selected_year, sale_month=MONTH_TO_NUM[selected_month],
+                            lease_commencement_year=lease_commencement_year_value,
+                            town=town_to_use, flat_type=selected_flat_type, flat_model=selected_flat_model,
+                            postal_code=postal_code
+                        )
+                        audit(prediction, None if prediction is not None else "No prediction returned by the model.")
+
+                        if prediction is not None:
+                            import pandas as pd
+                            import altair as alt
+                            with metrics.stage("render"):
+                                st.markdown(f"""
+                                <div class="prediction-card">
+                                    <h2>Predicted Resale Price</h2>
+                                    <h1 style="font-size: 42px; color: {colors['success']};">S$ {prediction:,.2f}</h1>
+                                    <p>For {selected_flat_type} in {town_to_use} (Expected: {selected_month} {selected_year})</p>
+                                </div>""", unsafe_allow_html=True)
+                                with st.expander("View Property Details Summary"):
+                                    col_details1, col_details2 = st.columns(2)
+                                    with col_details1:
+                                        st.write("**Property Details:**")
+                                        if use_sqft: st.write(f"• Floor Area: {floor_area_sqft:.1f} sqft ({floor_area:.1f} sqm)")
+                                        else: st.write(f"• Floor Area: {floor_area:.1f} sqm ({sqm_to_sqft(floor_area):.1f} sqft)")
+                                        st.write(f"• Lease Commencement Year: {lease_commencement_year_value}")
+                                        st.write(f"• Remaining Lease (at sale): {calculated_remaining_lease_years:.1f} years")
+                                        st.write(f"• Storey (Average): {storey:.1f}")
+                                    with col_details2:
+                                        st.write("**Unit Details:**")
+                                        st.write(f"• Town: {town_to_use}")
+                                        if postal_code: st.write(f"• Postal Code: {postal_code}")
+                                        st.write(f"• Flat Type: {selected_flat_type}")
+                                        st.write(f"• Flat Model: {selected_flat_model}")
+
+                            with st.expander("Why This Price? (Feature Contributions)"):
+                                input_row = predictor.encode_features(
+                                    floor_area_sqm=floor_area, storey_avg=storey,
+                                    sale_year=selected_year, sale_month=MONTH_TO_NUM[selected_month],
+                                    lease_commencement_year=lease_commencement_year_value,
+                                    town=town_to_use, flat_type=selected_flat_type, flat_model=selected_flat_model,
+                                    postal_code=postal_code
+                                )
+                                try:
+                                    contributions = price_predictor.explain_row(input_row)
+                                except ValueError as ve:  # the serving engine has no contributions
+                                    st.info(str(ve))
+                                else:
+                                    base_value = contributions.pop("Base Value")
+                                    contribution_df = pd.DataFrame({"Input": list(contributions), "Contribution (S$)": list(contributions.values())})
+                                    contribution_chart = alt.Chart(contribution_df).mark_bar().encode(
+                                        x=alt.X("Contribution (S$):Q"),
+                                        y=alt.Y("Input:N", sort=alt.EncodingSortField(field="Contribution (S$)", op="sum", order="descending"), title=None),
+                                        color=alt.condition(alt.datum["Contribution (S$)"] > 0, alt.value(colors['success']), alt.value("#E53935")),
+                                        tooltip=["Input", alt.Tooltip("Contribution (S$):Q", format=",.0f")]
+                                    )
+                                    st.altair_chart(contribution_chart, use_container_width=True)
+                                    st.caption(f"Starting from the model's base value of S$ {base_value:,.0f}, each bar shows how much an input "
+                                               "moved the price. Town, flat type and flat model include all of their one-hot columns.")
+
+                            st.markdown('<h2 class="sub-header">Price Over Time</h2>', unsafe_allow_html=True)
+                            sweep_years, sweep_months, sweep_prices = price_predictor.predict_sale_date_sweep(
+                                FUTURE_YEARS, lease_commencement_year_value,
+                                floor_area_sqm=floor_area, storey_avg=storey,
+                                town=town_to_use, flat_type=selected_flat_type, flat_model=selected_flat_model,
+                                postal_code=postal_code
+                            )
+                            trajectory = pd.DataFrame(
+                                {"Predicted Resale Price (S$)": sweep_prices},
+                                index=pd.to_datetime({"year": sweep_years, "month": sweep_months, "day": 1})
+                            )
+                            st.line_chart(trajectory, color=colors['primary'])
+                            st.caption(
+                                f"Same unit priced for every month from {MONTHS[0]} {FUTURE_YEARS[0]} to {MONTHS[-1]} {FUTURE_YEARS[-1]}, "
+                                f"with remaining lease recalculated at each sale date. Range: S$ {sweep_prices.min():,.0f} – S$ {sweep_prices.max():,.0f}."
+                            )
+                        else: 
+                            st.error("Prediction data could not be generated by the local model.")
+                    except ValueError as ve:
+                        if prediction is None:
+                            audit(None, f"Invalid input: {ve}")
+                        st.error(f"Invalid input: {ve}")
+                    except xgb.core.XGBoostError as xgb_e:
+                        if prediction is None:
+                            audit(None, f"XGBoost prediction error: {xgb_e}")
+                        st.error(f"XGBoost prediction error: {xgb_e}")
+
+                    except Exception as e:
+                        if prediction is None:
+                            audit(None, f"{type(e).__name__}: {e}")
+                        st.error(f"An error occurred during prediction: {e}")
+
+        st.markdown("---")
+        st.markdown('<h2 class="sub-header">What-If Sensitivity</h2>', unsafe_allow_html=True)
+        with st.expander("Predicted price across floor area and storey for the selected town, flat type, model and sale date"):
+            if price_predictor is None:
+                st.info("Model is not available. Sensitivity grid cannot be computed.")
+            elif not st.session_state.selected_town:
+                st.info("Select a town or enter a valid postal code to see the sensitivity grid.")
+            else:
                 try:
-                    input_list = [final_input_for_model[feature] for feature in FEATURE_NAMES]
-                    input_df = np.array(input_list).astype(np.float32).reshape(1, -1)
-                    
-                    if input_df.shape[1] != NUM_FEATURES:
-                        st.error(f"Critical error: Input feature count ({input_df.shape[1]}) does not match model expectation ({NUM_FEATURES}).")
-                        st.stop()
+                    sensitivity = compute_sensitivity_grid(
+                        price_predictor.model_version,
+                        st.session_state.selected_town, selected_flat_type, selected_flat_model,
+                        selected_year, MONTH_TO_NUM[selected_month],
+                        st.session_state.lease_commencement_year, postal_code if use_postal else None
+                    )
+                    marker_area = SENSITIVITY_FLOOR_AREAS[np.abs(SENSITIVITY_FLOOR_AREAS - floor_area).argmin()]
+                    marker_storey = SENSITIVITY_STOREYS[np.abs(SENSITIVITY_STOREYS - storey).argmin()]
+                    spec = sensitivity_chart_spec()
+                    heatmap, marker = spec["layer"]
+                    marker = {**marker, "transform": [{"filter": f"datum.floor_area_sqm == {marker_area} && datum.storey_avg == {marker_storey}"}]}
+                    st.vega_lite_chart(sensitivity, {**spec, "layer": [heatmap, marker]}, use_container_width=True)
+                    st.caption(f"{st.session_state.selected_town} · {selected_flat_type} · {selected_flat_model} · {selected_month} {selected_year}. "
+                               "The red marker is the nearest grid point to the current floor area and storey.")
+                except ValueError as ve:
+                    st.error(f"Invalid input: {ve}")
+                except xgb.core.XGBoostError as xgb_e:
+                    st.error(f"XGBoost prediction error: {xgb_e}")
+
+
+    @st.experimental_fragment
+    def prediction_form():
+        col1, col2 = st.columns([1, 1])
+        with col1:
+            unit = unit_inputs()
+        with col2:
+            location = location_inputs()
+        prediction_result(*unit, *location)
 
-                    input_scaled = scaler.transform(input_df)
-                    
-                    dtest = xgb.DMatrix(input_scaled, feature_names=FEATURE_NAMES if xgb_model_loaded.num_features() == NUM_FEATURES else None) 
-                    
-                    prediction_array = xgb_model_loaded.predict(dtest)
-                    prediction = float(prediction_array[0]) if prediction_array is not None and len(prediction_array) > 0 else None
-
-                    if prediction is not None:
-                        st.markdown(f"""
-                        <div class="prediction-card">
-                            <h2>Predicted Resale Price</h2>
-                            <h1 style="font-size: 42px; color: {colors['success']};">S$ {prediction:,.2f}</h1>
-                            <p>For {selected_flat_type} in {town_to_use} (Expected: {selected_month} {selected_year})</p>
-                        </div>""", unsafe_allow_html=True)
-                        with st.expander("View Property Details Summary"):
-                            col_details1, col_details2 = st.columns(2)
-                            with col_details1:
-                                st.write("**Property Details:**")
-                                if use_sqft: st.write(f"• Floor Area: {floor_area_sqft:.1f} sqft ({floor_area:.1f} sqm)")
-                                else: st.write(f"• Floor Area: {floor_area:.1f} sqm ({sqm_to_sqft(floor_area):.1f} sqft)")
-                                st.write(f"• Lease Commencement Year: {lease_commencement_year_value}")
-                                st.write(f"• Remaining Lease (at sale): {calculated_remaining_lease_years:.1f} years")
-                                st.write(f"• Storey (Average): {storey:.1f}")
-                            with col_details2:
-                                st.write("**Unit Details:**")
-                                st.write(f"• Town: {town_to_use}")
-                                if postal_code: st.write(f"• Postal Code: {postal_code}")
-                                st.write(f"• Flat Type: {selected_flat_type}")
-                                st.write(f"• Flat Model: {selected_flat_model}")
-                    else: 
-                        st.error("Prediction data could not be generated by the local model.")
+    prediction_form()
+
+    st.markdown("---")
+    st.markdown('<h2 class="sub-header">Bulk Scoring</h2>', unsafe_allow_html=True)
+    with st.expander("Price many units at once from a CSV or Parquet file"):
+        st.markdown(
+            "Required columns: `floor_area_sqm`, `storey_avg`, `sale_year`, `sale_month` (number or name), "
+            "`flat_type`, `flat_model`, plus `town` and `lease_commence_date` — or a `postal` column to fill both "
+            "from the postal code database. `remaining_lease_years` may be given instead of `lease_commence_date`."
+        )
+        bulk_file = st.file_uploader("Upload listings", type=["csv", "parquet"], key="bulk_file_upload")
+        bulk_explain = st.checkbox("Include feature contributions (contrib_* columns)", value=False, key="bulk_explain")
+        if bulk_file is not None:
+            if xgb_model_loaded is None:
+                st.error("Model is not available. Bulk scoring cannot be made. Please ensure 'model.bst' is in the correct location and check application logs.")
+            else:
+                try:
+                    with st.spinner("Scoring listings..."):
+                        bulk_result = price_predictor.predict_frame(read_bulk_file(bulk_file), explain=bulk_explain)
+                    n_failed = int((bulk_result['error'] != "").sum())
+                    st.success(f"Priced {len(bulk_result) - n_failed:,} of {len(bulk_result):,} rows.")
+                    if n_failed:
+                        st.warning(f"{n_failed:,} row(s) could not be priced; see the 'error' column.")
+                    st.dataframe(bulk_result.head(100), use_container_width=True)
+                    base_name = os.path.splitext(bulk_file.name)[0]
+                    if bulk_file.name.lower().endswith(".parquet"):
+                        st.download_button("⬇️ Download priced file", bulk_result.to_parquet(index=False),
+                                           file_name=f"{base_name}_priced.parquet", mime="application/octet-stream")
+                    else:
+                        st.download_button("⬇️ Download priced file", bulk_result.to_csv(index=False).encode("utf-8"),
+                                           file_name=f"{base_name}_priced.csv", mime="text/csv")
+                except ValueError as ve:  # missing columns, or contributions on an engine without them
+                    st.error(f"Cannot score this file: {ve}")
                 except xgb.core.XGBoostError as xgb_e:
                     st.error(f"XGBoost prediction error: {xgb_e}")
-                  
                 except Exception as e:
-                    st.error(f"An error occurred during prediction: {e}")
+                    st.error(f"An error occurred during bulk scoring: {e}")
+
+elif st.session_state.active_page == PAGE_OPTIONS_LIST[1]: # "Market Overview"
+    st.markdown('<h2 class="sub-header">Market Overview</h2>', unsafe_allow_html=True)
+    st.markdown(f"""<div class="info-box">Baseline predicted prices for every town, flat type and flat model for {MONTHS[current_date.month - 1]} {current_date.year}.
+    Each cell prices a reference {market_matrix.REFERENCE_FLOOR_AREA_SQM:.0f} sqm unit on storey {market_matrix.REFERENCE_STOREY:.0f},
+    using the town's median lease commencement year.</div>""", unsafe_allow_html=True)
+    st.markdown('<div class="mobile-return-button-container">', unsafe_allow_html=True)
+    st.button("🏠", key="mobile_return_from_market_page", on_click=return_to_predictor)
+    st.markdown('</div>', unsafe_allow_html=True)
 
-elif st.session_state.active_page == PAGE_OPTIONS_LIST[1]: # "Transaction Map"
+    if price_predictor is None:
+        st.error("Model is not available. Market overview cannot be computed. Please ensure 'model.bst' is in the correct location and check application logs.")
+    else:
+        try:
+            market_snapshot = load_market_snapshot(price_predictor.model_version, current_date.year, current_date.month)
+            overview_flat_type = st.selectbox("Flat Type", FLAT_TYPES, index=FLAT_TYPES.index("4 ROOM") if "4 ROOM" in FLAT_TYPES else 0, key="market_flat_type")
+            market_table = (market_snapshot[market_snapshot['flat_type'] == overview_flat_type]
+                            .pivot(index='town', columns='flat_model', values='predicted_price'))
+            st.dataframe(market_table.style.format("S$ {:,.0f}"), use_container_width=True, height=min(38 * (len(market_table) + 1), 1000))
+            import pandas as pd
+            st.caption(f"Model version {price_predictor.model_version} · computed {pd.Timestamp(market_snapshot['computed_at'].max()):%d-%m-%Y %H:%M}")
+        except Exception as e:
+            st.error(f"An error occurred while loading the market overview: {e}")
+
+elif st.session_state.active_page == PAGE_OPTIONS_LIST[2]: # "Transaction Map"
     st.markdown('<h2 class="sub-header">HDB Resale Transaction Map</h2>', unsafe_allow_html=True)
-    st.markdown("""<div class="info-box">Click on any postal code marker to see the last 20 transactions for that location.</div>""", unsafe_allow_html=True)
+    try:
+        txn_store = load_transaction_store()
+    except FileNotFoundError:
+        txn_store = None
+    if txn_store is None:
+        st.markdown("""<div class="info-box">Click on any postal code marker to see the last 20 transactions for that location.</div>""", unsafe_allow_html=True)
+    else:
+        st.markdown("""<div class="info-box">Enter a postal code to see its latest resale transactions, or browse recent prices by area on the map. Both are served from the local transaction store.</div>""", unsafe_allow_html=True)
     st.markdown('<div class="mobile-return-button-container">', unsafe_allow_html=True)
-    if st.button("🏠", key="mobile_return_from_map_page"):
-        st.session_state.active_page = PAGE_OPTIONS_LIST[0]
-        st.session_state.menu_key_counter += 1
-        st.rerun()
+    st.button("🏠", key="mobile_return_from_map_page", on_click=return_to_predictor)
     st.markdown('</div>', unsafe_allow_html=True)
-    st.markdown("""
-    <div class="iframe-container">
-        <iframe src="https://seehiong.github.io/app/hdb_resale_price_map_clickable.html" 
-            style="width: 100%; height: 800px; border: none;" allow="geolocation"></iframe>
-    </div>
-    <script> 
-    function checkMobileIframeHeight() {{
-        var iframeContainer = document.querySelector('.iframe-container');
-        if (iframeContainer) {{
-            if (window.innerWidth <= 768) {{ iframeContainer.style.height = window.innerHeight * 0.8 + 'px'; }}
-            else {{ iframeContainer.style.height = '800px'; }}
-        }}
-    }}
-    window.addEventListener('load', checkMobileIframeHeight); 
-    window.addEventListener('resize', checkMobileIframeHeight);
-    </script>
-    """, unsafe_allow_html=True)
+    if txn_store is None:
+        # No local store: fall back to the hosted map, which needs network access.
+        st.markdown("""
+        <div class="iframe-container">
+            <iframe src="https://seehiong.github.io/app/hdb_resale_price_map_clickable.html"
+                style="width: 100%; height: 800px; border: none;" allow="geolocation"></iframe>
+        </div>
+        """, unsafe_allow_html=True)
+        st.caption("Showing the hosted transaction map. Build a local transaction store with "
+                   "`python transaction_store.py resale_transactions.csv` to serve this page offline (see the README).")
+    else:
+        map_col1, map_col2 = st.columns([3, 1])
+        with map_col1:
+            map_postal_code = st.text_input("Postal Code", placeholder="e.g., 520101", key="map_postal_input",
+                                            on_change=focus_map_on_postal).strip()
+        with map_col2:
+            latest_n = st.number_input("Transactions", min_value=1, max_value=200, value=transaction_store.DEFAULT_LATEST,
+                                       step=5, key="map_latest_n")
+
+        cluster_index = load_cluster_index(txn_store)
+        if len(cluster_index) == 0:
+            st.info("The transaction store has no coordinates. Rebuild it from a file with latitude and longitude "
+                    "columns to see the map.")
+        else:
+            view_col1, view_col2 = st.columns([3, 1])
+            with view_col1:
+                map_centre = st.selectbox("Centre On", [MAP_ALL_TOWNS] + TOWNS, key="map_centre", on_change=focus_map_on_town)
+            with view_col2:
+                # The focus callbacks also set map_zoom, so its default lives in session state, not in value=
+                st.session_state.setdefault("map_zoom", MAP_DEFAULT_ZOOM)
+                map_zoom = st.slider("Zoom", map_clusters.MIN_ZOOM, map_clusters.MAX_ZOOM, key="map_zoom")
+            map_highlight = txn_store.location(map_postal_code) if map_postal_code else None
+            if map_highlight is not None:
+                centre_lat, centre_lon = map_highlight
+            else:
+                centre_lat, centre_lon = cluster_index.centre(None if map_centre == MAP_ALL_TOWNS else map_centre)
+            with metrics.stage("map_aggregate"):
+                map_kind, map_rows = cluster_index.query(centre_lat, centre_lon, map_zoom)
+            with metrics.stage("map_render"):
+                map_deck = cluster_map_deck(map_kind, map_rows, centre_lat, centre_lon, map_zoom, map_highlight)
+                st.pydeck_chart(map_deck, use_container_width=True)
+            st.caption(f"{len(map_rows):,} {'postal code markers' if map_kind == 'markers' else 'clusters'} in view "
+                       f"({len(map_deck.to_json()) / 1024:.1f} KB). Clusters show the number of postal codes and the median "
+                       f"of their latest-{transaction_store.DEFAULT_LATEST} median prices. Individual postal codes appear "
+                       f"from zoom {map_clusters.MARKER_ZOOM} when at most {map_clusters.MAX_MARKERS} are in view. The view "
+                       f"follows Centre On, Zoom and the postal code above. Panning or zooming the map itself does not "
+                       f"load other areas.")
+
+        if map_postal_code:
+            map_postal_info, map_error_msg = validate_postal_code(map_postal_code)
+            if map_error_msg:
+                st.error(map_error_msg)
+            else:
+                with metrics.stage("transaction_lookup"):
+                    latest_transactions = txn_store.latest_records(map_postal_code, int(latest_n))
+                st.caption(f"{map_postal_info['town']} · lease from {map_postal_info['lease_commence_date']} · "
+                           f"{txn_store.count(map_postal_code):,} transactions on record, newest first")
+                if latest_transactions:
+                    st.dataframe(latest_transactions, use_container_width=True, hide_index=True, column_config={
+                        "month": "Month", "flat_type": "Flat Type", "flat_model": "Flat Model", "storey_range": "Storey",
+                        "floor_area_sqm": st.column_config.NumberColumn("Floor Area (sqm)", format="%.0f"),
+                        "resale_price": st.column_config.NumberColumn("Resale Price (S$)", format="%.0f"),
+                    })
+                else:
+                    st.info(f"No transactions recorded for postal code {map_postal_code}.")
 
-elif st.session_state.active_page == PAGE_OPTIONS_LIST[2]: # "About"
+elif st.session_state.active_page == PAGE_OPTIONS_LIST[3]: # "About"
     st.markdown(f"""
     ## About This Predictor
     This HDB resale price predictor uses a machine learning model to estimate the potential selling price of an HDB flat based on its characteristics and location.
 
     ### Model Information
     - **Model Type**: {MODEL_TYPE}
+    - **Model Version**: {MODEL_VERSION}
     - **Data Last Updated**: {DATA_INGESTION_DATE}
     - **Features Used**: Floor area, remaining lease (calculated from lease commencement year and sale date), storey, flat type, flat model, and location.
 
@@ -561,6 +856,7 @@ elif st.session_state.active_page == PAGE_OPTIONS_LIST[2]: # "About"
     ### Postal Code Lookup
     - Toggle "Enter Postal Code Instead of Town" to automatically retrieve town and lease commencement information.
     - The system will validate the postal code against our database and auto-fill relevant details.
+    - Typing part of a postal code lists matching codes with their town and lease commencement year to pick from.
 
     ### Important Notes
     - This tool provides estimates only and should not be considered as financial advice.
@@ -0,0 +1,330 @@
+# audit_log.py
+"""Asynchronous, batched audit log of every prediction, for compliance and drift analysis.
+
+Each prediction is written as one row: when it was made, where it came from ("app" or "api"),
+the model version, the inputs as given, the predicted price (or the error), and the latency.
+Writing to disk on the request path would add milliseconds to each prediction. Instead,
+record() puts a reference to the caller's inputs on a bounded in-memory queue and returns.
+That costs about a microsecond and does not copy, parse or import anything. One background
+thread drains the queue every FLUSH_INTERVAL seconds, or sooner once FLUSH_ROWS rows are
+waiting. It normalises the inputs into typed columns and appends them to the current Parquet
+file as one row group.
+
+A Parquet file can only be read once its footer has been written when it is closed. The open
+file is therefore kept hidden as ".<name>.parquet.part" and renamed when it is rotated, once
+it is ROTATE_SECONDS old or holds ROTATE_ROWS rows. A reader of the
+directory (pandas.read_parquet, pyarrow.dataset) only ever sees complete files, because pyarrow
+skips names starting with ".". stop() drains the queue and closes the file, and it is
+registered with atexit. A crash (or SIGKILL) can lose only the rows of the open file, so
+ROTATE_SECONDS bounds what is lost.
+
+When the writer falls behind and MAX_PENDING_ROWS rows are waiting, the back-pressure policy
+decides what happens. "drop_newest" (the default) drops the new record, and "drop_oldest" drops
+the oldest queued rows to make room; neither ever makes a request wait. "block" makes the caller
+wait up to BLOCK_TIMEOUT seconds for room and then drops the record. Use it only where a
+complete log matters more than latency. Dropped rows are counted in stats(), so gaps in the
+log are visible.
+
+Run `python audit_log.py [directory]` to summarise a log directory.
+"""
+import atexit
+import collections
+import math
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import metrics
+import predictor
+
+AUDIT_DIR = os.environ.get("HDB_AUDIT_DIR") or os.path.join(predictor.BASE_DIR, "audit_log")
+FLUSH_INTERVAL = 2.0  # seconds between row groups while traffic is light
+FLUSH_ROWS = 10_000  # wake the writer early once this many rows are queued
+ROTATE_SECONDS = 600.0
+ROTATE_ROWS = 1_000_000
+MAX_PENDING_ROWS = 100_000  # about 50 MB while each queued row holds its own input dict
+BLOCK_TIMEOUT = 0.25  # "block" policy only: well over the API's 25 ms budget, hence not the default
+CONVERT_ROWS = 2_000  # rows per Arrow conversion; each one holds the GIL, so keep them short for request threads
+POLICIES = ("drop_newest", "drop_oldest", "block")
+
+# Input fields as given to encode_record(); missing or unparsable values are written as null
+NUMERIC_INPUTS = ["floor_area_sqm", "storey_avg"]
+INTEGER_INPUTS = ["sale_year", "sale_month", "lease_commence_date"]
+TEXT_INPUTS = ["town", "flat_type", "flat_model", "postal"]
+
+
+def audit_schema():
+    import pyarrow as pa
+    return pa.schema(
+        [("timestamp", pa.timestamp("us", tz="UTC")), ("source", pa.string()), ("model_version", pa.string())]
+        + [(name, pa.float64()) for name in NUMERIC_INPUTS]
+        + [(name, pa.int32()) for name in INTEGER_INPUTS]
+        + [(name, pa.string()) for name in TEXT_INPUTS]
+        + [("predicted_price", pa.float64()), ("error", pa.string()),
+           ("latency_ms", pa.float64()), ("batch_size", pa.int32())]
+    )
+
+
+def _number(value, cast):
+    try:
+        number = cast(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    if cast is int:
+        return number if -2**31 <= number < 2**31 else None
+    return number if math.isfinite(number) else None
+
+
+def _text(value):
+    if value is None or value == "":
+        return None
+    return str(value).strip().upper()
+
+
+class AuditLog:
+    """Thread-safe prediction audit sink; call start() once, then record() from any thread."""
+
+    def __init__(self, directory=AUDIT_DIR, policy="drop_newest", postal_data=None, max_pending_rows=MAX_PENDING_ROWS,
+                 flush_interval=FLUSH_INTERVAL, flush_rows=FLUSH_ROWS, rotate_seconds=ROTATE_SECONDS,
+                 rotate_rows=ROTATE_ROWS, block_timeout=BLOCK_TIMEOUT):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown back-pressure policy '{policy}', expected one of {', '.join(POLICIES)}")
+        self.directory = directory
+        self.policy = policy
+        self.postal_data = postal_data  # fills town / lease year for records that only give a postal code
+        self.max_pending_rows = max_pending_rows
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.rotate_seconds = rotate_seconds
+        self.rotate_rows = rotate_rows
+        self.block_timeout = block_timeout
+        self._pending = collections.deque()
+        self._pending_rows = 0
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self._schema = None
+        self._writer = None
+        self._part_path = None
+        self._file_opened = 0.0
+        self._file_rows = 0
+        self._sequence = 0
+        self.recorded = self.written = self.dropped = self.row_groups = self.write_errors = 0
+        self.files = []
+        self.last_error = None
+
+    # --- Lifecycle ---
+    def start(self):
+        if self._thread is None:
+            os.makedirs(self.directory, exist_ok=True)
+            # Import pyarrow now: a first import on the writer thread would hold the GIL for a while mid-traffic
+            import pyarrow.parquet  # noqa: F401
+            self._schema = audit_schema()
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+        return self
+
+    def stop(self, timeout=10.0):
+        """Write every queued record, close the current file and stop the writer."""
+        if self._thread is not None:
+            with self._lock:
+                self._stopping = True
+                self._not_full.notify_all()
+            self._wake.set()
+            self._thread.join(timeout)
+            self._thread = None
+            atexit.unregister(self.stop)
+
+    # --- Client API ---
+    def record(self, source, model_version, inputs, prediction, latency_ms, error=None):
+        """Queue one prediction. `inputs` is kept by reference, so the caller must not change it afterwards.
+
+        Returns False when the record was dropped by the back-pressure policy."""
+        return self._enqueue((time.time(), source, model_version, (inputs,), (prediction,), (error,), latency_ms), 1)
+
+    def record_batch(self, source, model_version, inputs, predictions, errors, latency_ms):
+        """Queue a batch of predictions made in one call; every row gets the batch's latency."""
+        return self._enqueue((time.time(), source, model_version, inputs, predictions, errors, latency_ms), len(inputs))
+
+    def _enqueue(self, item, n_rows):
+        with self._lock:
+            if self._stopping or (self._pending_rows + n_rows > self.max_pending_rows and not self._make_room(n_rows)):
+                self.dropped += n_rows
+                return False
+            self._pending.append(item)
+            self._pending_rows += n_rows
+            self.recorded += n_rows
+            wake = self._pending_rows >= self.flush_rows
+        if wake:
+            self._wake.set()
+        return True
+
+    def _make_room(self, n_rows):
+        """Apply the back-pressure policy with the lock held; True once the rows fit."""
+        if self.policy == "drop_newest":
+            return False
+        if self.policy == "drop_oldest":
+            while self._pending and self._pending_rows + n_rows > self.max_pending_rows:
+                dropped = len(self._pending.popleft()[3])
+                self._pending_rows -= dropped
+                self.dropped += dropped
+            return self._pending_rows + n_rows <= self.max_pending_rows
+        self._wake.set()
+        return self._not_full.wait_for(lambda: self._stopping or self._pending_rows + n_rows <= self.max_pending_rows,
+                                       self.block_timeout) and not self._stopping
+
+    def stats(self):
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "policy": self.policy,
+                "pending_rows": self._pending_rows,
+                "max_pending_rows": self.max_pending_rows,
+                "recorded": self.recorded,
+                "written": self.written,
+                "dropped": self.dropped,
+                "row_groups": self.row_groups,
+                "write_errors": self.write_errors,
+                "last_error": self.last_error,
+                "files": len(self.files),
+                "current_file": os.path.basename(self._part_path) if self._part_path else None,
+            }
+
+    # --- Writer ---
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            with self._lock:
+                items, self._pending = self._pending, collections.deque()
+                self._pending_rows = 0
+                self._not_full.notify_all()
+                stopping = self._stopping
+            if items:
+                self._write(items)
+            if self._writer is not None and (stopping or self._file_rows >= self.rotate_rows
+                                             or time.time() - self._file_opened >= self.rotate_seconds):
+                self._close_file()
+            if stopping:
+                return
+
+    def _write(self, items):
+        n_rows = sum(len(item[3]) for item in items)
+        try:
+            with metrics.stage("audit_write"):
+                table = self._table(items)
+                if self._writer is None:
+                    self._open_file()
+                self._writer.write_table(table)
+            self._file_rows += n_rows
+            self.row_groups += 1
+            self.written += n_rows
+        except Exception as e:  # a full disk or bad directory must not take the writer thread down
+            with self._lock:
+                self.dropped += n_rows
+                self.write_errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+            print(f"Audit log: dropped {n_rows} row(s): {self.last_error}", flush=True)
+            self._close_file()
+
+    def _table(self, items):
+        """One table for a row group, converted CONVERT_ROWS rows at a time."""
+        import pyarrow as pa
+        chunks, chunk, n_rows = [], [], 0
+        for item in items:
+            chunk.append(item)
+            n_rows += len(item[3])
+            if n_rows >= CONVERT_ROWS:
+                chunks.append(self._convert(chunk))
+                chunk, n_rows = [], 0
+        if chunk or not chunks:
+            chunks.append(self._convert(chunk))
+        return pa.concat_tables(chunks) if len(chunks) > 1 else chunks[0]
+
+    def _convert(self, items):
+        import pyarrow as pa
+        columns = {name: [] for name in self._schema.names}
+        for timestamp, source, model_version, inputs, predictions, errors, latency_ms in items:
+            n = len(inputs)
+            when = datetime.fromtimestamp(timestamp, timezone.utc)
+            columns["timestamp"] += [when] * n
+            columns["source"] += [source] * n
+            columns["model_version"] += [model_version] * n
+            columns["latency_ms"] += [latency_ms] * n
+            columns["batch_size"] += [n] * n
+            columns["predicted_price"] += predictions
+            columns["error"] += errors if errors is not None else [None] * n
+            for record in inputs:
+                self._append_inputs(columns, record if isinstance(record, dict) else {})
+        return pa.Table.from_pydict(columns, schema=self._schema)
+
+    def _append_inputs(self, columns, record):
+        postal = record.get("postal")
+        postal = str(postal).strip().zfill(6) if postal not in (None, "") else None
+        town, lease = record.get("town"), record.get("lease_commence_date")
+        if postal and self.postal_data and postal in self.postal_data and (town in (None, "") or lease in (None, "")):
+            info = self.postal_data[postal][0]
+            town = info["town"] if town in (None, "") else town
+            lease = info["lease_commence_date"] if lease in (None, "") else lease
+        for name in NUMERIC_INPUTS:
+            columns[name].append(_number(record.get(name), float))
+        try:
+            month = predictor.parse_sale_month(record.get("sale_month"))
+        except (TypeError, ValueError):
+            month = None
+        columns["sale_year"].append(_number(record.get("sale_year"), int))
+        columns["sale_month"].append(month)
+        columns["lease_commence_date"].append(_number(lease, int))
+        columns["town"].append(_text(town))
+        columns["flat_type"].append(_text(record.get("flat_type")))
+        columns["flat_model"].append(_text(record.get("flat_model")))
+        columns["postal"].append(postal)
+
+    def _open_file(self):
+        import pyarrow.parquet as pq
+        self._sequence += 1
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        name = f"predictions-{stamp}-{os.getpid()}-{self._sequence:04d}.parquet"
+        self._part_path = os.path.join(self.directory, f".{name}.part")
+        os.makedirs(self.directory, exist_ok=True)
+        self._writer = pq.ParquetWriter(self._part_path, self._schema, compression="zstd")
+        self._file_opened = time.time()
+        self._file_rows = 0
+
+    def _close_file(self):
+        if self._writer is None:
+            return
+        try:
+            self._writer.close()
+            path = os.path.join(self.directory, os.path.basename(self._part_path)[1:-len(".part")])
+            os.replace(self._part_path, path)
+            self.files.append(path)
+        except Exception as e:
+            self.last_error = f"{type(e).__name__}: {e}"
+            print(f"Audit log: could not close {self._part_path}: {self.last_error}", flush=True)
+        self._writer = None
+        self._part_path = None
+
+
+def read_audit_log(directory=AUDIT_DIR):
+    """All completed audit files in `directory` as one DataFrame, oldest first."""
+    import pandas as pd
+    return pd.read_parquet(directory).sort_values("timestamp", kind="stable", ignore_index=True)
+
+
+if __name__ == "__main__":
+    import sys
+    directory = sys.argv[1] if len(sys.argv) > 1 else AUDIT_DIR
+    names = sorted(n for n in os.listdir(directory) if n.endswith(".parquet") and not n.startswith("."))
+    if not names:
+        sys.exit(f"No completed audit files in {directory}")
+    df = read_audit_log(directory)
+    print(f"{len(names)} file(s), {len(df):,} predictions from {df['timestamp'].min()} to {df['timestamp'].max()}")
+    failed = df["error"].notna()
+    print(f"{failed.sum():,} failed, median latency {df['latency_ms'].median():.2f} ms")
+    print(df.groupby(["source", "model_version"]).size().rename("predictions").to_string())
@@ -0,0 +1,168 @@
+# batch_service.py
+"""Cross-request micro-batching for single-unit predictions.
+
+Streamlit runs every session on its own script thread, and api.py serves each request on its
+own thread. Without batching, each of those threads makes its own one-row booster call.
+MicroBatchPredictor puts rows on a queue. A single worker thread merges the rows waiting there,
+plus any that arrive within a short window, into one HDBPricePredictor.predict_rows() call.
+Each caller then gets its own result. The window only applies while requests are actually
+overlapping. A lone request is scored straight away, so light traffic pays no added latency.
+
+Each queued row carries the predictor it was submitted with. A model hot swap therefore never
+mixes versions inside a batch. The prediction cache is checked before queueing and filled
+afterwards, exactly as predict_row() does.
+"""
+import os
+import queue
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+
+import numpy as np
+
+import metrics
+import predictor
+
+MAX_WAIT_MS = 0.5  # a longer window lowers throughput when callers wait on each other (see the benchmark)
+MAX_BATCH_SIZE = 256
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]  # histogram upper bounds
+
+_STOP = object()
+
+
+class MicroBatchPredictor:
+    """Shared, thread-safe front end that merges concurrent single-row predictions."""
+
+    def __init__(self, max_wait_ms=MAX_WAIT_MS, max_batch_size=MAX_BATCH_SIZE, nthread=None):
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.nthread = nthread or os.cpu_count() or 1
+        self._queue = queue.Queue()
+        self._thread = None
+        self._configured = weakref.WeakSet()  # predictors whose booster thread count is set
+        self._stats_lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.requests = self.batches = self.errors = 0
+        self.max_queue_depth = 0
+        self.largest_batch = 0
+        self.queue_wait_seconds = 0.0
+        self.batch_size_counts = [0] * len(BATCH_SIZE_BUCKETS)
+
+    # --- Lifecycle ---
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="micro-batch-predictor", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    # --- Client API ---
+    def submit(self, price_predictor, row):
+        """Queue one encoded row; the returned Future resolves to its float prediction."""
+        future = Future()
+        self._queue.put((price_predictor, np.asarray(row, dtype=np.float32).reshape(-1), future, time.perf_counter()))
+        depth = self._queue.qsize()
+        if depth > self.max_queue_depth:
+            with self._stats_lock:
+                self.max_queue_depth = max(self.max_queue_depth, depth)
+        return future
+
+    def predict_row(self, price_predictor, row, timeout=None):
+        """Cached prediction for one encoded row, batched with concurrent callers on a miss."""
+        key = (price_predictor.model_version, np.ascontiguousarray(row, dtype=np.float32).tobytes())
+        cached = price_predictor.prediction_cache.get(key)
+        if cached is not None:
+            return cached
+        prediction = self.submit(price_predictor, row).result(timeout)
+        price_predictor.prediction_cache.put(key, prediction)
+        return prediction
+
+    def predict_features(self, price_predictor, **features):
+        """predict_row() for keyword arguments of predictor.encode_features()."""
+        return self.predict_row(price_predictor, predictor.encode_features(**features))
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "requests": self.requests,
+                "batches": self.batches,
+                "errors": self.errors,
+                "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+                "largest_batch": self.largest_batch,
+                "mean_queue_wait_ms": 1000.0 * self.queue_wait_seconds / self.requests if self.requests else 0.0,
+                "batch_size_histogram": {f"<={bound}": count for bound, count in zip(BATCH_SIZE_BUCKETS, self.batch_size_counts)},
+                "max_wait_ms": self.max_wait * 1000.0,
+                "nthread": self.nthread,
+            }
+
+    # --- Worker ---
+    def _run(self):
+        last_batch_size = 0
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            batch = [item]
+            # Merge window only while requests overlap; a lone request is scored immediately
+            wait = self.max_wait if (last_batch_size > 1 or not self._queue.empty()) else 0.0
+            deadline = time.perf_counter() + wait
+            while len(batch) < self.max_batch_size:
+                try:
+                    remaining = deadline - time.perf_counter()
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._queue.put(_STOP)
+                    break
+                batch.append(item)
+            self._execute(batch)
+            last_batch_size = len(batch)
+
+    def _execute(self, batch):
+        started = time.perf_counter()
+        queue_wait = metrics.STAGE_METRICS.histogram("queue_wait")
+        for item in batch:
+            queue_wait.observe(started - item[3])
+        groups = {}
+        for item in batch:
+            groups.setdefault(id(item[0]), []).append(item)
+        n_errors = 0
+        for items in groups.values():
+            price_predictor = items[0][0]
+            try:
+                self._configure(price_predictor)
+                predictions = price_predictor.predict_rows(np.stack([item[1] for item in items]))
+            except Exception as e:
+                n_errors += len(items)
+                for item in items:
+                    item[2].set_exception(e)
+                continue
+            for item, value in zip(items, predictions):
+                item[2].set_result(float(value))
+
+        with self._stats_lock:
+            self.requests += len(batch)
+            self.batches += 1
+            self.errors += n_errors
+            self.largest_batch = max(self.largest_batch, len(batch))
+            self.queue_wait_seconds += sum(started - item[3] for item in batch)
+            bucket = next(i for i, bound in enumerate(BATCH_SIZE_BUCKETS) if len(batch) <= bound or i == len(BATCH_SIZE_BUCKETS) - 1)
+            self.batch_size_counts[bucket] += 1
+
+    def _configure(self, price_predictor):
+        if price_predictor in self._configured:
+            return
+        if price_predictor.is_booster:
+            price_predictor.model.set_param({"nthread": self.nthread})
+        self._configured.add(price_predictor)
@@ -0,0 +1,173 @@
+# benchmarks/app_client.py
+"""Headless Streamlit client for benchmarks: drives `streamlit run app.py` over its websocket.
+
+A session sends what the browser sends when a widget changes: a rerun request carrying the new
+widget value and, when the widget sits inside a fragment, that fragment's id. It then waits for
+the script_finished message. Widgets are looked up by key or label in the deltas the server
+has sent so far, so a widget has to be on screen before it can be changed.
+"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import namedtuple
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.NumberInput_pb2 import NumberInput
+from tornado.websocket import websocket_connect
+
+Widget = namedtuple("Widget", "kind id fragment_id element")
+RunResult = namedtuple("RunResult", "seconds status deltas errors")
+
+WIDGET_KINDS = {"button", "checkbox", "component_instance", "number_input", "selectbox", "text_input"}
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def _healthy(port):
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1):
+            return True
+    except OSError:
+        return False
+
+
+def start_server(script, port, env=None):
+    """`streamlit run script` in headless mode on 127.0.0.1:port; returns once it answers health checks."""
+    if _healthy(port):
+        raise RuntimeError(f"Something is already serving on port {port}; stop it or pick another --port")
+    command = [sys.executable, "-m", "streamlit", "run", script, "--server.headless", "true",
+               "--server.port", str(port), "--server.address", "127.0.0.1",
+               "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false"]
+    server = subprocess.Popen(command, cwd=os.path.dirname(os.path.abspath(script)), env={**os.environ, **(env or {})},
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"streamlit exited with code {server.returncode}")
+        if _healthy(port):
+            return server
+        time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"streamlit did not become healthy on port {port}")
+
+
+def process_cpu_seconds(pid):
+    """User + system CPU time used so far by a process (Linux /proc)."""
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+
+
+def process_rss_bytes(pid):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+class AppSession:
+    """One browser tab. Use `await AppSession(port).open()`, then set()/click() widgets by key or label."""
+
+    def __init__(self, port, timeout=60.0):
+        self.url = f"ws://127.0.0.1:{port}/_stcore/stream"
+        self.timeout = timeout
+        self.widgets = {}
+        self.open_result = None
+        self._connection = None
+
+    async def open(self):
+        """Connect and wait for the first script run; its RunResult (timed from connecting) is open_result."""
+        start = time.perf_counter()
+        self._connection = await websocket_connect(self.url, max_message_size=256 * 2**20)
+        result = await self.rerun()
+        self.open_result = result._replace(seconds=time.perf_counter() - start)
+        return self
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def widget(self, name):
+        try:
+            return self.widgets[name]
+        except KeyError:
+            raise KeyError(f"No widget with key or label {name!r} on screen") from None
+
+    async def set(self, name, value):
+        """Change a widget the way the browser would; selectbox values are given as the displayed option
+        (or its first word, e.g. a postal code)."""
+        widget = self.widget(name)
+        state = BackMsg().rerun_script.widget_states.widgets.add()
+        state.id = widget.id
+        if widget.kind == "checkbox":
+            state.bool_value = bool(value)
+        elif widget.kind == "text_input":
+            state.string_value = str(value)
+        elif widget.kind == "number_input":
+            if widget.element.data_type == NumberInput.INT:
+                state.int_value = int(value)
+            else:
+                state.double_value = float(value)
+        elif widget.kind == "selectbox":
+            options = list(widget.element.options)
+            state.int_value = next(i for i, option in enumerate(options) if option == str(value) or option.startswith(f"{value} "))
+        elif widget.kind == "component_instance":
+            state.json_value = json.dumps(value)
+        else:
+            raise ValueError(f"Cannot set a {widget.kind}; use click()")
+        return await self.rerun(state, widget.fragment_id)
+
+    async def click(self, name):
+        widget = self.widget(name)
+        state = BackMsg().rerun_script.widget_states.widgets.add()
+        state.id = widget.id
+        state.trigger_value = True
+        return await self.rerun(state, widget.fragment_id)
+
+    async def rerun(self, widget_state=None, fragment_id=""):
+        """Send one rerun request and wait until the script (or fragment) run has finished."""
+        message = BackMsg()
+        message.rerun_script.query_string = ""
+        if widget_state is not None:
+            message.rerun_script.widget_states.widgets.append(widget_state)
+        if fragment_id:
+            message.rerun_script.fragment_id = fragment_id
+        start = time.perf_counter()
+        await self._connection.write_message(message.SerializeToString(), binary=True)
+        deltas, errors = 0, []
+        while True:
+            raw = await asyncio.wait_for(self._connection.read_message(), self.timeout)
+            if raw is None:
+                raise ConnectionError("Streamlit closed the websocket")
+            forward = ForwardMsg()
+            forward.ParseFromString(raw)
+            kind = forward.WhichOneof("type")
+            if kind == "delta":
+                deltas += 1
+                self._record(forward.delta, errors)
+            elif kind == "script_finished" and forward.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                return RunResult(time.perf_counter() - start, forward.script_finished, deltas, errors)
+
+    def _record(self, delta, errors):
+        if delta.WhichOneof("type") != "new_element":
+            return
+        element = delta.new_element
+        kind = element.WhichOneof("type")
+        if kind == "exception" or (kind == "alert" and element.alert.format == element.alert.ERROR):
+            errors.append(element.exception.message if kind == "exception" else element.alert.body)
+        if kind not in WIDGET_KINDS:
+            return
+        proto = getattr(element, kind)
+        widget = Widget(kind, proto.id, delta.fragment_id, proto)
+        user_key = proto.id.split("-", 2)[-1]  # ids are "$$WIDGET_ID-<hash>-<key>", key "None" when not given
+        if user_key != "None":
+            self.widgets[user_key] = widget
+        label = getattr(proto, "label", "")
+        if label:
+            self.widgets[label] = widget
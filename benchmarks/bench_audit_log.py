@@ -0,0 +1,115 @@
+# benchmarks/bench_audit_log.py
+"""Request-path cost of the prediction audit log, against writing each prediction synchronously.
+
+Run from the repository root:  python benchmarks/bench_audit_log.py [--records 50000] [--threads 1 4]
+Every record is an API-style input dict. "queued" is AuditLog.record(), timed per call while
+the background writer runs, followed by the rows per second the writer sustains until stop()
+has closed the file. The baselines do the write on the calling thread instead: one JSON line
+appended per prediction, and one single-row Parquet row group per prediction. On one core,
+the worst calls are full garbage collections and GIL hand-overs (5 ms switch interval) to the
+thread that is converting or writing, whichever sink is used.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import audit_log
+
+RECORD = {"floor_area_sqm": 90, "storey_avg": 10, "sale_year": 2025, "sale_month": 6,
+          "flat_type": "4 ROOM", "flat_model": "IMPROVED", "town": "TAMPINES", "lease_commence_date": 1990}
+
+
+def records(n, offset=0):
+    return [dict(RECORD, floor_area_sqm=60 + (offset + i) % 80) for i in range(n)]
+
+
+def time_calls(call, inputs, n_threads):
+    """Per-call seconds of call(record) for every record, split over n_threads threads."""
+    chunks = np.array_split(np.arange(len(inputs)), n_threads)
+    latencies = [None] * n_threads
+
+    def worker(t):
+        timings = np.empty(len(chunks[t]))
+        for j, i in enumerate(chunks[t]):
+            start = time.perf_counter()
+            call(inputs[i])
+            timings[j] = time.perf_counter() - start
+        latencies[t] = timings
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.concatenate(latencies)
+
+
+def queued(directory, inputs, n_threads):
+    log = audit_log.AuditLog(directory, max_pending_rows=len(inputs)).start()
+    start = time.perf_counter()
+    latencies = time_calls(lambda record: log.record("api", "bench", record, 500_000.0, 1.0), inputs, n_threads)
+    log.stop()
+    elapsed = time.perf_counter() - start
+    stats = log.stats()
+    assert stats["written"] == len(inputs) and not stats["dropped"], stats
+    return latencies, stats["written"] / elapsed
+
+
+def json_lines(directory, inputs, n_threads):
+    lock = threading.Lock()
+    with open(os.path.join(directory, "predictions.jsonl"), "a") as f:
+        def write(record):
+            line = json.dumps({"timestamp": time.time(), "source": "api", "model_version": "bench", **record,
+                               "predicted_price": 500_000.0, "latency_ms": 1.0})
+            with lock:
+                f.write(line + "\n")
+                f.flush()
+        return time_calls(write, inputs, n_threads), None
+
+
+def parquet_per_row(directory, inputs, n_threads):
+    import pyarrow.parquet as pq
+    schema = audit_log.audit_schema()
+    sink = audit_log.AuditLog(directory)  # used only for its row normalisation
+    sink._schema = schema
+    lock = threading.Lock()
+    writer = pq.ParquetWriter(os.path.join(directory, "per_row.parquet"), schema, compression="zstd")
+
+    def write(record):
+        table = sink._table([(time.time(), "api", "bench", (record,), (500_000.0,), (None,), 1.0)])
+        with lock:
+            writer.write_table(table)
+
+    latencies = time_calls(write, inputs, n_threads)
+    writer.close()
+    return latencies, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=50_000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    print(f"{args.records:,} records per run, {os.cpu_count()} CPU(s)")
+    print(f"\n{'sink':<30}{'threads':>8}{'p50 (us)':>10}{'p99 (us)':>10}{'p99.9 (us)':>12}{'max (us)':>11}{'writer rows/s':>15}")
+    for n_threads in args.threads:
+        for name, sink in [("queued (AuditLog.record)", queued), ("sync JSON line", json_lines),
+                           ("sync Parquet row group", parquet_per_row)]:
+            n = args.records if sink is not parquet_per_row else min(args.records, 5_000)
+            with tempfile.TemporaryDirectory(prefix="hdb_audit_bench_") as directory:
+                latencies, rows_per_second = sink(directory, records(n), n_threads)
+            p50, p99, p999 = np.percentile(latencies * 1e6, [50, 99, 99.9])
+            throughput = f"{rows_per_second:>15,.0f}" if rows_per_second else f"{'-':>15}"
+            print(f"{name:<30}{n_threads:>8}{p50:>10.1f}{p99:>10.1f}{p999:>12.0f}{latencies.max() * 1e6:>11.0f}{throughput}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# benchmarks/bench_fragment_reruns.py
+"""Server CPU per interaction on the Make Prediction page, measured against a real `streamlit run`.
+
+Run from the repository root:  python benchmarks/bench_fragment_reruns.py [--script app.py] [--repeat 40]
+A headless client (benchmarks/app_client.py) changes one widget at a time, the way a browser does,
+and the server process's CPU time is read from /proc before and after each interaction. Point
+--script at an older copy of app.py, saved next to it, to compare against it.
+"""
+import argparse
+import asyncio
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from app_client import AppSession, process_cpu_seconds, start_server
+
+POSTAL_CODES = ["050004", "520101"]  # different towns and lease years, so every lookup changes both
+PAGES = ["About", "Make Prediction"]
+
+
+async def measure(session, pid, action, repeat, warmup=2):
+    for i in range(warmup):
+        await action(i)
+    cpu, latency, deltas = [], [], []
+    for i in range(repeat):
+        before = process_cpu_seconds(pid)
+        result = await action(i)
+        cpu.append(process_cpu_seconds(pid) - before)
+        latency.append(result.seconds)
+        deltas.append(result.deltas)
+        if result.errors:
+            raise RuntimeError(f"App reported an error: {result.errors[0]}")
+    return np.mean(cpu) * 1000, np.median(latency) * 1000, np.mean(deltas)
+
+
+async def run(port, pid, repeat):
+    session = await AppSession(port).open()
+    menu = next(name for name in session.widgets if name.startswith("main_nav_menu_"))
+
+    async def switch_page(i):
+        return await session.set(menu, PAGES[i % 2])
+
+    async def postal_lookup(i):
+        return await session.set("postal_code_input", POSTAL_CODES[i % 2])
+
+    interactions = [
+        ("change floor area", lambda i: session.set("Floor Area (sqm)", 90 + 5 * (i % 2))),
+        ("press Predict", lambda i: session.click("🔮 Predict Resale Price")),
+        ("type a postal code", postal_lookup),
+        ("switch page", switch_page),
+    ]
+    results = []
+    for name, action in interactions:
+        if name == "type a postal code":
+            await session.set("postal_toggle", True)
+        results.append((name, *await measure(session, pid, action, repeat)))
+    session.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--script", default=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py"))
+    parser.add_argument("--port", type=int, default=8599)
+    parser.add_argument("--repeat", type=int, default=40)
+    args = parser.parse_args()
+
+    server = start_server(args.script, args.port)
+    try:
+        results = asyncio.run(run(args.port, server.pid, args.repeat))
+    finally:
+        server.terminate()
+        server.wait()
+    print(f"{os.path.basename(args.script)}, {args.repeat} interactions each (switch page alternates {' / '.join(PAGES)})")
+    print(f"\n{'interaction':<22}{'server CPU (ms)':>17}{'p50 latency (ms)':>18}{'elements sent':>15}")
+    for name, cpu_ms, p50_ms, deltas in results:
+        print(f"{name:<22}{cpu_ms:>17.1f}{p50_ms:>18.1f}{deltas:>15.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/bench_map_clusters.py
+"""Map payload and query time as the number of located points grows: every marker vs viewport clusters.
+
+Run from the repository root:  python benchmarks/bench_map_clusters.py [--sizes 10000 100000 1000000]
+Points are spread around Singapore with random prices. Each viewport is centred on a random
+point, so the timings include dense areas.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import map_clusters
+
+ZOOMS = [11, 14, map_clusters.MARKER_ZOOM, map_clusters.MAX_ZOOM]
+
+
+def random_points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    latitude = rng.uniform(1.27, 1.45, n)
+    longitude = rng.uniform(103.62, 104.0, n)
+    prices = rng.uniform(250_000, 1_300_000, n).round(-3)
+    return np.array([f"{i:06d}" for i in range(n)]), latitude, longitude, prices
+
+
+def payload_bytes(rows):
+    return len(json.dumps(rows, separators=(",", ":")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'points':>10}{'build (s)':>11}{'all markers (KiB)':>19}   "
+          + "".join(f"{'z' + str(z) + ' rows':>10}{'KiB':>7}{'p50 ms':>8}" for z in ZOOMS))
+    for n in args.sizes:
+        labels, latitude, longitude, prices = random_points(n)
+        start = time.perf_counter()
+        index = map_clusters.ClusterIndex(labels, latitude, longitude, prices)
+        build_s = time.perf_counter() - start
+        everything = [{"postal": p, "latitude": a, "longitude": o, "median_price": v}
+                      for p, a, o, v in zip(labels[:10_000].tolist(), latitude[:10_000].tolist(),
+                                            longitude[:10_000].tolist(), prices[:10_000].tolist())]
+        all_markers_kib = payload_bytes(everything) * (n / len(everything)) / 1024
+
+        rng = np.random.default_rng(1)
+        centres = rng.integers(0, n, args.queries)
+        cells = []
+        for zoom in ZOOMS:
+            latencies, max_rows, max_bytes = [], 0, 0
+            for i in centres:
+                start = time.perf_counter()
+                _, rows = index.query(latitude[i], longitude[i], zoom)
+                latencies.append(time.perf_counter() - start)
+                max_rows = max(max_rows, len(rows))
+                max_bytes = max(max_bytes, payload_bytes(rows))
+            cells.append(f"{max_rows:>10,}{max_bytes / 1024:>7.1f}{np.median(latencies) * 1000:>8.2f}")
+        print(f"{n:>10,}{build_s:>11.2f}{all_markers_kib:>19,.0f}   " + "".join(cells))
+    print(f"\nrows / KiB are the largest viewport seen; clusters below zoom {map_clusters.MARKER_ZOOM}, "
+          f"markers from there when at most {map_clusters.MAX_MARKERS} are in view")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# benchmarks/bench_micro_batching.py
+"""Concurrent single-unit predictions: one booster call per request vs the micro-batching service.
+
+Run from the repository root:  python benchmarks/bench_micro_batching.py [--threads 32 --requests 200]
+Every request uses a distinct row, so the prediction cache is bypassed on both paths.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import predictor
+from batch_service import MAX_WAIT_MS, MicroBatchPredictor
+
+warnings.filterwarnings("ignore", category=UserWarning)
+
+
+def distinct_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    base = predictor.encode_features(90.0, 10.0, 2025, 6, 1990, "TAMPINES", "4 ROOM", "IMPROVED")
+    X = np.tile(base, (n, 1))
+    X[:, predictor.FEATURE_INDEX['floor_area_sqm']] = rng.uniform(20, 300, n)
+    X[:, predictor.FEATURE_INDEX['storey_avg']] = rng.integers(1, 51, n)
+    return X
+
+
+def run(predict, rows_per_thread):
+    """Start one thread per row block, release them together, return (seconds, latencies in us)."""
+    latencies = [np.empty(len(rows)) for rows in rows_per_thread]
+    barrier = threading.Barrier(len(rows_per_thread) + 1)
+
+    def worker(i):
+        barrier.wait()
+        for j, row in enumerate(rows_per_thread[i]):
+            start = time.perf_counter()
+            predict(row)
+            latencies[i][j] = time.perf_counter() - start
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(rows_per_thread))]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, np.concatenate(latencies) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=200, help="requests per thread")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS)
+    args = parser.parse_args()
+
+    price_predictor = predictor.HDBPricePredictor(predictor.load_model(), predictor.load_scaler())
+    price_predictor.warm_up()
+    X = distinct_rows(args.threads * args.requests)
+    rows_per_thread = np.array_split(X, args.threads)
+    service = MicroBatchPredictor(max_wait_ms=args.max_wait_ms).start()
+
+    expected = np.array([price_predictor._predict_row_uncached(row) for row in X[:200]])
+    batched = np.array([service.submit(price_predictor, row) for row in X[:200]])
+    if not np.array_equal(expected, np.array([f.result() for f in batched])):
+        raise SystemExit("Batched predictions differ from the single-row path")
+    service.reset_stats()
+
+    results = {}
+    for name, predict in [("one call per request", price_predictor._predict_row_uncached),
+                          ("micro-batched", lambda row: service.submit(price_predictor, row).result())]:
+        results[name] = run(predict, rows_per_thread)
+    stats = service.stats()
+    service.stop()
+
+    n = args.threads * args.requests
+    print(f"{args.threads} threads x {args.requests} requests, booster nthread={stats['nthread']}, "
+          f"window {stats['max_wait_ms']:.1f} ms")
+    print(f"\n{'path':<24}{'req/s':>12}{'p50 (us)':>12}{'p95 (us)':>12}{'p99 (us)':>12}")
+    for name, (seconds, latencies) in results.items():
+        print(f"{name:<24}{n / seconds:>12,.0f}{np.percentile(latencies, 50):>12.0f}"
+              f"{np.percentile(latencies, 95):>12.0f}{np.percentile(latencies, 99):>12.0f}")
+    print(f"\nmean batch size {stats['mean_batch_size']:.1f}, largest {stats['largest_batch']}, "
+          f"max queue depth {stats['max_queue_depth']}, mean queue wait {stats['mean_queue_wait_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
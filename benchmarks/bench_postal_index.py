@@ -0,0 +1,81 @@
+# benchmarks/bench_postal_index.py
+"""Cold-load time, memory, lookup and prefix-suggest latency: postal_data.json vs the mmap'd postal_index.bin.
+
+Run from the repository root:  python benchmarks/bench_postal_index.py
+The index is (re)built first if it is missing.
+"""
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import postal_index
+import predictor
+
+
+def load_json():
+    with open(postal_index.POSTAL_DATA_PATH, 'r') as f:
+        return json.load(f)
+
+
+def measure_load(fn, repeat=20):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        obj = fn()
+        times.append(time.perf_counter() - start)
+        del obj
+    gc.collect()
+    tracemalloc.start()
+    obj = fn()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, np.median(times) * 1e3, retained, peak
+
+
+def measure_lookup(data, codes, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for code in codes:
+            predictor.validate_postal_code(code, data)
+        best = min(best, time.perf_counter() - start)
+    return best / len(codes) * 1e6
+
+
+def main():
+    if not os.path.exists(postal_index.POSTAL_INDEX_PATH):
+        postal_index.build_postal_index()
+
+    json_data, json_ms, json_retained, json_peak = measure_load(load_json)
+    index, index_ms, index_retained, index_peak = measure_load(postal_index.PostalIndex.open)
+
+    rng = np.random.default_rng(0)
+    codes = list(rng.choice(list(json_data), 5000)) + ["999999"] * 500
+
+    print(f"{'':<22}{'file (KB)':>12}{'load (ms)':>12}{'heap kept (KB)':>16}{'heap peak (KB)':>16}{'lookup (us)':>14}")
+    for name, path, data, ms, retained, peak in [
+        ("postal_data.json", postal_index.POSTAL_DATA_PATH, json_data, json_ms, json_retained, json_peak),
+        ("postal_index.bin", postal_index.POSTAL_INDEX_PATH, index, index_ms, index_retained, index_peak),
+    ]:
+        print(f"{name:<22}{os.path.getsize(path) / 1024:>12.1f}{ms:>12.3f}{retained / 1024:>16.1f}{peak / 1024:>16.1f}"
+              f"{measure_lookup(data, codes):>14.2f}")
+    print("heap figures come from tracemalloc; mmap'd pages are shared page cache and not counted.")
+
+    print(f"\n{'prefix':<10}{'matches':>10}{'suggest (us)':>14}")
+    for prefix in ["5", "52", "5201", "52012"]:
+        _, total = index.suggest(prefix)
+        start = time.perf_counter()
+        for _ in range(2000):
+            index.suggest(prefix)
+        print(f"{prefix:<10}{total:>10}{(time.perf_counter() - start) / 2000 * 1e6:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
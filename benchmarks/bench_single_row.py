@@ -0,0 +1,88 @@
+# benchmarks/bench_single_row.py
+"""Single-row latency: original DMatrix path vs the fused scaler + inplace_predict fast path
+(and a prediction cache hit on top of it).
+
+Run from the repository root:  python benchmarks/bench_single_row.py [--repeat 2000]
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import xgboost as xgb
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import predictor
+
+warnings.filterwarnings("ignore", category=UserWarning)
+
+UNIT = dict(floor_area_sqm=90.0, storey_avg=10.0, sale_year=2025, sale_month=6, lease_commencement_year=1990,
+            town="TAMPINES", flat_type="4 ROOM", flat_model="IMPROVED", postal_code=None)
+
+
+def dmatrix_path(model, scaler):
+    """The predict path as it was written in app.py: dict -> list -> array -> transform -> DMatrix."""
+    final_input_for_model = {feat: 0.0 for feat in predictor.FEATURE_NAMES}
+    final_input_for_model.update({
+        'floor_area_sqm': UNIT['floor_area_sqm'], 'postal': 0.0, 'storey_avg': UNIT['storey_avg'],
+        'sale_year': float(UNIT['sale_year']), 'sale_month': float(UNIT['sale_month']),
+        'remaining_lease_years': float(predictor.remaining_lease_years(UNIT['sale_year'], UNIT['lease_commencement_year'])),
+    })
+    for prefix, value in [("town_", UNIT['town']), ("flat_type_", UNIT['flat_type']), ("flat_model_", UNIT['flat_model'])]:
+        final_input_for_model[f"{prefix}{value}"] = 1.0
+    input_list = [final_input_for_model[feature] for feature in predictor.FEATURE_NAMES]
+    input_df = np.array(input_list).astype(np.float32).reshape(1, -1)
+    input_scaled = scaler.transform(input_df)
+    dtest = xgb.DMatrix(input_scaled, feature_names=predictor.FEATURE_NAMES if model.num_features() == predictor.NUM_FEATURES else None)
+    return float(model.predict(dtest)[0])
+
+
+def fast_path(price_predictor):
+    row = predictor.encode_features(**UNIT, out=price_predictor._raw_row)
+    return price_predictor._predict_row_uncached(row)
+
+
+def cached_path(price_predictor):
+    return price_predictor.predict_features(**UNIT)
+
+
+def time_it(fn, repeat):
+    for _ in range(min(50, repeat)):
+        fn()
+    samples = np.empty(repeat)
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples[i] = time.perf_counter() - start
+    return samples * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--model", default=predictor.MODEL_LOCAL_PATH)
+    parser.add_argument("--scaler", default=predictor.SCALER_PATH)
+    args = parser.parse_args()
+
+    model, scaler = predictor.load_model(args.model), predictor.load_scaler(args.scaler)
+    price_predictor = predictor.HDBPricePredictor(model, scaler)
+
+    baseline, fast = dmatrix_path(model, scaler), fast_path(price_predictor)
+    if not np.isclose(baseline, fast, rtol=1e-5):
+        raise SystemExit(f"Prediction mismatch: DMatrix path {baseline} vs fast path {fast}")
+
+    print(f"{'path':<28}{'p50 (us)':>12}{'p99 (us)':>12}{'mean (us)':>12}")
+    results = {}
+    for name, fn in [("DMatrix (original)", lambda: dmatrix_path(model, scaler)),
+                     ("fused scaler + inplace", lambda: fast_path(price_predictor)),
+                     ("prediction cache hit", lambda: cached_path(price_predictor))]:
+        samples = time_it(fn, args.repeat)
+        results[name] = np.median(samples)
+        print(f"{name:<28}{np.percentile(samples, 50):>12.1f}{np.percentile(samples, 99):>12.1f}{samples.mean():>12.1f}")
+    print(f"speed-up (p50): {results['DMatrix (original)'] / results['fused scaler + inplace']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
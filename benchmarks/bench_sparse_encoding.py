@@ -0,0 +1,99 @@
+# benchmarks/bench_sparse_encoding.py
+"""Dense vs CSR bulk encoding: agreement, encode time, matrix size, predict time and peak memory.
+
+Run from the repository root:  python benchmarks/bench_sparse_encoding.py [--rows 500000]
+Each path runs in a fresh child process; peak memory is sampled from /proc (Linux only).
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import predictor
+
+warnings.filterwarnings("ignore", category=UserWarning)
+
+
+def random_frame(n, seed=0):
+    """Prepared bulk frame (as returned by prepare_bulk_frame) of valid random units."""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'floor_area_sqm': rng.uniform(20, 300, n).round(1), 'storey_avg': rng.integers(1, 51, n),
+        'sale_year': rng.integers(2015, 2036, n), 'sale_month': rng.integers(1, 13, n),
+        'town': rng.choice(predictor.TOWNS, n), 'flat_type': rng.choice(predictor.FLAT_TYPES, n),
+        'flat_model': rng.choice(predictor.FLAT_MODELS, n), 'lease_commence_date': rng.integers(1966, 2023, n),
+    })
+    prepared, errors = predictor.prepare_bulk_frame(df)
+    return prepared.loc[errors == ""]
+
+
+def current_rss_mib():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def run_path(sparse, rows, queue):
+    price_predictor = predictor.HDBPricePredictor(predictor.load_model(), predictor.load_scaler())
+    prepared = random_frame(rows)
+    price_predictor.predict_sparse_frame(prepared[:10])  # build the sparse-safe booster outside the timing
+    baseline, peak, done = current_rss_mib(), [0.0], threading.Event()
+
+    def sample():  # ru_maxrss would still hold the high-water mark of building the frame
+        while not done.is_set():
+            peak[0] = max(peak[0], current_rss_mib())
+            time.sleep(0.005)
+
+    sampler = threading.Thread(target=sample)
+    sampler.start()
+    start = time.perf_counter()
+    if sparse:
+        predictions = price_predictor.predict_sparse_frame(prepared)
+    else:
+        predictions = price_predictor.predict_matrix(predictor.encode_bulk_frame(prepared))
+    elapsed = time.perf_counter() - start
+    done.set()
+    sampler.join()
+    queue.put((elapsed, peak[0] - baseline, predictions))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=500_000)
+    args = parser.parse_args()
+
+    prepared = random_frame(args.rows)
+    scale, offset, clip_range = predictor.scaler_affine(predictor.load_scaler(), dtype=np.float64)
+    start = time.perf_counter()
+    dense = predictor.encode_bulk_frame(prepared)
+    dense_encode = time.perf_counter() - start
+    start = time.perf_counter()
+    csr = predictor.encode_bulk_sparse(prepared, scale, offset, clip_range)
+    sparse_encode = time.perf_counter() - start
+    csr_bytes = csr.data.nbytes + csr.indices.nbytes + csr.indptr.nbytes
+
+    results = {}
+    ctx = multiprocessing.get_context("spawn")
+    for name, sparse in [("dense", False), ("CSR", True)]:
+        queue = ctx.Queue()
+        process = ctx.Process(target=run_path, args=(sparse, args.rows, queue))
+        process.start()
+        results[name] = queue.get()
+        process.join()
+    max_abs = float(np.abs(results["dense"][2] - results["CSR"][2]).max())
+    print(f"agreement on {args.rows:,} rows: max |diff| = {max_abs:.6g}")
+
+    print(f"\n{'path':<8}{'encode (s)':>12}{'matrix (MiB)':>14}{'encode+predict (s)':>20}{'peak growth (MiB)':>19}")
+    for name, encode_s, nbytes in [("dense", dense_encode, dense.nbytes), ("CSR", sparse_encode, csr_bytes)]:
+        total_s, peak_mib, _ = results[name]
+        print(f"{name:<8}{encode_s:>12.2f}{nbytes / 2**20:>14.1f}{total_s:>20.2f}{peak_mib:>19.0f}")
+
+
+if __name__ == "__main__":
+    main()
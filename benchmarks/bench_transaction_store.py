@@ -0,0 +1,68 @@
+# benchmarks/bench_transaction_store.py
+"""Latest-N transactions per postal code: scanning a DataFrame vs the memory-mapped transaction store.
+
+Run from the repository root:  python benchmarks/bench_transaction_store.py resale_transactions.csv [--lookups 2000]
+The store is built into a temporary file from the same input, so results can be compared row for row.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import transaction_store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="CSV or Parquet file of resale transactions with a postal column")
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--latest", type=int, default=transaction_store.DEFAULT_LATEST)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        path, _ = transaction_store.build_transaction_store(args.input, os.path.join(tmp, "transactions.bin"))
+        build_s = time.perf_counter() - start
+        start = time.perf_counter()
+        store = transaction_store.TransactionStore.open(path)
+        open_ms = (time.perf_counter() - start) * 1000.0
+
+        df = transaction_store._read_table(args.input)
+        df['postal'] = df['postal'].astype(str).str.strip().str.zfill(6)
+        codes = np.random.default_rng(0).choice(df['postal'].unique(), args.lookups)
+
+        def scan(code):
+            rows = df[df['postal'] == code]
+            return rows.sort_values('month', ascending=False, kind='stable').head(args.latest)
+
+        for code in codes[:50]:
+            expected = scan(code)['resale_price'].to_numpy(dtype=np.float32)
+            got = store.latest(code, args.latest)['resale_price']
+            if sorted(expected) != sorted(got):  # same months may tie in a different order
+                raise SystemExit(f"Store and scan disagree for postal code {code}")
+
+        results = {}
+        for name, fetch in [("DataFrame scan", scan), ("store latest()", lambda c: store.latest(c, args.latest)),
+                            ("store latest_records()", lambda c: store.latest_records(c, args.latest))]:
+            latencies = np.empty(len(codes))
+            for i, code in enumerate(codes):
+                start = time.perf_counter()
+                fetch(code)
+                latencies[i] = time.perf_counter() - start
+            results[name] = latencies * 1e6
+
+        print(f"{len(store):,} transactions, {len(store.postal):,} postal codes; "
+              f"store {os.path.getsize(path) / 2**20:.1f} MiB, built in {build_s:.1f} s, opened in {open_ms:.2f} ms")
+        print(f"\n{'latest ' + str(args.latest):<26}{'p50 (us)':>12}{'p99 (us)':>12}")
+        for name, latencies in results.items():
+            print(f"{name:<26}{np.percentile(latencies, 50):>12.1f}{np.percentile(latencies, 99):>12.1f}")
+        del store
+
+
+if __name__ == "__main__":
+    main()
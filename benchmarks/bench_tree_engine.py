@@ -0,0 +1,97 @@
+# benchmarks/bench_tree_engine.py
+"""NumPy tree engine vs xgboost DMatrix predict: agreement, single-row latency and batch throughput.
+
+Run from the repository root:  python benchmarks/bench_tree_engine.py [--rows 100000]
+model_trees.npz is exported from model.bst first if it is missing or stale.
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+import xgboost as xgb
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import predictor
+import tree_engine
+
+warnings.filterwarnings("ignore", category=UserWarning)
+
+
+def random_units(n, seed=0):
+    """Encoded (unscaled) rows spanning the app's input ranges."""
+    rng = np.random.default_rng(seed)
+    X = np.zeros((n, predictor.NUM_FEATURES), dtype=np.float32)
+    idx = predictor.FEATURE_INDEX
+    sale_year = rng.integers(2015, 2036, n)
+    X[:, idx['floor_area_sqm']] = rng.uniform(20, 300, n)
+    X[:, idx['storey_avg']] = rng.integers(1, 51, n)
+    X[:, idx['sale_year']] = sale_year
+    X[:, idx['sale_month']] = rng.integers(1, 13, n)
+    X[:, idx['remaining_lease_years']] = predictor.remaining_lease_years(sale_year, rng.integers(1966, 2023, n))
+    rows = np.arange(n)
+    for prefix, values in [("town_", predictor.TOWNS), ("flat_type_", predictor.FLAT_TYPES), ("flat_model_", predictor.FLAT_MODELS)]:
+        cols = np.array([idx[prefix + v] for v in values])
+        X[rows, cols[rng.integers(0, len(cols), n)]] = 1.0
+    return X
+
+
+def dmatrix_predict(booster, X_scaled):
+    return booster.predict(xgb.DMatrix(X_scaled, feature_names=predictor.FEATURE_NAMES))
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--single-repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    if not os.path.exists(tree_engine.TREE_MODEL_PATH):
+        tree_engine.export_model()
+    ensemble = tree_engine.TreeEnsemble.load()
+    try:
+        predictor.check_tree_export(ensemble, tree_engine.TREE_MODEL_PATH)
+    except ValueError:
+        tree_engine.export_model()
+        ensemble = tree_engine.TreeEnsemble.load()
+    booster = predictor.load_model()
+    scaler = predictor.load_scaler()
+
+    X_scaled = scaler.transform(random_units(args.rows)).astype(np.float32)
+    reference, engine = dmatrix_predict(booster, X_scaled), ensemble.predict(X_scaled)
+    max_abs = float(np.abs(reference - engine).max())
+    print(f"agreement on {args.rows:,} rows: max |diff| = {max_abs:.6g}, "
+          f"allclose(rtol=1e-6) = {np.allclose(reference, engine, rtol=1e-6)}")
+
+    one = X_scaled[:1]
+    single = {}
+    for name, fn in [("xgboost DMatrix", lambda: dmatrix_predict(booster, one)), ("NumPy engine", lambda: ensemble.predict(one))]:
+        samples = np.empty(args.single_repeat)
+        for i in range(args.single_repeat):
+            start = time.perf_counter()
+            fn()
+            samples[i] = time.perf_counter() - start
+        single[name] = samples * 1e6
+
+    batch = {"xgboost DMatrix": best_of(lambda: dmatrix_predict(booster, X_scaled), 3),
+             "NumPy engine": best_of(lambda: ensemble.predict(X_scaled), 3)}
+
+    print(f"\n{'engine':<20}{'1-row p50 (us)':>16}{'1-row p99 (us)':>16}{'batch rows/s':>16}")
+    for name in single:
+        print(f"{name:<20}{np.percentile(single[name], 50):>16.1f}{np.percentile(single[name], 99):>16.1f}"
+              f"{args.rows / batch[name]:>16,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+# benchmarks/load_test.py
+"""Load test: N simulated users driving a headless `streamlit run app.py` at the same time.
+
+Run from the repository root:  python benchmarks/load_test.py [--users 10] [--duration 60] [--think-time 1.0]
+The app and its data files are copied into a temporary directory next to a stand-in model.bst.
+The stand-in is an XGBoost model trained on random rows with the app's 60 features. Pass
+--model to use a real model instead. The working tree is never written to.
+
+Each user opens a session and then loops until the duration is up. One loop edits the floor
+area, turns on the postal toggle and types a random valid postal code, presses Predict, then
+switches to another page and back. Each user waits --think-time (with +/-50% jitter) between
+actions. Users start spread over --ramp-up seconds. Every action is timed until the server
+reports the script (or fragment) run finished. The report gives throughput, p50/p95/p99 per
+action, server CPU per action and server memory per session. With --max-p95-ms the exit
+status is 1 when any action's p95 is over the limit, for use as a regression check.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import numpy as np
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import predictor
+from app_client import AppSession, process_cpu_seconds, process_rss_bytes, start_server
+
+DATA_FILES = ["scaler.joblib", "postal_data.json", "postal_index.bin", "transactions.bin"]
+OTHER_PAGES = ["Market Overview", "Transaction Map", "About"]
+ACTIONS = ["open session", "edit input", "postal lookup", "predict", "page switch"]
+PREDICT_LABEL = "🔮 Predict Resale Price"
+
+
+def write_stand_in_model(path, n_trees=200, max_depth=6, seed=0):
+    """A booster with the production feature layout and a roughly realistic price range."""
+    import warnings
+    import xgboost as xgb
+    rng = np.random.default_rng(seed)
+    X = rng.random((5000, predictor.NUM_FEATURES)).astype(np.float32)
+    y = (300_000 + 200_000 * X[:, 0] + 50_000 * X[:, 2] - 30_000 * X[:, 5]
+         + 100_000 * X[:, predictor.ONE_HOT_COLUMNS].sum(axis=1) + rng.normal(0, 10_000, len(X)))
+    booster = xgb.train({"max_depth": max_depth, "eta": 0.1, "nthread": 1},
+                        xgb.DMatrix(X, label=y, feature_names=predictor.FEATURE_NAMES), n_trees)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # xgboost notes that a .bst name is saved as UBJSON, which load_model reads
+        booster.save_model(path)
+
+
+def prepare_app_dir(target, model=None, n_trees=200):
+    """Copy the app's modules and data files into `target` and add the model to serve."""
+    for name in sorted(os.listdir(REPO_DIR)):
+        if name.endswith(".py") or name in DATA_FILES:
+            shutil.copy2(os.path.join(REPO_DIR, name), target)
+    if model:
+        shutil.copy2(model, os.path.join(target, "model.bst"))
+    else:
+        write_stand_in_model(os.path.join(target, "model.bst"), n_trees=n_trees)
+    return os.path.join(target, "app.py")
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.examples = {}
+
+    def add(self, action, result):
+        self.latencies[action].append(result.seconds)
+        if result.errors:
+            self.errors[action] += 1
+            self.examples.setdefault(action, result.errors[0])
+
+
+async def simulate_user(port, recorder, postal_codes, deadline, think_time, start_delay, rng):
+    async def pause():
+        if think_time:
+            await asyncio.sleep(think_time * rng.uniform(0.5, 1.5))
+
+    await asyncio.sleep(start_delay)
+    session = await AppSession(port).open()
+    recorder.add("open session", session.open_result)
+    menu = next(name for name in session.widgets if name.startswith("main_nav_menu_"))
+    try:
+        while time.monotonic() < deadline:
+            await pause()
+            recorder.add("edit input", await session.set("Floor Area (sqm)", rng.randrange(60, 141)))
+            await pause()
+            recorder.add("edit input", await session.set("postal_toggle", True))
+            recorder.add("postal lookup", await session.set("postal_code_input", rng.choice(postal_codes)))
+            await pause()
+            recorder.add("predict", await session.click(PREDICT_LABEL))
+            await pause()
+            recorder.add("page switch", await session.set(menu, rng.choice(OTHER_PAGES)))
+            await pause()
+            recorder.add("page switch", await session.set(menu, "Make Prediction"))
+    finally:
+        session.close()
+
+
+async def run_load(port, pid, args, postal_codes):
+    # One session visits every page first, so cold-start loads stay out of the latencies and the memory baseline
+    warm = await AppSession(port).open()
+    await warm.click(PREDICT_LABEL)
+    menu = next(name for name in warm.widgets if name.startswith("main_nav_menu_"))
+    for page in OTHER_PAGES + ["Make Prediction"]:
+        await warm.set(menu, page)
+    baseline_rss = process_rss_bytes(pid)
+    warm.close()
+
+    recorder = Recorder()
+    cpu_before = process_cpu_seconds(pid)
+    start = time.monotonic()
+    deadline = start + args.ramp_up + args.duration
+    peak_rss = [baseline_rss]
+
+    async def sample_memory():
+        while time.monotonic() < deadline:
+            peak_rss[0] = max(peak_rss[0], process_rss_bytes(pid))
+            await asyncio.sleep(0.5)
+
+    sampler = asyncio.ensure_future(sample_memory())
+    await asyncio.gather(*[
+        simulate_user(port, recorder, postal_codes, deadline, args.think_time,
+                      args.ramp_up * i / max(args.users, 1), random.Random(args.seed + i))
+        for i in range(args.users)
+    ])
+    elapsed = time.monotonic() - start
+    await sampler
+    return recorder, elapsed, process_cpu_seconds(pid) - cpu_before, baseline_rss, peak_rss[0]
+
+
+def report(args, recorder, elapsed, cpu_seconds, baseline_rss, peak_rss, model_name):
+    counted = [a for a in ACTIONS if a != "open session"]
+    n_actions = sum(len(recorder.latencies[a]) for a in counted)
+    print(f"{args.users} users for {args.duration:.0f} s after a {args.ramp_up:.0f} s ramp-up, think time {args.think_time:.1f} s, "
+          f"{model_name}, {os.cpu_count()} CPU(s)")
+    print(f"{n_actions:,} actions in {elapsed:.1f} s: {n_actions / elapsed:.1f} actions/s, "
+          f"server CPU {cpu_seconds / max(n_actions, 1) * 1000:.1f} ms per action ({cpu_seconds / elapsed:.0%} of one core)")
+    print(f"\n{'action':<16}{'count':>8}{'p50 (ms)':>10}{'p95 (ms)':>10}{'p99 (ms)':>10}{'max (ms)':>10}{'errors':>8}")
+    rows = [(a, recorder.latencies[a]) for a in ACTIONS] + [("all actions", sum((recorder.latencies[a] for a in counted), []))]
+    worst_p95 = 0.0
+    for action, latencies in rows:
+        if not latencies:
+            continue
+        ms = np.asarray(latencies) * 1000
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+        if action != "all actions":
+            worst_p95 = max(worst_p95, p95)
+        errors = recorder.errors[action] if action in recorder.errors else ""
+        print(f"{action:<16}{len(ms):>8,}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{ms.max():>10.1f}{errors:>8}")
+    for action, message in recorder.examples.items():
+        print(f"first error in {action}: {message}")
+    print(f"\nserver RSS {baseline_rss / 2**20:.0f} MiB with every page warmed by one session, peak {peak_rss / 2**20:.0f} MiB "
+          f"with {args.users} sessions: {(peak_rss - baseline_rss) / max(args.users, 1) / 2**20:.2f} MiB per session")
+    return worst_p95
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds of load after the ramp-up")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="seconds over which users join")
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean pause between actions; 0 for saturation")
+    parser.add_argument("--model", help="model.bst to serve instead of the generated stand-in")
+    parser.add_argument("--stand-in-trees", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8598)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-p95-ms", type=float, help="exit with status 1 if any action's p95 is above this")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="hdb_load_test_") as app_dir:
+        script = prepare_app_dir(app_dir, args.model, args.stand_in_trees)
+        with open(os.path.join(app_dir, "postal_data.json")) as f:
+            postal_codes = sorted(json.load(f))
+        server = start_server(script, args.port)
+        try:
+            results = asyncio.run(run_load(args.port, server.pid, args, postal_codes))
+        finally:
+            server.terminate()
+            server.wait()
+    model_name = f"model {os.path.basename(args.model)}" if args.model else f"stand-in model ({args.stand_in_trees} trees)"
+    worst_p95 = report(args, *results, model_name)
+    if args.max_p95_ms is not None and worst_p95 > args.max_p95_ms:
+        print(f"\nFAILED: p95 {worst_p95:.1f} ms is above --max-p95-ms {args.max_p95_ms:.1f}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+# map_clusters.py
+"""Zoom-level grid aggregation of postal code locations for the transaction map.
+
+Points (one per postal code with a known position) are projected to Web Mercator once. For
+every zoom level from MIN_ZOOM to MAX_ZOOM they are bucketed into square cells of CELL_PIXELS
+screen pixels. Each cell keeps its point count, centroid and median price. All of this is
+precomputed when the index is built, so a query is only the following:
+
+  * find the cells inside the viewport: a binary search on the sorted cell columns, then a
+    row filter. At most (width / CELL_PIXELS + 1) * (height / CELL_PIXELS + 1) cells are
+    visible, so the payload has a fixed ceiling however many points there are.
+  * from MARKER_ZOOM up, return the individual points in the viewport instead, as long as
+    there are at most MAX_MARKERS of them. Markers are only ever sent for a small area.
+"""
+import math
+
+import numpy as np
+
+TILE_PIXELS = 256
+CELL_PIXELS = 80
+MIN_ZOOM = 10
+MAX_ZOOM = 17
+MARKER_ZOOM = 16
+MAX_MARKERS = 500
+VIEWPORT_PIXELS = (1200, 600)  # .stApp max-width x map height; narrower (mobile) screens see a subset
+VIEWPORT_MARGIN = 0.25 # fraction of the viewport added on each side so small client-side pans stay filled
+
+
+def mercator(latitude, longitude):
+    """Web Mercator (x, y) in [0, 1), y growing southwards as in map tiles."""
+    latitude = np.clip(np.asarray(latitude, dtype=np.float64), -85.05112878, 85.05112878)
+    x = (np.asarray(longitude, dtype=np.float64) + 180.0) / 360.0
+    sin_lat = np.sin(np.radians(latitude))
+    y = 0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return x, y
+
+
+def viewport_bounds(latitude, longitude, zoom, viewport_pixels=VIEWPORT_PIXELS, margin=VIEWPORT_MARGIN):
+    """(x0, x1, y0, y1) in Mercator units of a viewport centred on (latitude, longitude)."""
+    cx, cy = mercator(latitude, longitude)
+    world_pixels = TILE_PIXELS * 2.0 ** zoom
+    half_w = viewport_pixels[0] * (0.5 + margin) / world_pixels
+    half_h = viewport_pixels[1] * (0.5 + margin) / world_pixels
+    return float(cx - half_w), float(cx + half_w), float(cy - half_h), float(cy + half_h)
+
+
+def _finite_or_none(value):
+    return value if math.isfinite(value) else None  # NaN is not valid JSON
+
+
+def group_medians(groups, values, n_groups):
+    """Median of `values` per group id in [0, n_groups), ignoring NaN; NaN for empty groups."""
+    finite = np.isfinite(values)
+    groups, values = groups[finite], values[finite]
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    medians = np.full(n_groups, np.nan)
+    has = counts > 0
+    lo = starts[has] + (counts[has] - 1) // 2
+    hi = starts[has] + counts[has] // 2
+    medians[has] = (values[lo] + values[hi]) / 2.0
+    return medians
+
+
+class GridLevel:
+    """Cells of one zoom level, sorted by (cell_x, cell_y)."""
+
+    def __init__(self, zoom, x, y, latitude, longitude, values):
+        self.zoom = zoom
+        self.cell_size = CELL_PIXELS / (TILE_PIXELS * 2.0 ** zoom)
+        cell_x = np.floor(x / self.cell_size).astype(np.int64)
+        cell_y = np.floor(y / self.cell_size).astype(np.int64)
+        keys, cell_of_point = np.unique(cell_x * (1 << 32) + cell_y, return_inverse=True)
+        self.cell_x = keys >> 32
+        self.cell_y = keys & 0xFFFFFFFF
+        self.count = np.bincount(cell_of_point, minlength=len(keys))
+        self.latitude = np.bincount(cell_of_point, weights=latitude, minlength=len(keys)) / self.count
+        self.longitude = np.bincount(cell_of_point, weights=longitude, minlength=len(keys)) / self.count
+        self.median = group_medians(cell_of_point, values, len(keys))
+
+    def __len__(self):
+        return len(self.count)
+
+    def query(self, x0, x1, y0, y1):
+        """Indices of the cells overlapping the Mercator box."""
+        lo = np.searchsorted(self.cell_x, math.floor(x0 / self.cell_size), side='left')
+        hi = np.searchsorted(self.cell_x, math.floor(x1 / self.cell_size), side='right')
+        cell_y = self.cell_y[lo:hi]
+        inside = (cell_y >= math.floor(y0 / self.cell_size)) & (cell_y <= math.floor(y1 / self.cell_size))
+        return lo + np.flatnonzero(inside)
+
+
+class ClusterIndex:
+    """Precomputed cluster grids for every zoom level plus an x-sorted point list for markers."""
+
+    def __init__(self, labels, latitude, longitude, values, counts=None, groups=None):
+        latitude = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+        located = np.isfinite(latitude) & np.isfinite(longitude)
+        x, y = mercator(latitude[located], longitude[located])
+        order = np.argsort(x, kind='stable')
+        self.x, self.y = x[order], y[order]
+        self.labels = np.asarray(labels)[located][order]
+        self.latitude = latitude[located][order]
+        self.longitude = longitude[located][order]
+        self.values = np.asarray(values, dtype=np.float64)[located][order]
+        self.counts = (np.zeros(len(located), dtype=np.int64) if counts is None else np.asarray(counts))[located][order]
+        self.groups = None if groups is None else np.asarray(groups)[located][order]
+        self.levels = {zoom: GridLevel(zoom, self.x, self.y, self.latitude, self.longitude, self.values)
+                       for zoom in range(MIN_ZOOM, MAX_ZOOM + 1)}
+
+    def __len__(self):
+        return len(self.x)
+
+    def centre(self, group=None):
+        """(latitude, longitude) centroid of all points, or of the points in `group` (e.g. a town)."""
+        mask = slice(None)
+        if group is not None and self.groups is not None and np.any(self.groups == group):
+            mask = self.groups == group
+        return float(self.latitude[mask].mean()), float(self.longitude[mask].mean())
+
+    def query(self, latitude, longitude, zoom, viewport_pixels=VIEWPORT_PIXELS):
+        """("markers" | "clusters", rows) for the viewport centred on (latitude, longitude).
+
+        Marker rows: {postal, latitude, longitude, median_price, transactions}.
+        Cluster rows: {latitude, longitude, count, median_price}."""
+        zoom = int(min(max(zoom, MIN_ZOOM), MAX_ZOOM))
+        x0, x1, y0, y1 = viewport_bounds(latitude, longitude, zoom, viewport_pixels)
+        if zoom >= MARKER_ZOOM:
+            lo, hi = np.searchsorted(self.x, [x0, x1])
+            inside = lo + np.flatnonzero((self.y[lo:hi] >= y0) & (self.y[lo:hi] <= y1))
+            if len(inside) <= MAX_MARKERS:
+                return "markers", [
+                    {"postal": str(label), "latitude": lat, "longitude": lon, "median_price": _finite_or_none(price),
+                     "transactions": n}
+                    for label, lat, lon, price, n in zip(self.labels[inside].tolist(), self.latitude[inside].tolist(),
+                                                         self.longitude[inside].tolist(), self.values[inside].tolist(),
+                                                         self.counts[inside].tolist())
+                ]
+        level = self.levels[zoom]
+        cells = level.query(x0, x1, y0, y1)
+        return "clusters", [
+            {"latitude": lat, "longitude": lon, "count": n, "median_price": _finite_or_none(price)}
+            for lat, lon, n, price in zip(level.latitude[cells].tolist(), level.longitude[cells].tolist(),
+                                          level.count[cells].tolist(), level.median[cells].tolist())
+        ]
@@ -0,0 +1,128 @@
+# market_matrix.py
+"""Precomputed baseline prices for every town x flat type x flat model combination.
+
+Each cell prices a reference unit (REFERENCE_FLOOR_AREA_SQM, REFERENCE_STOREY, the town's
+median lease commencement year from the postal data) for one sale month. Snapshots are
+stored in one Parquet file keyed by (model_version, sale_year, sale_month). A refresh only
+rescores cells whose encoded inputs or model version differ from what is already stored.
+
+Precompute from the command line (e.g. nightly or at image build):
+    python market_matrix.py [--year 2025 --month 6]
+"""
+import argparse
+import hashlib
+import itertools
+import os
+from datetime import datetime
+
+import numpy as np
+
+import predictor
+
+MARKET_MATRIX_PATH = os.path.join(predictor.BASE_DIR, "market_matrix.parquet")
+REFERENCE_FLOOR_AREA_SQM = 90.0
+REFERENCE_STOREY = 10.0
+DEFAULT_LEASE_COMMENCEMENT_YEAR = 1990
+MAX_SNAPSHOTS = 24
+SNAPSHOT_KEY = ['model_version', 'sale_year', 'sale_month']
+CELL_KEY = ['town', 'flat_type', 'flat_model']
+
+
+def reference_lease_years(postal_data):
+    """Median lease commencement year per town, falling back to DEFAULT_LEASE_COMMENCEMENT_YEAR."""
+    by_town = {}
+    for code in postal_data:
+        info = postal_data[code][0]
+        by_town.setdefault(info["town"], []).append(int(info["lease_commence_date"]))
+    return {town: int(np.median(by_town[town])) if town in by_town else DEFAULT_LEASE_COMMENCEMENT_YEAR
+            for town in predictor.TOWNS}
+
+
+def build_cells(sale_year, sale_month, postal_data):
+    """Cartesian product of TOWNS x FLAT_TYPES x FLAT_MODELS as a prepared frame plus its encoded matrix."""
+    import pandas as pd  # imported lazily, like predictor, so app.py can import this module cheaply
+
+    lease_years = reference_lease_years(postal_data)
+    cells = pd.DataFrame(list(itertools.product(predictor.TOWNS, predictor.FLAT_TYPES, predictor.FLAT_MODELS)),
+                         columns=CELL_KEY)
+    cells['floor_area_sqm'] = REFERENCE_FLOOR_AREA_SQM
+    cells['storey_avg'] = REFERENCE_STOREY
+    cells['sale_year'] = sale_year
+    cells['sale_month'] = sale_month
+    cells['lease_commence_date'] = cells['town'].map(lease_years)
+    cells['remaining_lease_years'] = predictor.remaining_lease_years(sale_year, cells['lease_commence_date'])
+    cells['postal'] = None
+    X = predictor.encode_bulk_frame(cells)
+    return cells, X
+
+
+def input_hashes(X, model_version):
+    prefix = model_version.encode("utf-8")
+    return [hashlib.sha1(prefix + row.tobytes()).hexdigest() for row in np.ascontiguousarray(X, dtype=np.float32)]
+
+
+def load_store(path=MARKET_MATRIX_PATH):
+    if not os.path.exists(path):
+        return None
+    import pandas as pd
+    return pd.read_parquet(path)
+
+
+def get_snapshot(store, model_version, sale_year, sale_month):
+    if store is None or store.empty:
+        return None
+    mask = (store['model_version'] == model_version) & (store['sale_year'] == sale_year) & (store['sale_month'] == sale_month)
+    snapshot = store.loc[mask]
+    return snapshot if len(snapshot) else None
+
+
+def refresh(price_predictor, sale_year, sale_month, path=MARKET_MATRIX_PATH):
+    """Bring the (model version, sale month) snapshot up to date and return (snapshot, n_rescored).
+
+    Cells are reused from any stored snapshot with an identical input hash, so only
+    cells whose inputs or model changed are scored, all in one batch."""
+    import pandas as pd
+
+    cells, X = build_cells(sale_year, sale_month, price_predictor.postal_data)
+    cells['input_hash'] = input_hashes(X, price_predictor.model_version)
+
+    store = load_store(path)
+    known = {}
+    if store is not None and not store.empty:
+        known = dict(zip(store['input_hash'], store['predicted_price']))
+    cached_prices = cells['input_hash'].map(known)
+    stale = cached_prices.isna().to_numpy()
+    prices = cached_prices.to_numpy(dtype=np.float64)
+    if stale.any():
+        prices[stale] = price_predictor.predict_matrix(X[stale])
+
+    snapshot = cells[CELL_KEY + ['floor_area_sqm', 'storey_avg', 'lease_commence_date', 'input_hash']].copy()
+    snapshot['model_version'] = price_predictor.model_version
+    snapshot['sale_year'] = sale_year
+    snapshot['sale_month'] = sale_month
+    snapshot['predicted_price'] = prices
+    snapshot['computed_at'] = pd.Timestamp.now()
+
+    if stale.any() or get_snapshot(store, price_predictor.model_version, sale_year, sale_month) is None:
+        if store is not None and not store.empty:
+            same = (store[SNAPSHOT_KEY] == [price_predictor.model_version, sale_year, sale_month]).all(axis=1)
+            store = pd.concat([store.loc[~same], snapshot], ignore_index=True)
+        else:
+            store = snapshot
+        recent = store[SNAPSHOT_KEY].drop_duplicates().tail(MAX_SNAPSHOTS)
+        store = store.merge(recent, on=SNAPSHOT_KEY)
+        tmp_path = path + ".tmp"
+        store.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    return snapshot, int(stale.sum())
+
+
+if __name__ == "__main__":
+    now = datetime.now()
+    parser = argparse.ArgumentParser(description="Precompute the town x flat type x flat model price matrix")
+    parser.add_argument("--year", type=int, default=now.year)
+    parser.add_argument("--month", type=int, default=now.month)
+    parser.add_argument("--output", default=MARKET_MATRIX_PATH)
+    args = parser.parse_args()
+    snapshot, n_rescored = refresh(predictor.HDBPricePredictor.from_files(), args.year, args.month, args.output)
+    print(f"{len(snapshot):,} cells for {args.year}-{args.month:02d}, {n_rescored:,} rescored -> {args.output}")
@@ -0,0 +1,180 @@
+# metrics.py
+"""Per-stage latency histograms for the predict path, exported in the Prometheus text format.
+
+Stages recorded by predictor.py, batch_service.py, audit_log.py, api.py and app.py:
+    validate_input        required fields and value parsing (app form checks, encode_record)
+    validate_postal_code  postal code format check and lookup
+    encode                one-hot encoding into a feature row
+    scaler_transform      scaler.transform, or the fused affine scaling on the fast paths
+    dmatrix               xgb.DMatrix construction (batch and contribution paths only)
+    predict               booster / tree engine predict call
+    explain               pred_contribs call
+    queue_wait            time a single prediction waited in the micro-batching queue
+    render                prediction card rendering in the app
+    request               whole API request, parsing to response (encloses the stages it runs)
+    transaction_lookup    latest transactions of a postal code on the map page
+    map_aggregate         clusters or markers for the map viewport
+    map_render            building and sending the map
+    audit_write           one audit log row group, on the background writer thread
+    load_model, load_scaler, load_postal_data, load_transaction_store, load_cluster_index   artifact loads
+
+Every stage except `request` times only its own work, so those per-stage sums add up. `request`
+is the enclosing total of an API request and already includes the stages run inside it, so
+compare it with their sum rather than adding it in. Everything is recorded in the process-wide
+STAGE_METRICS. api.py serves it at GET /metrics. The Streamlit app serves it from a small side
+server when HDB_METRICS_PORT is set, and shows p50/p99 per stage in the sidebar.
+"""
+import bisect
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRIC_NAME = "hdb_stage_latency_seconds"
+# Upper bounds in seconds: 10 us to 10 s, three steps per decade
+LATENCY_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class LatencyHistogram:
+    """Cumulative-bucket histogram of durations in seconds, safe to update from any thread."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is the +Inf overflow
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def snapshot(self):
+        """(per-bucket counts, sum, max) read under the lock."""
+        with self._lock:
+            return list(self.counts), self.sum, self.max
+
+    @staticmethod
+    def quantile(q, buckets, counts):
+        """Estimate the q-quantile the way Prometheus' histogram_quantile() does:
+        linear interpolation inside the bucket that holds the target rank."""
+        total = sum(counts)
+        if total == 0:
+            return math.nan
+        rank = q * total
+        cumulative = 0
+        for i, count in enumerate(counts):
+            if count and cumulative + count >= rank:
+                if i == len(buckets):  # +Inf bucket: the largest finite bound is the best estimate
+                    return buckets[-1]
+                lower = buckets[i - 1] if i > 0 else 0.0
+                return lower + (buckets[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return buckets[-1]
+
+
+class _StageTimer:
+    __slots__ = ("_histogram", "_start")
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._histogram.observe(time.perf_counter() - self._start)
+        return False
+
+
+class StageMetrics:
+    """One LatencyHistogram per stage name, created on first use."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, LatencyHistogram(self.buckets))
+        return histogram
+
+    def stage(self, name):
+        """Context manager that records the wall-clock time of its block under `name`."""
+        return _StageTimer(self.histogram(name))
+
+    def observe(self, name, seconds):
+        self.histogram(name).observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+
+    def summary(self):
+        """[{stage, count, mean_ms, p50_ms, p99_ms, max_ms}] in first-recorded order."""
+        rows = []
+        for name, histogram in list(self._histograms.items()):
+            counts, total, maximum = histogram.snapshot()
+            n = sum(counts)
+            # Interpolation inside a bucket can overshoot the largest observation; cap at it
+            p50, p99 = (min(LatencyHistogram.quantile(q, self.buckets, counts), maximum) for q in (0.50, 0.99))
+            rows.append({"stage": name, "count": n, "mean_ms": 1000.0 * total / n if n else math.nan,
+                         "p50_ms": 1000.0 * p50, "p99_ms": 1000.0 * p99, "max_ms": 1000.0 * maximum})
+        return rows
+
+    def render_prometheus(self):
+        """All histograms in the Prometheus text exposition format (version 0.0.4)."""
+        lines = [f"# HELP {METRIC_NAME} Wall-clock latency of each prediction stage.",
+                 f"# TYPE {METRIC_NAME} histogram"]
+        for name, histogram in sorted(self._histograms.items()):
+            counts, total, _ = histogram.snapshot()
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(float(bound))
+                lines.append(f'{METRIC_NAME}_bucket{{stage="{label}",le="{le}"}} {cumulative}')
+            lines.append(f'{METRIC_NAME}_sum{{stage="{label}"}} {total!r}')
+            lines.append(f'{METRIC_NAME}_count{{stage="{label}"}} {cumulative}')
+        return "\n".join(lines) + "\n"
+
+
+STAGE_METRICS = StageMetrics()  # process-wide; shared by every session and request thread
+stage = STAGE_METRICS.stage
+observe = STAGE_METRICS.observe
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    stage_metrics = STAGE_METRICS
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = self.stage_metrics.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, host="127.0.0.1"):
+    """Serve GET /metrics from a daemon thread; returns the server (call shutdown() to stop it)."""
+    httpd = ThreadingHTTPServer((host, port), _MetricsHandler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, name="metrics-http", daemon=True).start()
+    return httpd
@@ -0,0 +1,258 @@
+# model_registry.py
+"""Versioned model bundles with background hot reload.
+
+Layout of REGISTRY_DIR (one directory per version; names sort oldest to newest):
+    model_registry/
+        20250616-120000/
+            model.bst
+            scaler.joblib
+            metadata.json    {"version", "data_ingestion_date", "model_type", "created_at", ...}
+        20250701-090000/
+            ...
+
+publish() builds a bundle in a hidden temporary directory, validates it and renames it into
+place, so readers never see a half-copied bundle. The newest version that passes validation
+is served. With an empty registry, the legacy model.bst and scaler.joblib next to app.py are
+served under their content fingerprint.
+
+ModelRegistry polls the directory from a daemon thread. A new version is loaded and validated
+(feature count against NUM_FEATURES, warm-up and a smoke prediction) off the request path.
+It is then swapped in with a single reference assignment. Requests that already hold the
+previous predictor finish on it. A version that fails validation is logged and skipped. Deleting
+the newest bundle's directory rolls back to the next newest valid one. If none is valid, the
+active predictor keeps serving.
+
+Publish a bundle from the command line:
+    python model_registry.py publish --model model.bst --scaler scaler.joblib --data-date 01-07-2025
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import shutil
+import threading
+from datetime import datetime
+
+import numpy as np
+
+import predictor
+
+REGISTRY_DIR = os.path.join(predictor.BASE_DIR, "model_registry")
+MODEL_FILE = "model.bst"
+SCALER_FILE = "scaler.joblib"
+METADATA_FILE = "metadata.json"
+POLL_INTERVAL_SECONDS = 30.0
+DEFAULT_MODEL_TYPE = "XGBoost (Locally Loaded)"
+LEGACY_VERSION_LABEL = "legacy"
+LEGACY_DATA_INGESTION_DATE = "16-06-2025"
+
+logger = logging.getLogger("hdb_model_registry")
+
+
+class ModelBundle:
+    """Paths and metadata of one registry version (or of the legacy files next to app.py)."""
+
+    def __init__(self, version, model_path, scaler_path, metadata):
+        self.version = version
+        self.model_path = model_path
+        self.scaler_path = scaler_path
+        self.metadata = metadata
+
+    @property
+    def data_ingestion_date(self):
+        return self.metadata.get("data_ingestion_date", "unknown")
+
+    @property
+    def model_type(self):
+        return self.metadata.get("model_type", DEFAULT_MODEL_TYPE)
+
+    def __repr__(self):
+        return f"ModelBundle({self.version!r})"
+
+
+def list_versions(registry_dir=REGISTRY_DIR):
+    """Published versions, oldest first. Hidden (in-progress) directories are ignored."""
+    if not os.path.isdir(registry_dir):
+        return []
+    return sorted(name for name in os.listdir(registry_dir)
+                  if not name.startswith(".") and os.path.isfile(os.path.join(registry_dir, name, METADATA_FILE)))
+
+
+def read_bundle(version, registry_dir=REGISTRY_DIR):
+    path = os.path.join(registry_dir, version)
+    with open(os.path.join(path, METADATA_FILE), "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    return ModelBundle(version, os.path.join(path, MODEL_FILE), os.path.join(path, SCALER_FILE), metadata)
+
+
+def legacy_bundle():
+    """The un-versioned model.bst / scaler.joblib deployment, labelled by the model's fingerprint."""
+    version = predictor.model_fingerprint(predictor.MODEL_LOCAL_PATH) if os.path.exists(predictor.MODEL_LOCAL_PATH) else LEGACY_VERSION_LABEL
+    return ModelBundle(version, predictor.MODEL_LOCAL_PATH, predictor.SCALER_PATH,
+                       {"version": version, "data_ingestion_date": LEGACY_DATA_INGESTION_DATE,
+                        "model_type": DEFAULT_MODEL_TYPE})
+
+
+def load_bundle(bundle, postal_data=None, timings=None):
+    """Load and validate a bundle, returning a warmed-up HDBPricePredictor.
+
+    Raises ValueError (or the loader's error) when the model or scaler does not take
+    NUM_FEATURES inputs or the smoke prediction is not a finite positive price."""
+    def phase(name):
+        return timings.phase(name) if timings is not None else contextlib.nullcontext()
+
+    with phase("load model"):
+        model = predictor.load_model(bundle.model_path)
+    if model.num_features() != predictor.NUM_FEATURES:
+        raise ValueError(f"Model {bundle.version} expects {model.num_features()} features, not {predictor.NUM_FEATURES}.")
+    with phase("load scaler"):
+        scaler = predictor.load_scaler(bundle.scaler_path)
+    n_scaler_features = getattr(scaler, "n_features_in_", predictor.NUM_FEATURES)
+    if n_scaler_features != predictor.NUM_FEATURES:
+        raise ValueError(f"Scaler {bundle.version} expects {n_scaler_features} features, not {predictor.NUM_FEATURES}.")
+
+    price_predictor = predictor.HDBPricePredictor(model, scaler, postal_data, model_version=bundle.version)
+    with phase("first predict (warm-up)"):
+        price_predictor.warm_up()
+    smoke_row = predictor.encode_features(90.0, 10.0, 2025, 6, 1990, "TAMPINES", "4 ROOM", "IMPROVED")
+    smoke = float(price_predictor.predict_matrix(smoke_row.reshape(1, -1))[0])
+    if not np.isfinite(smoke) or smoke <= 0:
+        raise ValueError(f"Smoke prediction from {bundle.version} is {smoke}, expected a positive price.")
+    return price_predictor
+
+
+def publish(model_path, scaler_path, data_ingestion_date, registry_dir=REGISTRY_DIR, version=None,
+            model_type=DEFAULT_MODEL_TYPE):
+    """Copy a model + scaler pair into a new registry version and return its ModelBundle.
+
+    The bundle is validated in a hidden directory and renamed into place only if it passes."""
+    version = version or datetime.now().strftime("%Y%m%d-%H%M%S")
+    final_path = os.path.join(registry_dir, version)
+    if os.path.exists(final_path):
+        raise FileExistsError(f"Version {version} already exists in {registry_dir}.")
+    tmp_path = os.path.join(registry_dir, f".{version}.tmp")
+    os.makedirs(tmp_path, exist_ok=False)
+    try:
+        shutil.copyfile(model_path, os.path.join(tmp_path, MODEL_FILE))
+        shutil.copyfile(scaler_path, os.path.join(tmp_path, SCALER_FILE))
+        metadata = {"version": version, "data_ingestion_date": data_ingestion_date, "model_type": model_type,
+                    "created_at": datetime.now().isoformat(timespec="seconds"),
+                    "model_sha256_12": predictor.model_fingerprint(os.path.join(tmp_path, MODEL_FILE)),
+                    "num_features": predictor.NUM_FEATURES}
+        with open(os.path.join(tmp_path, METADATA_FILE), "w", encoding="utf-8") as f:
+            json.dump(metadata, f, indent=2)
+        bundle = ModelBundle(version, os.path.join(tmp_path, MODEL_FILE), os.path.join(tmp_path, SCALER_FILE), metadata)
+        load_bundle(bundle)
+        os.rename(tmp_path, final_path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    return read_bundle(version, registry_dir)
+
+
+class ModelRegistry:
+    """Serves the newest valid bundle and hot-swaps in newer ones from a background thread.
+
+    `active()` returns (predictor, bundle) as one consistent pair; callers should read it once
+    per request and keep using that predictor, so a swap never changes the model mid-request."""
+
+    def __init__(self, registry_dir=REGISTRY_DIR, postal_data=None, poll_interval=POLL_INTERVAL_SECONDS):
+        self.registry_dir = registry_dir
+        self.postal_data = postal_data
+        self.poll_interval = poll_interval
+        self.rejected = {}  # version -> validation error
+        self.swaps = 0
+        self.last_checked = None
+        self._active = (None, None)
+        self._load_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def active(self):
+        return self._active
+
+    @property
+    def predictor(self):
+        return self._active[0]
+
+    @property
+    def bundle(self):
+        return self._active[1]
+
+    def candidates(self):
+        """Bundles to try, newest first; the legacy files when the registry is empty."""
+        versions = list_versions(self.registry_dir)
+        if not versions:
+            return [legacy_bundle()]
+        return [read_bundle(version, self.registry_dir) for version in reversed(versions)]
+
+    def check(self, timings=None):
+        """Swap in the newest valid bundle if it is not the active one. Returns True on a swap."""
+        with self._load_lock:
+            self.last_checked = datetime.now()
+            for bundle in self.candidates():
+                if bundle.version in self.rejected:
+                    continue
+                current = self.bundle
+                if current is not None and current.version == bundle.version:
+                    return False
+                try:
+                    price_predictor = load_bundle(bundle, self.postal_data, timings)
+                except Exception as e:
+                    self.rejected[bundle.version] = str(e)
+                    logger.error("Rejected model version %s: %s", bundle.version, e)
+                    continue
+                self._active = (price_predictor, bundle)  # single reference assignment: atomic swap
+                self.swaps += 1
+                logger.info("Serving model version %s", bundle.version)
+                return True
+            return False
+
+    def start(self):
+        """Poll for new versions every poll_interval seconds from a daemon thread."""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._watch, name="model-registry-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Model registry check failed")
+
+    def status(self):
+        bundle = self.bundle
+        return {"active_version": bundle.version if bundle else None,
+                "available_versions": list_versions(self.registry_dir),
+                "rejected": dict(self.rejected),
+                "swaps": self.swaps,
+                "last_checked": self.last_checked.isoformat(timespec="seconds") if self.last_checked else None}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the versioned model registry")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    publish_parser = subparsers.add_parser("publish", help="validate and add a model + scaler bundle")
+    publish_parser.add_argument("--model", default=predictor.MODEL_LOCAL_PATH)
+    publish_parser.add_argument("--scaler", default=predictor.SCALER_PATH)
+    publish_parser.add_argument("--data-date", required=True, help="data ingestion date shown in the app, e.g. 01-07-2025")
+    publish_parser.add_argument("--version", default=None, help="defaults to the current timestamp (YYYYMMDD-HHMMSS)")
+    publish_parser.add_argument("--model-type", default=DEFAULT_MODEL_TYPE)
+    publish_parser.add_argument("--registry", default=REGISTRY_DIR)
+    subparsers.add_parser("list", help="show published versions").add_argument("--registry", default=REGISTRY_DIR)
+    args = parser.parse_args()
+
+    if args.command == "publish":
+        os.makedirs(args.registry, exist_ok=True)
+        bundle = publish(args.model, args.scaler, args.data_date, args.registry, args.version, args.model_type)
+        print(f"Published version {bundle.version} -> {os.path.join(args.registry, bundle.version)}")
+    else:
+        for version in list_versions(args.registry):
+            metadata = read_bundle(version, args.registry).metadata
+            print(f"{version}  data {metadata.get('data_ingestion_date', '?')}  created {metadata.get('created_at', '?')}")
@@ -0,0 +1,173 @@
+# postal_index.py
+"""Compact, memory-mapped postal code index compiled from postal_data.json.
+
+Build (run once, e.g. at image build time):  python postal_index.py
+
+File layout (little-endian):
+  8 bytes   magic b"HDBPIDX1"
+  uint32    number of postal codes (n)
+  uint32    byte length of the town table
+  bytes     town table, newline-separated UTF-8, zero-padded to a 4-byte boundary
+  int32[n]  postal codes, sorted ascending
+  uint16[n] lease commencement years
+  uint8[n]  town codes (index into the town table)
+
+PostalIndex mimics the read-only dict interface of the JSON data
+(`code in index`, `index[code][0]["town"]`), so validate_postal_code works on either.
+"""
+import argparse
+import bisect
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+POSTAL_DATA_PATH = os.path.join(BASE_DIR, "postal_data.json")
+POSTAL_INDEX_PATH = os.path.join(BASE_DIR, "postal_index.bin")
+
+MAGIC = b"HDBPIDX1"
+HEADER = struct.Struct("<8sII")
+
+
+def _pad4(n):
+    return (-n) % 4
+
+
+def _columns_from_postal_data(postal_data):
+    codes = sorted(postal_data, key=int)
+    towns = sorted({postal_data[c][0]["town"] for c in codes})
+    if len(towns) > 255:
+        raise ValueError(f"Too many towns ({len(towns)}) for a uint8 town code.")
+    town_code = {town: i for i, town in enumerate(towns)}
+    postal = np.array([int(c) for c in codes], dtype='<i4')
+    lease = np.array([int(postal_data[c][0]["lease_commence_date"]) for c in codes], dtype='<u2')
+    town = np.array([town_code[postal_data[c][0]["town"]] for c in codes], dtype='u1')
+    return postal, lease, town, towns
+
+
+def build_postal_index(json_path=POSTAL_DATA_PATH, out_path=POSTAL_INDEX_PATH):
+    with open(json_path, 'r') as f:
+        postal_data = json.load(f)
+    postal, lease, town, towns = _columns_from_postal_data(postal_data)
+
+    town_table = "\n".join(towns).encode("utf-8")
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(postal), len(town_table)))
+        f.write(town_table + b"\0" * _pad4(len(town_table)))
+        f.write(postal.tobytes())
+        f.write(lease.tobytes())
+        f.write(town.tobytes())
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+class PostalIndex:
+    """Read-only postal code -> (town, lease year) lookup over a memory-mapped index file."""
+
+    def __init__(self, postal, lease_year, town_code, towns, buffer=None):
+        self.postal = postal
+        self.lease_year = lease_year
+        self.town_code = town_code
+        self.towns = towns
+        self._buffer = buffer  # keeps the mmap alive for the frombuffer views
+        # Plain memoryviews keep scalar binary search and element access out of NumPy's per-call overhead
+        self._postal_view = memoryview(self.postal)
+        self._lease_view = memoryview(self.lease_year)
+        self._town_view = memoryview(self.town_code)
+
+    @classmethod
+    def open(cls, path=POSTAL_INDEX_PATH):
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n, town_len = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a postal index file.")
+        offset = HEADER.size
+        towns = bytes(buffer[offset:offset + town_len]).decode("utf-8").split("\n") if town_len else []
+        offset += town_len + _pad4(town_len)
+        postal = np.frombuffer(buffer, dtype='<i4', count=n, offset=offset)
+        offset += 4 * n
+        lease_year = np.frombuffer(buffer, dtype='<u2', count=n, offset=offset)
+        offset += 2 * n
+        town_code = np.frombuffer(buffer, dtype='u1', count=n, offset=offset)
+        return cls(postal, lease_year, town_code, towns, buffer)
+
+    @classmethod
+    def from_postal_data(cls, postal_data):
+        """Build an in-memory index from the parsed postal_data.json dict."""
+        return cls(*_columns_from_postal_data(postal_data))
+
+    def _position(self, postal_code):
+        if not isinstance(postal_code, str) or len(postal_code) != 6 or not postal_code.isdigit():
+            return -1
+        code = int(postal_code)
+        i = bisect.bisect_left(self._postal_view, code)
+        return i if i < len(self._postal_view) and self._postal_view[i] == code else -1
+
+    def lookup(self, postal_code):
+        i = self._position(postal_code)
+        if i < 0:
+            return None
+        return {"town": self.towns[self._town_view[i]], "lease_commence_date": str(self._lease_view[i])}
+
+    def suggest(self, prefix, limit=10):
+        """Postal codes starting with `prefix`, as (matches, total_count).
+
+        Codes are fixed-width, so a prefix maps to one contiguous range of the sorted
+        array: two binary searches, independent of how many codes match."""
+        if not prefix or not prefix.isdigit() or len(prefix) > 6:
+            return [], 0
+        width = 10 ** (6 - len(prefix))
+        lo = bisect.bisect_left(self._postal_view, int(prefix) * width)
+        hi = bisect.bisect_left(self._postal_view, (int(prefix) + 1) * width, lo)
+        matches = [
+            {"postal": f"{self._postal_view[i]:06d}", "town": self.towns[self._town_view[i]],
+             "lease_commence_date": str(self._lease_view[i])}
+            for i in range(lo, min(hi, lo + limit))
+        ]
+        return matches, hi - lo
+
+    def __contains__(self, postal_code):
+        return self._position(postal_code) >= 0
+
+    def __getitem__(self, postal_code):
+        info = self.lookup(postal_code)
+        if info is None:
+            raise KeyError(postal_code)
+        return [info]
+
+    def get(self, postal_code, default=None):
+        info = self.lookup(postal_code)
+        return default if info is None else [info]
+
+    def __len__(self):
+        return len(self.postal)
+
+    def __iter__(self):
+        return (f"{code:06d}" for code in self.postal)
+
+    def keys(self):
+        return iter(self)
+
+
+def load_postal_index(index_path=POSTAL_INDEX_PATH, json_path=POSTAL_DATA_PATH):
+    """Open the binary index if it exists and is not older than the JSON it was built from."""
+    if not os.path.exists(index_path):
+        return None
+    if os.path.exists(json_path) and os.path.getmtime(json_path) > os.path.getmtime(index_path):
+        return None
+    return PostalIndex.open(index_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile postal_data.json into a memory-mapped index")
+    parser.add_argument("--input", default=POSTAL_DATA_PATH)
+    parser.add_argument("--output", default=POSTAL_INDEX_PATH)
+    args = parser.parse_args()
+    path = build_postal_index(args.input, args.output)
+    index = PostalIndex.open(path)
+    print(f"Wrote {len(index):,} postal codes, {len(index.towns)} towns to {path} ({os.path.getsize(path):,} bytes)")
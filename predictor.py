@@ -0,0 +1,747 @@
+# predictor.py
+"""Feature encoding and prediction for the HDB resale price model.
+
+This module has no Streamlit dependency so the same encoding and predict path
+can be shared by app.py, the HTTP API (api.py) and offline scripts.
+
+Only NumPy is imported at module level. pandas, joblib (and sklearn through the
+pickled scaler), xgboost and scipy are imported by the functions that need them,
+so importing predictor is cheap. The NumPy tree engine never loads xgboost or sklearn.
+import_dependencies() loads them all up front when a process would rather pay that
+cost at startup than on its first request.
+"""
+import os
+import sys
+import json
+import math
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+import metrics
+from postal_index import POSTAL_INDEX_PATH, load_postal_index
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SCALER_PATH = os.path.join(BASE_DIR, "scaler.joblib")
+POSTAL_DATA_PATH = os.path.join(BASE_DIR, "postal_data.json")
+MODEL_LOCAL_PATH = os.path.join(BASE_DIR, "model.bst")
+
+FEATURE_NAMES = ['floor_area_sqm', 'postal', 'storey_avg', 'sale_year', 'sale_month', 'remaining_lease_years', 'flat_type_1 ROOM', 'flat_type_2 ROOM', 'flat_type_3 ROOM', 'flat_type_4 ROOM', 'flat_type_5 ROOM', 'flat_type_EXECUTIVE', 'flat_type_MULTI-GENERATION', 'flat_model_2-ROOM', 'flat_model_3GEN', 'flat_model_ADJOINED FLAT', 'flat_model_APARTMENT', 'flat_model_DBSS', 'flat_model_IMPROVED', 'flat_model_IMPROVED-MAISONETTE', 'flat_model_MAISONETTE', 'flat_model_MODEL A', 'flat_model_MODEL A-MAISONETTE', 'flat_model_MODEL A2', 'flat_model_MULTI GENERATION', 'flat_model_NEW GENERATION', 'flat_model_PREMIUM APARTMENT', 'flat_model_PREMIUM APARTMENT LOFT', 'flat_model_PREMIUM MAISONETTE', 'flat_model_SIMPLIFIED', 'flat_model_STANDARD', 'flat_model_TERRACE', 'flat_model_TYPE S1', 'flat_model_TYPE S2', 'town_ANG MO KIO', 'town_BEDOK', 'town_BISHAN', 'town_BUKIT BATOK', 'town_BUKIT MERAH', 'town_BUKIT PANJANG', 'town_BUKIT TIMAH', 'town_CENTRAL AREA', 'town_CHOA CHU KANG', 'town_CLEMENTI', 'town_GEYLANG', 'town_HOUGANG', 'town_JURONG EAST', 'town_JURONG WEST', 'town_KALLANG/WHAMPOA', 'town_MARINE PARADE', 'town_PASIR RIS', 'town_PUNGGOL', 'town_QUEENSTOWN', 'town_SEMBAWANG', 'town_SENGKANG', 'town_SERANGOON', 'town_TAMPINES', 'town_TOA PAYOH', 'town_WOODLANDS', 'town_YISHUN']
+NUM_FEATURES = len(FEATURE_NAMES)
+FEATURE_INDEX = {feat: i for i, feat in enumerate(FEATURE_NAMES)}
+
+def extract_categories(prefix, feature_list):
+    categories = [feature[len(prefix):] for feature in feature_list if feature.startswith(prefix)]
+    return sorted(categories)
+
+FLAT_TYPES = extract_categories("flat_type_", FEATURE_NAMES)
+FLAT_MODELS = extract_categories("flat_model_", FEATURE_NAMES)
+TOWNS = extract_categories("town_", FEATURE_NAMES)
+
+MONTHS = ["January", "February", "March", "April", "May", "June",
+          "July", "August", "September", "October", "November", "December"]
+MONTH_TO_NUM = {month: i + 1 for i, month in enumerate(MONTHS)}
+
+# Attribution groups: one-hot families are summed back into their categorical input
+CONTRIBUTION_GROUPS = ['Floor Area', 'Postal Code', 'Storey', 'Sale Year', 'Sale Month', 'Remaining Lease',
+                       'Flat Type', 'Flat Model', 'Town', 'Base Value']
+_NUMERIC_GROUP = {'floor_area_sqm': 'Floor Area', 'postal': 'Postal Code', 'storey_avg': 'Storey',
+                  'sale_year': 'Sale Year', 'sale_month': 'Sale Month', 'remaining_lease_years': 'Remaining Lease'}
+_PREFIX_GROUP = [('flat_type_', 'Flat Type'), ('flat_model_', 'Flat Model'), ('town_', 'Town')]
+CONTRIBUTION_CACHE_SIZE = 2048
+PREDICTION_CACHE_SIZE = 4096
+SPARSE_MIN_ROWS = 100_000  # predict_frame switches to the CSR encoding from this many rows
+
+BULK_REQUIRED_COLUMNS = ['floor_area_sqm', 'storey_avg', 'sale_year', 'sale_month', 'flat_type', 'flat_model']
+BULK_CATEGORICAL_COLUMNS = [("town_", "town"), ("flat_type_", "flat_type"), ("flat_model_", "flat_model")]
+NUMERIC_FEATURES = ['floor_area_sqm', 'postal', 'storey_avg', 'sale_year', 'sale_month', 'remaining_lease_years']
+ONE_HOT_COLUMNS = np.array([i for i, feat in enumerate(FEATURE_NAMES) if feat not in NUMERIC_FEATURES])
+FLOAT32_MAX = float(np.finfo(np.float32).max)  # feature rows are float32; larger values become inf
+
+# --- Artifact loading ---
+def import_dependencies(engine="xgboost", frames=True):
+    """Import the libraries the predict path loads lazily, so their cost lands at startup.
+
+    frames=False skips pandas, which only the DataFrame (bulk) paths need."""
+    if frames:
+        import pandas  # noqa: F401
+    if engine == "xgboost":
+        import joblib  # noqa: F401
+        import sklearn.preprocessing  # noqa: F401
+        import xgboost  # noqa: F401
+        from scipy import sparse  # noqa: F401
+
+def load_model(path=MODEL_LOCAL_PATH):
+    import xgboost as xgb
+
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Model file not found at {path}.")
+    with metrics.stage("load_model"):
+        model = xgb.Booster()
+        model.load_model(path)
+    return model
+
+def model_fingerprint(path=MODEL_LOCAL_PATH):
+    """Short content hash of a model file, used as its version in cache keys."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+def check_tree_export(ensemble, tree_path, model_path=MODEL_LOCAL_PATH, scaler_path=SCALER_PATH):
+    """Raise ValueError if model_path or scaler_path exists and is not the file the tree
+    tables were exported from. Slim images that ship only the .npz are not checked."""
+    for path, exported in ((model_path, ensemble.source_model), (scaler_path, ensemble.source_scaler)):
+        if os.path.exists(path) and exported != model_fingerprint(path):
+            raise ValueError(f"{tree_path} was not exported from the current {os.path.basename(path)}. "
+                             f"Re-run `python tree_engine.py` to refresh it.")
+
+def load_scaler(path=SCALER_PATH):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Scaler file not found at {path}.")
+    import joblib
+    with metrics.stage("load_scaler"):
+        return joblib.load(path)
+
+def load_postal_data(path=POSTAL_DATA_PATH, index_path=POSTAL_INDEX_PATH):
+    """Memory-mapped PostalIndex when an up-to-date postal_index.bin exists, else the parsed JSON."""
+    with metrics.stage("load_postal_data"):
+        index = load_postal_index(index_path, path)
+        if index is not None:
+            return index
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Postal data file not found at {path}.")
+        with open(path, 'r') as f: return json.load(f)
+
+# --- Encoding ---
+def validate_postal_code(postal_code, postal_data):
+    with metrics.stage("validate_postal_code"):
+        if not postal_code or not postal_code.isdigit() or len(postal_code) != 6:
+            return None, "Please enter a valid 6-digit postal code."
+        if not postal_data:
+            return None, "Postal code database not loaded. Cannot validate."
+        if postal_code not in postal_data:
+            return None, f"Postal code {postal_code} not found in our database."
+        return postal_data[postal_code][0], None
+
+def remaining_lease_years(sale_year, lease_commencement_year):
+    """99-year lease remaining at sale, clipped to [10, 99] years."""
+    lease_duration_at_sale = np.asarray(sale_year, dtype=np.float64) - np.asarray(lease_commencement_year, dtype=np.float64)
+    return np.clip(99.0 - lease_duration_at_sale, 10.0, 99.0)
+
+def _shown(value, limit=40):
+    text = repr(value)
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+def parse_number(value, name):
+    """float(value), rejecting NaN, infinities and values that overflow float32 with a
+    ValueError naming the field."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"{name} must be a number, got {_shown(value)}") from None
+    if not math.isfinite(number):
+        raise ValueError(f"{name} must be a finite number, got {_shown(value)}")
+    if abs(number) > FLOAT32_MAX:
+        raise ValueError(f"{name} is out of range, got {_shown(value)}")
+    return number
+
+def parse_whole_number(value, name):
+    """int(value) for whole numbers only: 6 and 6.0 pass, 6.7 is rejected instead of truncated."""
+    number = parse_number(value.strip() if isinstance(value, str) else value, name)
+    if not number.is_integer():
+        raise ValueError(f"{name} must be a whole number, got {_shown(value)}")
+    return int(number)
+
+def parse_sale_month(value):
+    if isinstance(value, str) and not value.strip().isdigit():
+        month = MONTH_TO_NUM.get(value.strip().title())
+        if month is None:
+            raise ValueError(f"Unknown sale_month '{value}'")
+        return month
+    month = parse_whole_number(value, "sale_month")
+    if not 1 <= month <= 12:
+        raise ValueError(f"sale_month must be between 1 and 12, got {month}")
+    return month
+
+def encode_features(floor_area_sqm, storey_avg, sale_year, sale_month, lease_commencement_year,
+                    town, flat_type, flat_model, postal_code=None, out=None):
+    """Encode one unit into a (NUM_FEATURES,) float32 row in FEATURE_NAMES order.
+
+    Writes into `out` instead of allocating when a preallocated row is given.
+    Raises ValueError if a categorical value has no matching one-hot column."""
+    with metrics.stage("encode"):
+        return _encode_features(floor_area_sqm, storey_avg, sale_year, sale_month, lease_commencement_year,
+                                town, flat_type, flat_model, postal_code, out)
+
+def _encode_features(floor_area_sqm, storey_avg, sale_year, sale_month, lease_commencement_year,
+                     town, flat_type, flat_model, postal_code, out):
+    if out is None:
+        row = np.zeros(NUM_FEATURES, dtype=np.float32)
+    else:
+        row = out
+        row.fill(0.0)
+    row[FEATURE_INDEX['floor_area_sqm']] = float(floor_area_sqm)
+    row[FEATURE_INDEX['postal']] = float(postal_code) if postal_code and str(postal_code).isdigit() else 0.0
+    row[FEATURE_INDEX['storey_avg']] = float(storey_avg)
+    row[FEATURE_INDEX['sale_year']] = float(sale_year)
+    row[FEATURE_INDEX['sale_month']] = float(sale_month)
+    row[FEATURE_INDEX['remaining_lease_years']] = float(remaining_lease_years(sale_year, lease_commencement_year))
+    for prefix, value in [("town_", town), ("flat_type_", flat_type), ("flat_model_", flat_model)]:
+        feature_name = f"{prefix}{value}"
+        if feature_name not in FEATURE_INDEX:
+            raise ValueError(f"Selected value '{value}' (feature: {feature_name}) not in model's FEATURE_NAMES.")
+        row[FEATURE_INDEX[feature_name]] = 1.0
+    return row
+
+def encode_record(record, postal_data=None):
+    """Encode a JSON-style dict into a feature row.
+
+    Accepts town and lease_commence_date directly or a postal code to look them up.
+    Explicit town/lease values take precedence over the postal lookup."""
+    record = dict(record)
+    postal_code = record.get('postal')
+    if postal_code is not None:
+        postal_code = str(postal_code).strip().zfill(6)
+        postal_info, error_msg = validate_postal_code(postal_code, postal_data)
+        if error_msg:
+            raise ValueError(error_msg)
+        record.setdefault('town', postal_info["town"])
+        record.setdefault('lease_commence_date', postal_info["lease_commence_date"])
+    with metrics.stage("validate_input"):
+        missing = [c for c in BULK_REQUIRED_COLUMNS + ['town', 'lease_commence_date'] if record.get(c) in (None, "")]
+        if missing:
+            raise ValueError(f"Missing required field(s): {', '.join(missing)}")
+        features = dict(
+            floor_area_sqm=parse_number(record['floor_area_sqm'], 'floor_area_sqm'),
+            storey_avg=parse_number(record['storey_avg'], 'storey_avg'),
+            sale_year=parse_whole_number(record['sale_year'], 'sale_year'),
+            sale_month=parse_sale_month(record['sale_month']),
+            lease_commencement_year=parse_whole_number(record['lease_commence_date'], 'lease_commence_date'),
+            town=str(record['town']).strip().upper(),
+            flat_type=str(record['flat_type']).strip().upper(),
+            flat_model=str(record['flat_model']).strip().upper(),
+            postal_code=postal_code,
+        )
+    return encode_features(**features)
+
+def prepare_bulk_frame(df, postal_data=None):
+    """Normalise an uploaded frame so every row has town, lease year and numeric sale month.
+
+    Town and lease commencement year are filled from postal_data when a postal column
+    is present. Returns the prepared frame and a list of error messages per row ('' if OK)."""
+    import pandas as pd
+
+    postal_data = postal_data or {}
+    df = df.copy()
+    df.columns = [str(c).strip() for c in df.columns]
+    missing = [c for c in BULK_REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+
+    n = len(df)
+    errors = np.full(n, "", dtype=object)
+    if 'postal' in df.columns:
+        postal = df['postal'].astype(str).str.strip().str.replace(r"\.0$", "", regex=True).str.zfill(6)
+        postal = postal.where(df['postal'].notna(), None)
+        postal_town = postal.map(lambda p: postal_data[p][0]["town"] if p in postal_data else None)
+        postal_lease = postal.map(lambda p: postal_data[p][0]["lease_commence_date"] if p in postal_data else None)
+        df['postal'] = postal
+        df['town'] = df['town'].where(df['town'].notna(), postal_town) if 'town' in df.columns else postal_town
+        lease = pd.to_numeric(postal_lease, errors='coerce')
+        if 'lease_commence_date' in df.columns:
+            lease = pd.to_numeric(df['lease_commence_date'], errors='coerce').fillna(lease)
+        df['lease_commence_date'] = lease
+    else:
+        df['postal'] = None
+    if 'town' not in df.columns:
+        raise ValueError("Provide either a 'town' or a 'postal' column.")
+    if 'lease_commence_date' not in df.columns and 'remaining_lease_years' not in df.columns:
+        raise ValueError("Provide either a 'lease_commence_date', 'remaining_lease_years' or 'postal' column.")
+
+    month = df['sale_month']
+    month_num = pd.to_numeric(month, errors='coerce')
+    month_name = month.astype(str).str.strip().str.title().map(MONTH_TO_NUM)
+    month = month_num.fillna(month_name)
+    # Same rule as parse_sale_month() on the single-row path
+    bad_month = (month.notna() & ((month < 1) | (month > 12) | (month % 1 != 0))).to_numpy()
+    errors[bad_month] = "sale_month must be a whole number between 1 and 12"
+    df['sale_month'] = month.where(~bad_month)
+
+    # Same rules as parse_number() and parse_whole_number() on the single-row path
+    for col in ['floor_area_sqm', 'storey_avg', 'sale_year', 'lease_commence_date', 'remaining_lease_years']:
+        if col not in df.columns:
+            continue
+        values = pd.to_numeric(df[col], errors='coerce')
+        out_of_range = (values.notna() & ~(values.abs() <= FLOAT32_MAX)).to_numpy()
+        errors[out_of_range & (errors == "")] = f"{col} must be a finite number"
+        bad = out_of_range
+        if col in ('sale_year', 'lease_commence_date'):
+            fractional = (values.notna() & (values % 1 != 0)).to_numpy() & ~out_of_range
+            errors[fractional & (errors == "")] = f"{col} must be a whole number"
+            bad = bad | fractional
+        df[col] = values.where(~bad)
+
+    # Same rule as the single-row path: 99-year lease, clipped to [10, 99] remaining years
+    remaining = pd.Series(np.nan, index=df.index)
+    if 'lease_commence_date' in df.columns:
+        remaining = 99.0 - (df['sale_year'] - df['lease_commence_date'])
+    if 'remaining_lease_years' in df.columns:
+        remaining = remaining.fillna(df['remaining_lease_years'])
+    df['remaining_lease_years'] = remaining.clip(10.0, 99.0)
+
+    for col in ['floor_area_sqm', 'storey_avg', 'sale_year', 'sale_month', 'remaining_lease_years']:
+        bad = df[col].isna().to_numpy()
+        errors[bad & (errors == "")] = f"Invalid or missing {col}"
+    for prefix, col in BULK_CATEGORICAL_COLUMNS:
+        df[col] = df[col].astype(str).str.strip().str.upper().where(df[col].notna(), None)
+        unknown = ~(prefix + df[col].fillna("")).isin(FEATURE_INDEX.keys()).to_numpy()
+        errors[unknown & (errors == "")] = f"Unknown {col.replace('_', ' ')}"
+    return df, errors
+
+def encode_bulk_frame(df):
+    """Vectorised one-hot encoding of a prepared frame into a (n, NUM_FEATURES) float32 matrix."""
+    import pandas as pd
+
+    n = len(df)
+    X = np.zeros((n, NUM_FEATURES), dtype=np.float32)
+    X[:, FEATURE_INDEX['postal']] = pd.to_numeric(df['postal'], errors='coerce').fillna(0.0).to_numpy(dtype=np.float64)
+    for feat in ['floor_area_sqm', 'storey_avg', 'sale_year', 'sale_month', 'remaining_lease_years']:
+        X[:, FEATURE_INDEX[feat]] = df[feat].to_numpy(dtype=np.float64)
+
+    rows = np.arange(n)
+    for prefix, col in BULK_CATEGORICAL_COLUMNS:
+        cols = (prefix + df[col].fillna("")).map(FEATURE_INDEX)
+        valid = cols.notna().to_numpy()
+        X[rows[valid], cols[valid].to_numpy(dtype=np.int64)] = 1.0
+    return X
+
+def encode_bulk_sparse(df, scale, offset, clip_range=None):
+    """Scaled CSR encoding of a prepared frame, built from category codes without a dense matrix.
+
+    Equivalent to scaling encode_bulk_frame(df), except that inactive one-hot entries (which
+    would all scale to the column's constant offset) are not stored. Each row holds the six
+    numeric features plus at most three one-hot entries. Score it with a booster from
+    sparse_safe_booster(), which routes those absent entries the way their offset would go."""
+    import pandas as pd
+    from scipy import sparse
+
+    n = len(df)
+    numeric_cols = np.array([FEATURE_INDEX[feat] for feat in NUMERIC_FEATURES])
+    numeric = np.empty((n, len(numeric_cols)), dtype=np.float32)
+    numeric[:, 1] = pd.to_numeric(df['postal'], errors='coerce').fillna(0.0).to_numpy(dtype=np.float64)
+    for j, feat in enumerate(NUMERIC_FEATURES):
+        if feat != 'postal':
+            numeric[:, j] = df[feat].to_numpy(dtype=np.float64)
+    # In-place float32 updates round exactly as MinMaxScaler.transform does on a float32 matrix
+    numeric *= scale[numeric_cols]
+    numeric += offset[numeric_cols]
+
+    # Column index of the active one-hot entry per categorical column, -1 when unknown
+    active = np.empty((n, len(BULK_CATEGORICAL_COLUMNS)), dtype=np.int64)
+    for j, (prefix, col) in enumerate(BULK_CATEGORICAL_COLUMNS):
+        values = sorted(feat[len(prefix):] for feat in FEATURE_NAMES if feat.startswith(prefix))
+        codes = pd.Categorical(df[col], categories=values).codes
+        lookup = np.array([FEATURE_INDEX[prefix + v] for v in values] + [-1])
+        active[:, j] = lookup[codes]  # code -1 picks the trailing -1
+
+    indices = np.concatenate([np.broadcast_to(numeric_cols, (n, len(numeric_cols))), active], axis=1)
+    one_hot = np.ones(active.shape, dtype=np.float32)
+    one_hot *= scale[active]
+    one_hot += offset[active]  # unknown (-1) slots are dropped below
+    data = np.concatenate([numeric, one_hot], axis=1)
+    if clip_range is not None:
+        np.clip(data, clip_range[0], clip_range[1], out=data)
+    present = np.concatenate([np.ones((n, len(numeric_cols)), dtype=bool), active >= 0], axis=1)
+    order = np.argsort(indices, axis=1, kind='stable')  # xgboost expects sorted column indices per row
+    indices, data, present = (np.take_along_axis(a, order, 1) for a in (indices, data, present))
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(present.sum(axis=1), out=indptr[1:])
+    keep = present.ravel()
+    return sparse.csr_matrix((data.ravel()[keep], indices.ravel()[keep].astype(np.int32), indptr), shape=(n, NUM_FEATURES))
+
+def sparse_safe_booster(booster, inactive_values):
+    """Copy of `booster` whose splits on one-hot features send missing values where the
+    inactive value (inactive_values[j], the scaled zero) would go.
+
+    XGBoost treats entries absent from a CSR matrix as missing and follows each split's
+    default direction, which need not match the branch taken by an explicit zero. One-hot
+    columns are never missing in dense input, so dense predictions are unchanged."""
+    import xgboost as xgb
+
+    model = json.loads(booster.save_raw("json"))
+    one_hot = np.zeros(NUM_FEATURES, dtype=bool)
+    one_hot[ONE_HOT_COLUMNS] = True
+    inactive_values = np.asarray(inactive_values, dtype=np.float32)
+    for tree in model["learner"]["gradient_booster"]["model"]["trees"]:
+        split_indices = np.asarray(tree["split_indices"])
+        is_split = np.asarray(tree["left_children"]) != -1
+        conditions = np.asarray(tree["split_conditions"], dtype=np.float32)
+        default_left = np.asarray(tree["default_left"]).astype(bool)
+        fix = is_split & one_hot[split_indices]
+        default_left[fix] = inactive_values[split_indices[fix]] < conditions[fix]
+        tree["default_left"] = default_left.astype(int).tolist()
+    safe = xgb.Booster()
+    safe.load_model(bytearray(json.dumps(model).encode("utf-8")))
+    safe.load_config(booster.save_config())
+    return safe
+
+def contribution_group_matrix():
+    """(NUM_FEATURES + 1, len(CONTRIBUTION_GROUPS)) 0/1 matrix mapping pred_contribs columns
+    (features then bias) onto CONTRIBUTION_GROUPS."""
+    G = np.zeros((NUM_FEATURES + 1, len(CONTRIBUTION_GROUPS)), dtype=np.float32)
+    for i, feat in enumerate(FEATURE_NAMES):
+        group = _NUMERIC_GROUP.get(feat) or next(g for prefix, g in _PREFIX_GROUP if feat.startswith(prefix))
+        G[i, CONTRIBUTION_GROUPS.index(group)] = 1.0
+    G[NUM_FEATURES, CONTRIBUTION_GROUPS.index('Base Value')] = 1.0
+    return G
+
+# --- Caching ---
+class LRUCache:
+    """Thread-safe, size-bounded LRU mapping with hit/miss/eviction counters."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+_MISSING = object()
+
+# --- Startup ---
+class StartupTimings:
+    """Wall-clock seconds per cold-start phase (imports, artifact loads, warm-up), in recording order.
+
+    A phase is recorded the first time it runs; repeats (e.g. Streamlit reruns) are ignored."""
+
+    def __init__(self):
+        self.phases = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        with self._lock:
+            self.phases.setdefault(name, seconds)
+
+    def total(self):
+        return sum(self.phases.values())
+
+    def report(self):
+        lines = [f"{name:<32}{seconds * 1000:>10.1f} ms" for name, seconds in self.phases.items()]
+        lines.append(f"{'total':<32}{self.total() * 1000:>10.1f} ms")
+        return "\n".join(lines)
+
+# --- Prediction ---
+def scaler_affine(scaler, dtype=np.float32):
+    """Return (scale, offset, clip_range) such that scaler.transform(X) == X * scale + offset.
+
+    MinMaxScaler and StandardScaler are read from their fitted attributes; any other
+    per-column affine scaler is probed with transform() on zeros and ones."""
+    if hasattr(scaler, 'min_') and hasattr(scaler, 'scale_'):  # MinMaxScaler
+        scale, offset = scaler.scale_, scaler.min_
+        clip_range = scaler.feature_range if getattr(scaler, 'clip', False) else None
+    elif hasattr(scaler, 'mean_') or hasattr(scaler, 'scale_'):  # StandardScaler
+        scale = 1.0 / scaler.scale_ if getattr(scaler, 'scale_', None) is not None else np.ones(NUM_FEATURES)
+        mean = scaler.mean_ if getattr(scaler, 'mean_', None) is not None else np.zeros(NUM_FEATURES)
+        offset = -mean * scale
+        clip_range = None
+    else:
+        probe = np.vstack([np.zeros(NUM_FEATURES), np.ones(NUM_FEATURES)])
+        transformed = scaler.transform(probe)
+        offset, scale = transformed[0], transformed[1] - transformed[0]
+        clip_range = None
+    return np.asarray(scale, dtype=dtype), np.asarray(offset, dtype=dtype), clip_range
+
+def is_xgboost_booster(model):
+    """True for an xgboost.Booster, without importing xgboost for other engines."""
+    xgb = sys.modules.get("xgboost")  # a Booster can only exist once xgboost is imported
+    return xgb is not None and isinstance(model, xgb.Booster)
+
+class HDBPricePredictor:
+    """Scaler + booster pair with the app's predict path.
+
+    All predict methods take raw (unscaled) encoded rows; scaling happens here."""
+
+    def __init__(self, model, scaler, postal_data=None, model_version="unversioned"):
+        self.model = model
+        self.scaler = scaler
+        self.postal_data = postal_data or {}
+        self.model_version = model_version
+        self.is_booster = is_xgboost_booster(model)
+        self.feature_names = FEATURE_NAMES if model.num_features() == NUM_FEATURES else None
+        # Single-row fast path: scaler folded into a reusable buffer, no DMatrix
+        self._scale, self._offset, self._clip_range = scaler_affine(scaler)
+        self._raw_row = np.zeros(NUM_FEATURES, dtype=np.float32)
+        self._scaled_row = np.zeros((1, NUM_FEATURES), dtype=np.float32)
+        self._row_lock = threading.RLock()
+        # Process-wide LRU caches keyed on (model version, encoded row bytes)
+        self.prediction_cache = LRUCache(PREDICTION_CACHE_SIZE)
+        self.contribution_cache = LRUCache(CONTRIBUTION_CACHE_SIZE)
+        self._contribution_groups = contribution_group_matrix()
+        self._sparse_model = None  # sparse_safe_booster(model), built on first sparse batch
+
+    @classmethod
+    def from_files(cls, model_path=MODEL_LOCAL_PATH, scaler_path=SCALER_PATH, postal_data_path=POSTAL_DATA_PATH,
+                   engine="xgboost"):
+        """Load artifacts from disk. engine="numpy" reads tree_engine's model_trees.npz
+        (model and scaler in one file) instead of model.bst and scaler.joblib, and
+        raises ValueError if those files are present and differ from the ones exported."""
+        if engine == "numpy":
+            from tree_engine import TREE_MODEL_PATH, TreeEnsemble
+            path = model_path if model_path.endswith(".npz") else TREE_MODEL_PATH
+            with metrics.stage("load_model"):
+                ensemble = TreeEnsemble.load(path)
+            source_model = MODEL_LOCAL_PATH if model_path.endswith(".npz") else model_path
+            check_tree_export(ensemble, path, source_model, scaler_path)
+            return cls(ensemble, ensemble.scaler, load_postal_data(postal_data_path), model_version=model_fingerprint(path))
+        return cls(load_model(model_path), load_scaler(scaler_path), load_postal_data(postal_data_path),
+                   model_version=model_fingerprint(model_path))
+
+    def predict_matrix(self, X):
+        X = np.asarray(X, dtype=np.float32).reshape(-1, NUM_FEATURES)
+        if X.shape[0] == 0:
+            return np.empty(0, dtype=np.float32)
+        with metrics.stage("scaler_transform"):
+            X_scaled = self.scaler.transform(X)
+        if not self.is_booster:  # tree_engine.TreeEnsemble takes arrays directly
+            with metrics.stage("predict"):
+                return self.model.predict(X_scaled)
+        import xgboost as xgb
+        with metrics.stage("dmatrix"):
+            dmatrix = xgb.DMatrix(X_scaled, feature_names=self.feature_names)
+        with metrics.stage("predict"):
+            return self.model.predict(dmatrix)
+
+    def predict_sparse_frame(self, prepared):
+        """Predictions for a prepared frame (all rows valid) via the CSR encoding, with no dense matrix."""
+        if len(prepared) == 0:
+            return np.empty(0, dtype=np.float32)
+        scale, offset, clip_range = scaler_affine(self.scaler, dtype=np.float64)
+        with self._row_lock:
+            if self._sparse_model is None:
+                inactive = np.float32(offset) if clip_range is None else np.clip(np.float32(offset), *clip_range)
+                self._sparse_model = sparse_safe_booster(self.model, inactive)
+        with metrics.stage("encode"):
+            X_scaled = encode_bulk_sparse(prepared, scale, offset, clip_range)
+        with metrics.stage("predict"):
+            return self._sparse_model.inplace_predict(X_scaled, validate_features=False)
+
+    def explain_matrix(self, X):
+        """Per-row contributions grouped into CONTRIBUTION_GROUPS, shape (n, len(CONTRIBUTION_GROUPS)).
+
+        Each row sums to its prediction. Cached rows are served from the LRU cache;
+        the remaining rows are computed together in one pred_contribs call. Only
+        single-row calls (the app's breakdown) add to the cache, so a bulk explain
+        cannot evict the entries interactive users are about to hit again."""
+        X = np.ascontiguousarray(X, dtype=np.float32).reshape(-1, NUM_FEATURES)
+        result = np.empty((X.shape[0], len(CONTRIBUTION_GROUPS)), dtype=np.float32)
+        keys = [(self.model_version, row.tobytes()) for row in X]
+        missing = []
+        for i, key in enumerate(keys):
+            cached = self.contribution_cache.get(key)
+            if cached is None:
+                missing.append(i)
+            else:
+                result[i] = cached
+        if missing:
+            if not self.is_booster:
+                raise ValueError("Feature contributions require the xgboost engine.")
+            import xgboost as xgb
+            with metrics.stage("scaler_transform"):
+                X_scaled = self.scaler.transform(X[missing])
+            with metrics.stage("dmatrix"):
+                dmatrix = xgb.DMatrix(X_scaled, feature_names=self.feature_names)
+            with metrics.stage("explain"):
+                grouped = self.model.predict(dmatrix, pred_contribs=True) @ self._contribution_groups
+            result[missing] = grouped
+            if len(keys) == 1:
+                # A copy, so the cache does not keep the whole pred_contribs output alive.
+                self.contribution_cache.put(keys[0], grouped[0].copy())
+        return result
+
+    def explain_row(self, row):
+        """{group: contribution} for one encoded row, including 'Base Value'."""
+        return dict(zip(CONTRIBUTION_GROUPS, self.explain_matrix(row)[0].tolist()))
+
+    def predict_row(self, row):
+        """Fast path for one encoded row: fused affine scaling into a preallocated
+        buffer and Booster.inplace_predict, skipping DMatrix construction.
+
+        Results are memoised in prediction_cache under (model_version, row bytes)."""
+        key = (self.model_version, np.ascontiguousarray(row, dtype=np.float32).tobytes())
+        cached = self.prediction_cache.get(key)
+        if cached is not None:
+            return cached
+        prediction = self._predict_row_uncached(row)
+        self.prediction_cache.put(key, prediction)
+        return prediction
+
+    def _predict_row_uncached(self, row):
+        with self._row_lock:
+            with metrics.stage("scaler_transform"):
+                scaled = self._scaled_row[0]
+                np.multiply(row, self._scale, out=scaled)
+                np.add(scaled, self._offset, out=scaled)
+                if self._clip_range is not None:
+                    np.clip(scaled, self._clip_range[0], self._clip_range[1], out=scaled)
+            with metrics.stage("predict"):
+                return float(self.model.inplace_predict(self._scaled_row, validate_features=False)[0])
+
+    def predict_rows(self, X):
+        """Fused affine scaling + inplace_predict for a small batch of encoded rows, no DMatrix.
+
+        Row for row identical to the single-row fast path; used by batch_service to merge
+        concurrent single predictions into one booster call."""
+        with metrics.stage("scaler_transform"):
+            X_scaled = np.asarray(X, dtype=np.float32).reshape(-1, NUM_FEATURES) * self._scale
+            X_scaled += self._offset
+            if self._clip_range is not None:
+                np.clip(X_scaled, self._clip_range[0], self._clip_range[1], out=X_scaled)
+        with metrics.stage("predict"):
+            return self.model.inplace_predict(X_scaled, validate_features=False)
+
+    def warm_up(self):
+        """Run a dummy unit through the single-row, batch and (for xgboost) contribution paths.
+
+        First calls pay one-off allocation and thread-pool start-up inside the booster; doing
+        them here keeps that off the first real request. The LRU caches are not touched."""
+        row = encode_features(90.0, 10.0, 2025, 6, 1990, TOWNS[0], FLAT_TYPES[0], FLAT_MODELS[0])
+        self._predict_row_uncached(row)
+        self.predict_matrix(np.tile(row, (2, 1)))
+        if self.is_booster:
+            import xgboost as xgb
+            self.model.predict(xgb.DMatrix(self.scaler.transform(row.reshape(1, -1)), feature_names=self.feature_names),
+                               pred_contribs=True)
+
+    def predict_features(self, **features):
+        """Encode keyword arguments of encode_features() into the reusable row and predict."""
+        with self._row_lock:
+            encode_features(**features, out=self._raw_row)
+            return self.predict_row(self._raw_row)
+
+    def predict_sale_date_sweep(self, sale_years, lease_commencement_year, **features):
+        """Price one unit for every (sale_year, month) pair in a single batched booster call.
+
+        `features` are the remaining encode_features() arguments. Returns (years, months,
+        predictions) as flat arrays in year-major order, with remaining_lease_years
+        recomputed per row using the same clipping rule as a single prediction."""
+        base_row = encode_features(sale_year=sale_years[0], sale_month=1,
+                                   lease_commencement_year=lease_commencement_year, **features)
+        years = np.repeat(np.asarray(sale_years, dtype=np.float32), 12)
+        months = np.tile(np.arange(1, 13, dtype=np.float32), len(sale_years))
+        X = np.tile(base_row, (len(years), 1))
+        X[:, FEATURE_INDEX['sale_year']] = years
+        X[:, FEATURE_INDEX['sale_month']] = months
+        X[:, FEATURE_INDEX['remaining_lease_years']] = remaining_lease_years(years, lease_commencement_year)
+        return years.astype(int), months.astype(int), self.predict_matrix(X)
+
+    def predict_area_storey_grid(self, floor_areas, storeys, **features):
+        """Price one unit over a floor area x storey grid in a single batched booster call.
+
+        `features` are the remaining encode_features() arguments. Returns a
+        (len(storeys), len(floor_areas)) array of predictions."""
+        base_row = encode_features(floor_area_sqm=floor_areas[0], storey_avg=storeys[0], **features)
+        area_grid, storey_grid = np.meshgrid(np.asarray(floor_areas, dtype=np.float32), np.asarray(storeys, dtype=np.float32))
+        X = np.tile(base_row, (area_grid.size, 1))
+        X[:, FEATURE_INDEX['floor_area_sqm']] = area_grid.ravel()
+        X[:, FEATURE_INDEX['storey_avg']] = storey_grid.ravel()
+        return self.predict_matrix(X).reshape(area_grid.shape)
+
+    def cache_stats(self):
+        return {"model_version": self.model_version,
+                "prediction": self.prediction_cache.stats(),
+                "contribution": self.contribution_cache.stats()}
+
+    def predict_one(self, record):
+        return self.predict_row(encode_record(record, self.postal_data))
+
+    def predict_records(self, records):
+        """Price a list of dicts in one booster call.
+
+        Returns (predictions, errors); rows that fail to encode get None and an error message."""
+        X = np.zeros((len(records), NUM_FEATURES), dtype=np.float32)
+        errors = [None] * len(records)
+        for i, record in enumerate(records):
+            try:
+                X[i] = encode_record(record, self.postal_data)
+            except (ValueError, TypeError, KeyError, OverflowError) as e:
+                errors[i] = str(e)
+        valid = np.array([e is None for e in errors], dtype=bool)
+        predictions = [None] * len(records)
+        if valid.any():
+            for i, value in zip(np.flatnonzero(valid), self.predict_matrix(X[valid])):
+                predictions[i] = float(value)
+        return predictions, errors
+
+    def predict_frame(self, df, explain=False, sparse=None):
+        """Price every valid row of a DataFrame with a single scaler and booster call.
+
+        With explain=True, grouped contributions are added as contrib_* columns. sparse=True
+        scores through the CSR encoding, which uses about a quarter of the peak memory but
+        is slower in xgboost's predictor. The default (None) uses it from SPARSE_MIN_ROWS rows."""
+        with metrics.stage("validate_input"):
+            prepared, errors = prepare_bulk_frame(df, self.postal_data)
+        valid = errors == ""
+        predictions = np.full(len(prepared), np.nan)
+        contributions = np.full((len(prepared), len(CONTRIBUTION_GROUPS)), np.nan)
+        if valid.any():
+            if sparse is None:
+                sparse = valid.sum() >= SPARSE_MIN_ROWS
+            if explain or not sparse or not self.is_booster:
+                with metrics.stage("encode"):
+                    X = encode_bulk_frame(prepared.loc[valid])
+                predictions[valid] = self.predict_matrix(X)
+                if explain:
+                    contributions[valid] = self.explain_matrix(X)
+            else:
+                predictions[valid] = self.predict_sparse_frame(prepared.loc[valid])
+        result = df.copy()
+        result['predicted_price'] = np.round(predictions, 2)
+        if explain:
+            for j, group in enumerate(CONTRIBUTION_GROUPS):
+                result[f"contrib_{group.lower().replace(' ', '_')}"] = np.round(contributions[:, j], 2)
+        result['error'] = errors
+        return result
@@ -0,0 +1,197 @@
+# score_bulk.py
+"""Streaming bulk scoring for files too large for the app's upload box.
+
+Run with:  python score_bulk.py units.csv priced.parquet [--chunk-size 50000 --workers 4]
+
+The input (CSV or Parquet) is read in fixed-size chunks. Chunks are spread over a process pool
+whose workers each load the model, scaler and postal data once. They use the same
+prepare_bulk_frame / encode_bulk_frame path as the Streamlit "Bulk Scoring" expander.
+Results are written in input order as chunks complete. At most `workers * 2` chunks are in
+flight, so memory stays flat whatever the file size. Output columns match the app's download:
+the input columns plus predicted_price and error. CSV input is read as text so every chunk
+has the same schema, and the original values are written back unchanged.
+"""
+import argparse
+import os
+import resource
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import predictor
+
+DEFAULT_CHUNK_SIZE = 50_000
+IN_FLIGHT_PER_WORKER = 2
+
+_price_predictor = None  # one per worker process, set by _init_worker()
+
+
+def _init_worker(engine, threads):
+    global _price_predictor
+    _price_predictor = predictor.HDBPricePredictor.from_files(engine=engine)
+    if engine == "xgboost":
+        # One booster thread per worker by default: the pool already provides the parallelism
+        _price_predictor.model.set_param({"nthread": threads})
+
+
+def _score_chunk(df, explain, sparse):
+    return _price_predictor.predict_frame(df, explain=explain, sparse=sparse)
+
+
+def _file_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".csv", ".txt"):
+        return "csv"
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    raise ValueError(f"Unsupported file type '{ext}': use .csv or .parquet")
+
+
+def iter_chunks(path, chunk_size):
+    """Yield DataFrames of at most chunk_size rows without reading the whole file."""
+    if _file_format(path) == "csv":
+        yield from pd.read_csv(path, chunksize=chunk_size, dtype=str)
+    else:
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+
+
+class ChunkWriter:
+    """Appends result chunks to a CSV or Parquet file (one row group per chunk).
+
+    Writes go to a temporary file, private to this process, that replaces `path` on close().
+    abort() deletes it instead, so a failed or interrupted run never leaves a truncated output behind."""
+
+    def __init__(self, path):
+        self.path = path
+        self.format = _file_format(path)
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        self._handle = None
+        self._schema = None
+
+    def write(self, df):
+        if self.format == "csv":
+            header = self._handle is None
+            if header:
+                self._handle = open(self.tmp_path, "w", newline="", encoding="utf-8")
+            df.to_csv(self._handle, header=header, index=False)
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            if self._handle is None:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                # A column that is empty in the first chunk would otherwise be typed null for the whole file
+                self._schema = pa.schema([pa.field(f.name, pa.string()) if pa.types.is_null(f.type) else f
+                                          for f in table.schema])
+                table = table.cast(self._schema)
+                self._handle = pq.ParquetWriter(self.tmp_path, self._schema)
+            else:
+                table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+            self._handle.write_table(table)
+
+    def close(self):
+        """Finish the file and move it to `path`."""
+        if self._handle is None:
+            return
+        self._handle.close()
+        self._handle = None
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        """Discard everything written so far; `path` is left as it was."""
+        if self._handle is None:
+            return
+        self._handle.close()
+        self._handle = None
+        os.remove(self.tmp_path)
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    """Peak resident set size in MiB (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def score_file(input_path, output_path, chunk_size=DEFAULT_CHUNK_SIZE, workers=None, engine="xgboost",
+               threads_per_worker=1, explain=False, sparse=None):
+    """Score input_path into output_path and return a summary dict (rows, errors, rows/sec, peak RSS).
+
+    Raises ValueError for an unsupported file type or for explain with the numpy engine."""
+    if explain and engine != "xgboost":
+        raise ValueError("Feature contributions require the xgboost engine.")
+    workers = workers or os.cpu_count() or 1
+    writer = ChunkWriter(output_path)
+    n_rows = n_errors = n_chunks = 0
+    start = time.perf_counter()
+
+    def record(result):
+        nonlocal n_rows, n_errors, n_chunks
+        writer.write(result)
+        n_rows += len(result)
+        n_errors += int((result['error'] != "").sum())
+        n_chunks += 1
+
+    try:
+        if workers == 1:
+            _init_worker(engine, threads_per_worker)
+            for chunk in iter_chunks(input_path, chunk_size):
+                record(_score_chunk(chunk, explain, sparse))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(engine, threads_per_worker)) as pool:
+                pending = deque()
+                for chunk in iter_chunks(input_path, chunk_size):
+                    pending.append(pool.submit(_score_chunk, chunk, explain, sparse))
+                    if len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                        record(pending.popleft().result())
+                while pending:
+                    record(pending.popleft().result())
+    except BaseException:
+        writer.abort()
+        raise
+    writer.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "rows": n_rows,
+        "errors": n_errors,
+        "chunks": n_chunks,
+        "workers": workers,
+        "seconds": elapsed,
+        "rows_per_sec": n_rows / elapsed if elapsed > 0 else float("nan"),
+        "peak_rss_mb": peak_rss_mb(),
+        # Children are only accounted once the pool has exited, which it has by now
+        "peak_worker_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN) if workers > 1 else np.nan,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream a CSV/Parquet file of units through the price model")
+    parser.add_argument("input", help="CSV or Parquet file with the bulk scoring columns")
+    parser.add_argument("output", help="destination .csv or .parquet (written incrementally)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores)")
+    parser.add_argument("--threads-per-worker", type=int, default=1, help="booster threads in each worker")
+    parser.add_argument("--engine", choices=["xgboost", "numpy"], default="xgboost")
+    parser.add_argument("--explain", action="store_true", help="add contrib_* columns (xgboost engine only)")
+    parser.add_argument("--sparse", action="store_true", default=None,
+                        help="always use the CSR encoding (less memory, slower predict); by default only for chunks "
+                             f"of {predictor.SPARSE_MIN_ROWS:,}+ rows")
+    args = parser.parse_args()
+    if args.explain and args.engine == "numpy":
+        parser.error("--explain needs feature contributions, which only the xgboost engine provides")
+
+    try:
+        summary = score_file(args.input, args.output, args.chunk_size, args.workers, args.engine,
+                             args.threads_per_worker, args.explain, args.sparse)
+    except ValueError as e:
+        sys.exit(f"score_bulk.py: error: {e}")
+    print(f"Scored {summary['rows']:,} rows ({summary['errors']:,} with errors) in {summary['chunks']:,} chunks "
+          f"on {summary['workers']} worker(s): {summary['seconds']:.1f} s, {summary['rows_per_sec']:,.0f} rows/s")
+    worker_rss = "" if np.isnan(summary['peak_worker_rss_mb']) else f", worker {summary['peak_worker_rss_mb']:.0f} MiB"
+    print(f"Peak RSS: main {summary['peak_rss_mb']:.0f} MiB{worker_rss} -> {args.output}")
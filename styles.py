@@ -0,0 +1,189 @@
+# styles.py
+"""Light and dark colour palettes and the page stylesheet built from them.
+
+The stylesheet is about 5 KB of CSS. It is built once per theme per process and then reused by
+every session and rerun, so a rerun only looks it up.
+"""
+
+THEME_COLORS = {
+    'light': {
+        'bg': '#FFFFFF', 'text': '#000000', 'primary': '#1E88E5', 'secondary': '#0D47A1',
+        'success': '#43A047', 'info_bg': '#E3F2FD', 'info_text': '#000000',
+        'info_border': '#1E88E5', 'prediction_bg': '#E8F5E9', 'prediction_border': '#43A047',
+        'sidebar_bg': '#F0F2F6', 'sidebar_text': '#000000'
+    },
+    'dark': {
+        'bg': '#121212', 'text': '#FFFFFF', 'primary': '#90CAF9', 'secondary': '#64B5F6',
+        'success': '#81C784', 'info_bg': '#0A1929', 'info_text': '#E1E1E1',
+        'info_border': '#90CAF9', 'prediction_bg': '#0A2018', 'prediction_border': '#81C784',
+        'sidebar_bg': '#1E1E1E', 'sidebar_text': '#FFFFFF'
+    }
+}
+
+_STYLESHEETS = {}
+
+
+def stylesheet(theme):
+    """The <style> block for `theme` ('light' or 'dark'), built on first use."""
+    css = _STYLESHEETS.get(theme)
+    if css is None:
+        css = _STYLESHEETS[theme] = _build_stylesheet(theme)
+    return css
+
+
+def _build_stylesheet(theme):
+    colors = THEME_COLORS[theme]
+    return f"""
+<style>
+#MainMenu {{visibility: hidden;}}
+footer {{visibility: hidden;}}
+header {{visibility: hidden;}}
+
+.stApp {{
+    max-width: 1200px;
+    margin: 0 auto;
+    background-color: {colors['bg']};
+    color: {colors['text']};
+}}
+
+/* Sidebar Styling */
+[data-testid="stSidebar"] {{
+    background-color: {colors['sidebar_bg']};
+}}
+[data-testid="stSidebar"] [data-testid="stMarkdownContainer"] p,
+[data-testid="stSidebar"] [data-testid="stMarkdownContainer"] h3 {{ 
+    color: {colors['sidebar_text']} !important;
+}}
+[data-testid="stSidebar"] .stButton > button {{ 
+    color: {colors['sidebar_text']} !important; 
+}}
+[data-testid="stSidebar"] div[data-testid="stToggle"] span {{
+    color: {colors['sidebar_text']} !important;
+}}
+[data-testid="stSidebar"] div[data-testid="stToggle"] label {{
+    color: {colors['sidebar_text']} !important;
+}}
+
+@media (max-width: 768px) {{
+    .stApp {{ padding: 10px; }}
+    .main-header {{ font-size: 24px !important; }}
+    .sub-header {{ font-size: 18px !important; }}
+}}
+.main-header {{ color: {colors['primary']}; font-size: 36px; font-weight: 700; }}
+.sub-header {{ color: {colors['secondary']}; font-size: 22px; font-weight: 600; }}
+.info-box {{
+    background-color: {colors['info_bg']}; color: {colors['info_text']};
+    padding: 15px; border-radius: 10px; border-left: 5px solid {colors['info_border']};
+    margin-bottom: 20px;
+}}
+.prediction-card {{
+    background-color: {colors['prediction_bg']}; padding: 20px; border-radius: 10px;
+    text-align: center; margin: 20px 0; border-left: 5px solid {colors['prediction_border']};
+    box-shadow: 0 4px 6px rgba(0,0,0,0.1); color: {colors['text']};
+}}
+.stMarkdown, body {{ color: {colors['text']} !important; }}
+
+/* Labels for input widgets */
+.stTextInput label, 
+.stNumberInput label, 
+.stSelectbox label, 
+.stDateInput label,
+.stTimeInput label,
+.stMultiSelect label,
+.stTextArea label,
+.stRadio label,
+.stCheckbox label {{
+    color: {colors['text']} !important;
+}}
+div[data-testid="stCheckbox"] label div[data-testid="stMarkdownContainer"] p {{
+    color: {colors['text']} !important;
+}}
+
+.stTextInput div[data-baseweb="input"] > input,
+.stNumberInput div[data-baseweb="input"] > input,
+.stTextArea div[data-baseweb="input"] > textarea {{
+    color: {colors['text']} !important;
+    background-color: {colors['bg']} !important; 
+    border: 1px solid {colors['secondary']} !important; 
+}}
+.stSelectbox div[data-baseweb="select"] > div,
+.stMultiSelect div[data-baseweb="select"] > div {{
+    color: {colors['text']} !important;
+    background-color: {colors['bg']} !important;
+    border: 1px solid {colors['secondary']} !important;
+}}
+div[data-baseweb="popover"] ul li {{
+    background-color: {colors['bg']} !important;
+    color: {colors['text']} !important;
+}}
+div[data-baseweb="popover"] ul li:hover {{
+    background-color: {colors['secondary']} !important;
+    color: {'#FFFFFF' if theme == 'dark' else '#000000'} !important;
+}}
+.stButton > button {{
+    color: {'#FFFFFF' if colors['primary'] not in ['#FFFFFF', '#E1E1E1', '#f0f2f6'] else '#000000'} !important; 
+    background-color: {colors['primary']} !important;
+    border: 1px solid {colors['primary']} !important;
+}}
+.stButton > button:hover {{
+    background-color: {colors['secondary']} !important;
+    border: 1px solid {colors['secondary']} !important;
+}}
+.stButton > button:focus {{
+    box-shadow: 0 0 0 0.2rem {colors['primary']}40 !important;
+}}
+div[data-testid="stOptionMenu"] button {{
+    color: {colors['text']} !important; 
+    border-bottom: 2px solid transparent; 
+    border-radius: 0 !important; 
+    margin-right: 2px; 
+    padding: 10px 15px;
+}}
+div[data-testid="stOptionMenu"] button:hover {{
+    color: {colors['primary']} !important; 
+    background-color: transparent !important; 
+}}
+div[data-testid="stOptionMenu"] button[aria-selected="true"] {{
+    color: {colors['primary']} !important; 
+    border-bottom-color: {colors['primary']} !important; 
+    font-weight: bold;
+}}
+@media (max-width: 768px) {{
+    .stApp {{ padding: 10px; }}
+    .main-header {{ font-size: 24px !important; }}
+    .sub-header {{ font-size: 18px !important; }}
+    .mobile-return-button-container {{
+        position: fixed; bottom: 20px; right: 20px; z-index: 10000;
+    }}
+    .mobile-return-button-container div[data-testid="stButton"] > button {{
+        border-radius: 50%; width: 50px; height: 50px; padding: 0; font-size: 22px; 
+        line-height: 50px; text-align: center; 
+        background-color: {colors['primary']} !important; color: white !important; 
+        border: none; box-shadow: 0 4px 8px rgba(0,0,0,0.2);
+    }}
+    .mobile-return-button-container div[data-testid="stButton"] > button:hover {{
+        background-color: {colors['secondary']} !important;
+    }}
+    div[data-testid="stOptionMenu"] {{
+        display: flex !important;
+        flex-wrap: wrap !important; 
+        justify-content: space-around !important; 
+        width: 100% !important;
+        padding-bottom: 5px;
+    }}
+    div[data-testid="stOptionMenu"] button {{
+        font-size: 0.8rem !important;
+        padding: 8px 5px !important;
+        margin: 2px !important; 
+        flex-grow: 1;
+        flex-basis: auto;
+        min-width: calc(25% - 10px);
+        text-align: center;
+        line-height: 1.2;
+    }}
+}}
+@media (min-width: 769px) {{
+    .mobile-return-button-container {{ display: none; }}
+}}
+</style>
+"""
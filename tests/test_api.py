@@ -0,0 +1,98 @@
+# tests/test_api.py
+"""api.py against a stand-in model: SIGTERM (what `docker stop` sends) must leave the audit log
+complete and readable, and bad inputs must get an error response, never a dropped connection."""
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+from load_test import prepare_app_dir
+
+RECORD = {"floor_area_sqm": 90, "storey_avg": 10, "sale_year": 2025, "sale_month": 6,
+          "flat_type": "4 ROOM", "flat_model": "IMPROVED", "town": "TAMPINES", "lease_commence_date": 1990}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def post(port, body, with_body=False):
+    request = urllib.request.Request(f"http://127.0.0.1:{port}/predict", json.dumps(body).encode(),
+                                     {"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            status, content = response.status, response.read()
+    except urllib.error.HTTPError as e:
+        status, content = e.code, e.read()
+    return (status, json.loads(content)) if with_body else status
+
+
+def start_api(tmp_path):
+    """(process, port, audit directory) of an api.py serving a stand-in model from tmp_path."""
+    app_dir, audit_dir = tmp_path / "app", tmp_path / "audit"
+    app_dir.mkdir()
+    prepare_app_dir(str(app_dir), n_trees=10)
+    port = free_port()
+    server = subprocess.Popen([sys.executable, "api.py", "--port", str(port)], cwd=app_dir,
+                              env={**os.environ, "HDB_AUDIT_DIR": str(audit_dir)},
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while True:
+        if server.poll() is not None or time.monotonic() > deadline:
+            server.kill()
+            raise AssertionError("api.py did not start")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1).close()
+            return server, port, audit_dir
+        except OSError:
+            time.sleep(0.2)
+
+
+def test_sigterm_flushes_audit_log(tmp_path):
+    server, port, audit_dir = start_api(tmp_path)
+    try:
+        assert post(port, RECORD) == 200
+        assert post(port, {"instances": [RECORD, dict(RECORD, floor_area_sqm=70)]}) == 200
+        assert post(port, {"floor_area_sqm": 90}) == 422
+        server.send_signal(signal.SIGTERM)
+        assert server.wait(timeout=30) == 0
+    finally:
+        if server.poll() is None:
+            server.kill()
+
+    names = os.listdir(audit_dir)
+    assert not [name for name in names if name.endswith(".part")]
+    df = pd.read_parquet(audit_dir)
+    assert len(df) == 4
+    assert df["error"].notna().sum() == 1
+    assert sorted(df["batch_size"]) == [1, 1, 2, 2]
+
+
+def test_values_that_overflow_float32_are_rejected_per_row(tmp_path):
+    server, port, audit_dir = start_api(tmp_path)
+    try:
+        status, body = post(port, dict(RECORD, floor_area_sqm=1e39), with_body=True)
+        assert status == 422 and "floor_area_sqm" in body["error"]
+        status, body = post(port, {"instances": [RECORD, dict(RECORD, floor_area_sqm=1e39)]}, with_body=True)
+        assert status == 200
+        assert body["predictions"][0]["error"] is None
+        assert body["predictions"][1]["predicted_price"] is None and "floor_area_sqm" in body["predictions"][1]["error"]
+        server.send_signal(signal.SIGTERM)
+        assert server.wait(timeout=30) == 0
+    finally:
+        if server.poll() is None:
+            server.kill()
+
+    df = pd.read_parquet(audit_dir)
+    assert len(df) == 3 and df["error"].notna().sum() == 2
@@ -0,0 +1,71 @@
+# tests/test_predictor.py
+"""Bulk validation and encoding in predictor.py."""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+import predictor
+
+ROW = {"floor_area_sqm": "90", "storey_avg": "10", "sale_year": "2025", "sale_month": "6",
+       "flat_type": "4 ROOM", "flat_model": "IMPROVED", "town": "TAMPINES", "lease_commence_date": "1990"}
+
+
+def test_prepare_bulk_frame_flags_bad_numbers_per_row():
+    rows = [ROW,
+            dict(ROW, floor_area_sqm="inf"),
+            dict(ROW, storey_avg="-inf"),
+            dict(ROW, floor_area_sqm="1e39"),
+            dict(ROW, sale_year="2025.5"),
+            dict(ROW, lease_commence_date="1990.5"),
+            dict(ROW, sale_month="6.5"),
+            dict(ROW, sale_year="2025.0")]
+    prepared, errors = predictor.prepare_bulk_frame(pd.DataFrame(rows))
+    assert list(errors) == ["",
+                            "floor_area_sqm must be a finite number",
+                            "storey_avg must be a finite number",
+                            "floor_area_sqm must be a finite number",
+                            "sale_year must be a whole number",
+                            "lease_commence_date must be a whole number",
+                            "sale_month must be a whole number between 1 and 12",
+                            ""]
+    # Rows that passed encode to finite float32 values
+    assert np.isfinite(predictor.encode_bulk_frame(prepared[errors == ""])).all()
+
+
+def random_units(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "floor_area_sqm": rng.uniform(35, 160, n).round(1),
+        "storey_avg": rng.choice([2, 5, 8, 11, 14, 20, 29], n),
+        "sale_year": rng.integers(2017, 2027, n),
+        "sale_month": rng.integers(1, 13, n),
+        "flat_type": rng.choice(predictor.FLAT_TYPES, n),
+        "flat_model": rng.choice(predictor.FLAT_MODELS, n),
+        "town": rng.choice(predictor.TOWNS, n),
+        "lease_commence_date": rng.integers(1966, 2020, n),
+    })
+
+
+def test_sparse_encoding_predicts_like_dense():
+    import xgboost as xgb
+    scaler = predictor.load_scaler()
+    # Trained on encoded units so the trees split on one-hot columns, whose absent CSR entries
+    # take the split's default direction unless sparse_safe_booster() reroutes them
+    prepared, _ = predictor.prepare_bulk_frame(random_units(3000, seed=0))
+    X = scaler.transform(predictor.encode_bulk_frame(prepared)).astype(np.float32)
+    y = X @ np.random.default_rng(1).normal(0, 50_000, predictor.NUM_FEATURES) + 500_000
+    booster = xgb.train({"max_depth": 6, "eta": 0.3, "nthread": 1},
+                        xgb.DMatrix(X, label=y, feature_names=predictor.FEATURE_NAMES), 40)
+    price_predictor = predictor.HDBPricePredictor(booster, scaler)
+
+    units = random_units(500, seed=2)
+    units["floor_area_sqm"] = units["floor_area_sqm"].astype(object)
+    units.loc[3, "floor_area_sqm"] = "inf"  # invalid rows are skipped the same way by both paths
+    dense = price_predictor.predict_frame(units, sparse=False)
+    sparse = price_predictor.predict_frame(units, sparse=True)
+    np.testing.assert_array_equal(sparse["predicted_price"].to_numpy(), dense["predicted_price"].to_numpy())
+    assert (dense["error"] == "").sum() == 499
@@ -0,0 +1,64 @@
+# tests/test_tree_engine.py
+"""The NumPy tree engine must predict exactly what the booster predicts, and refuse stale exports."""
+import os
+import shutil
+import sys
+
+import numpy as np
+import pytest
+import xgboost as xgb
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+import predictor
+import tree_engine
+
+# xgboost notes that a .bst name is saved as UBJSON, which load_model reads
+pytestmark = pytest.mark.filterwarnings("ignore:.*UBJSON format")
+
+
+def train_booster(seed=0, n_trees=30, max_depth=5):
+    """A small regression booster; a tenth of the training values are missing so default_left is learned."""
+    rng = np.random.default_rng(seed)
+    X = rng.random((2000, predictor.NUM_FEATURES)).astype(np.float32)
+    y = 300_000 + 200_000 * X[:, 0] + 50_000 * X[:, 2] + rng.normal(0, 10_000, len(X))
+    X[rng.random(X.shape) < 0.1] = np.nan
+    return xgb.train({"max_depth": max_depth, "eta": 0.3, "nthread": 1},
+                     xgb.DMatrix(X, label=y, feature_names=predictor.FEATURE_NAMES), n_trees)
+
+
+def test_predictions_match_booster_including_missing_values():
+    booster = train_booster()
+    ensemble = tree_engine.TreeEnsemble(tree_engine.export_booster(booster))
+    rng = np.random.default_rng(1)
+    X = rng.random((3000, predictor.NUM_FEATURES)).astype(np.float32)
+    X[rng.random(X.shape) < 0.2] = np.nan
+    X[:10] = np.nan  # rows with every feature missing follow default_left all the way down
+    np.testing.assert_array_equal(ensemble.predict(X), booster.inplace_predict(X))
+
+
+def test_stale_export_is_refused(tmp_path):
+    model_path, scaler_path, tree_path = (str(tmp_path / name) for name in ("model.bst", "scaler.joblib", "model_trees.npz"))
+    train_booster(seed=0).save_model(model_path)
+    shutil.copy2(predictor.SCALER_PATH, scaler_path)
+    tree_engine.export_model(model_path, scaler_path, tree_path)
+    ensemble = tree_engine.TreeEnsemble.load(tree_path)
+    assert ensemble.source_model == predictor.model_fingerprint(model_path)
+    predictor.check_tree_export(ensemble, tree_path, model_path, scaler_path)
+
+    train_booster(seed=1).save_model(model_path)  # retrained without re-exporting
+    with pytest.raises(ValueError, match="model.bst"):
+        predictor.check_tree_export(ensemble, tree_path, model_path, scaler_path)
+    # Only the .npz shipped: nothing to compare against
+    os.remove(model_path)
+    os.remove(scaler_path)
+    predictor.check_tree_export(ensemble, tree_path, model_path, scaler_path)
+
+
+def test_export_without_source_hashes_is_refused(tmp_path):
+    model_path = str(tmp_path / "model.bst")
+    booster = train_booster()
+    booster.save_model(model_path)
+    ensemble = tree_engine.TreeEnsemble(tree_engine.export_booster(booster))  # no source_model entry
+    with pytest.raises(ValueError):
+        predictor.check_tree_export(ensemble, "model_trees.npz", model_path, str(tmp_path / "no_scaler.joblib"))
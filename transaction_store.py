@@ -0,0 +1,250 @@
+# transaction_store.py
+"""Local, memory-mapped store of HDB resale transactions keyed by postal code.
+
+Build (run once per data refresh, e.g. at image build time):
+    python transaction_store.py resale_transactions.csv
+
+The input is a CSV or Parquet file of resale transactions in the data.gov.sg layout with a
+postal code per row. Required columns: postal, month ("2024-06"), flat_type, flat_model,
+floor_area_sqm, resale_price, and storey_range ("07 TO 09") or storey_avg. Optional latitude
+and longitude columns give each postal code a map position. Rows whose postal code is not in
+postal_data.json are dropped.
+
+File layout (little-endian, every section 4-byte aligned):
+  8 bytes      magic b"HDBTXN01"
+  uint32       number of postal codes (n): the codes of postal_data.json, same order as postal_index.bin
+  uint32       number of transactions (m)
+  uint32       byte length of the flat type table
+  uint32       byte length of the flat model table
+  bytes        flat type table, then flat model table (newline-separated UTF-8, each zero-padded to 4 bytes)
+  int32[n]     postal codes, sorted ascending
+  uint32[n+1]  row offsets: the transactions of postal[i] are rows offsets[i]:offsets[i+1]
+  float32[n]   latitude, then float32[n] longitude (NaN when unknown)
+  float32[m]   resale price, then float32[m] floor area (sqm)
+  uint16[m]    sale month as year * 12 + month - 1, zero-padded to 4 bytes
+  uint8[m]     storey range low, then storey range high, flat type code and flat model code
+
+Rows are grouped by postal code and ordered newest first inside each group. The latest N
+transactions of a postal code are therefore the first N rows of its slice: one binary search
+over the n postal codes and a zero-copy slice, however many transactions the store holds.
+"""
+import argparse
+import bisect
+import json
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from postal_index import POSTAL_DATA_PATH, _columns_from_postal_data, _pad4
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TRANSACTION_STORE_PATH = os.path.join(BASE_DIR, "transactions.bin")
+DEFAULT_LATEST = 20
+
+MAGIC = b"HDBTXN01"
+HEADER = struct.Struct("<8sIIII")
+REQUIRED_COLUMNS = ['postal', 'month', 'flat_type', 'flat_model', 'floor_area_sqm', 'resale_price']
+
+
+def _read_table(path):
+    import pandas as pd
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".parquet", ".pq"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path, dtype={'postal': str})
+
+
+def _transaction_columns(df, postal_codes):
+    """Validated, grouped and sorted row columns plus per-postal offsets and positions."""
+    import pandas as pd
+
+    df = df.rename(columns=lambda c: str(c).strip().lower())
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if 'storey_range' not in df.columns and 'storey_avg' not in df.columns:
+        missing.append('storey_range or storey_avg')
+    if missing:
+        raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+
+    postal = pd.to_numeric(df['postal'].astype(str).str.strip().str.replace(r"\.0$", "", regex=True), errors='coerce')
+    month = pd.to_datetime(df['month'].astype(str).str.strip().str[:7], format="%Y-%m", errors='coerce')
+    if 'storey_range' in df.columns:
+        storeys = df['storey_range'].astype(str).str.upper().str.split(" TO ", n=1, expand=True).reindex(columns=[0, 1])
+        storey_low, storey_high = (pd.to_numeric(storeys[j], errors='coerce') for j in (0, 1))
+    else:
+        storey_low = storey_high = pd.to_numeric(df['storey_avg'], errors='coerce').round()
+    price = pd.to_numeric(df['resale_price'], errors='coerce')
+    area = pd.to_numeric(df['floor_area_sqm'], errors='coerce')
+    flat_type = df['flat_type'].astype(str).str.strip().str.upper()
+    flat_model = df['flat_model'].astype(str).str.strip().str.upper()
+
+    code = postal.fillna(-1).to_numpy(dtype=np.int64)
+    position = np.searchsorted(postal_codes, code).clip(0, len(postal_codes) - 1)
+    valid = ((postal_codes[position] == code) & month.notna().to_numpy() & price.notna().to_numpy()
+             & area.notna().to_numpy() & storey_low.notna().to_numpy() & storey_high.notna().to_numpy())
+
+    month_index = (month.dt.year * 12 + month.dt.month - 1).to_numpy()[valid].astype(np.int64)
+    position = position[valid]
+    order = np.lexsort((-month_index, position))  # by postal code, newest first within each
+    position = position[order]
+    flat_types, flat_type_code = np.unique(flat_type.to_numpy()[valid][order], return_inverse=True)
+    flat_models, flat_model_code = np.unique(flat_model.to_numpy()[valid][order], return_inverse=True)
+    if max(len(flat_types), len(flat_models)) > 255:
+        raise ValueError("Too many distinct flat types or models for a uint8 code.")
+
+    columns = {
+        "resale_price": price.to_numpy(dtype=np.float64)[valid][order].astype('<f4'),
+        "floor_area_sqm": area.to_numpy(dtype=np.float64)[valid][order].astype('<f4'),
+        "month": month_index[order].astype('<u2'),
+        "storey_low": storey_low.to_numpy(dtype=np.float64)[valid][order].astype('u1'),
+        "storey_high": storey_high.to_numpy(dtype=np.float64)[valid][order].astype('u1'),
+        "flat_type": flat_type_code.astype('u1'),
+        "flat_model": flat_model_code.astype('u1'),
+    }
+    offsets = np.searchsorted(position, np.arange(len(postal_codes) + 1)).astype('<u4')
+
+    latitude = np.full(len(postal_codes), np.nan, dtype='<f4')
+    longitude = np.full(len(postal_codes), np.nan, dtype='<f4')
+    if 'latitude' in df.columns and 'longitude' in df.columns:
+        coords = pd.DataFrame({
+            'position': position,
+            'latitude': pd.to_numeric(df['latitude'], errors='coerce').to_numpy()[valid][order],
+            'longitude': pd.to_numeric(df['longitude'], errors='coerce').to_numpy()[valid][order],
+        }).groupby('position').median()
+        latitude[coords.index] = coords['latitude']
+        longitude[coords.index] = coords['longitude']
+    return columns, offsets, latitude, longitude, list(flat_types), list(flat_models), int((~valid).sum())
+
+
+def build_transaction_store(input_path, out_path=TRANSACTION_STORE_PATH, postal_data_path=POSTAL_DATA_PATH):
+    """Compile a transactions file into the store. Returns (out_path, number of dropped rows)."""
+    with open(postal_data_path, 'r') as f:
+        postal_codes = _columns_from_postal_data(json.load(f))[0]
+    columns, offsets, latitude, longitude, flat_types, flat_models, dropped = _transaction_columns(
+        _read_table(input_path), postal_codes.astype(np.int64))
+
+    type_table = "\n".join(flat_types).encode("utf-8")
+    model_table = "\n".join(flat_models).encode("utf-8")
+    n_rows = len(columns["resale_price"])
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(postal_codes), n_rows, len(type_table), len(model_table)))
+        f.write(type_table + b"\0" * _pad4(len(type_table)))
+        f.write(model_table + b"\0" * _pad4(len(model_table)))
+        for array in (postal_codes, offsets, latitude, longitude, columns["resale_price"], columns["floor_area_sqm"]):
+            f.write(array.tobytes())
+        f.write(columns["month"].tobytes() + b"\0" * _pad4(2 * n_rows))
+        for name in ("storey_low", "storey_high", "flat_type", "flat_model"):
+            f.write(columns[name].tobytes())
+    os.replace(tmp_path, out_path)
+    return out_path, dropped
+
+
+class TransactionStore:
+    """Read-only, memory-mapped resale transactions grouped by postal code, newest first."""
+
+    def __init__(self, postal, offsets, latitude, longitude, columns, flat_types, flat_models, buffer=None):
+        self.postal = postal
+        self.offsets = offsets
+        self.latitude = latitude
+        self.longitude = longitude
+        self.columns = columns
+        self.flat_types = flat_types
+        self.flat_models = flat_models
+        self._buffer = buffer  # keeps the mmap alive for the frombuffer views
+        self._postal_view = memoryview(self.postal)
+        self._offset_view = memoryview(self.offsets)
+
+    @classmethod
+    def open(cls, path=TRANSACTION_STORE_PATH):
+        with open(path, 'rb') as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n, m, type_len, model_len = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a transaction store file.")
+        offset = HEADER.size
+        tables = []
+        for length in (type_len, model_len):
+            tables.append(bytes(buffer[offset:offset + length]).decode("utf-8").split("\n") if length else [])
+            offset += length + _pad4(length)
+
+        def take(dtype, count):
+            nonlocal offset
+            array = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+            offset += array.nbytes
+            return array
+
+        postal, offsets = take('<i4', n), take('<u4', n + 1)
+        latitude, longitude = take('<f4', n), take('<f4', n)
+        columns = {"resale_price": take('<f4', m), "floor_area_sqm": take('<f4', m), "month": take('<u2', m)}
+        offset += _pad4(2 * m)
+        for name in ("storey_low", "storey_high", "flat_type", "flat_model"):
+            columns[name] = take('u1', m)
+        return cls(postal, offsets, latitude, longitude, columns, tables[0], tables[1], buffer)
+
+    def _position(self, postal_code):
+        if not isinstance(postal_code, str) or len(postal_code) != 6 or not postal_code.isdigit():
+            return -1
+        code = int(postal_code)
+        i = bisect.bisect_left(self._postal_view, code)
+        return i if i < len(self._postal_view) and self._postal_view[i] == code else -1
+
+    def count(self, postal_code):
+        """Number of transactions recorded for a postal code (0 if unknown)."""
+        i = self._position(postal_code)
+        return 0 if i < 0 else self._offset_view[i + 1] - self._offset_view[i]
+
+    def latest(self, postal_code, n=DEFAULT_LATEST):
+        """{column: array view} of the newest n transactions of a postal code, newest first."""
+        i = self._position(postal_code)
+        start, end = (0, 0) if i < 0 else (self._offset_view[i], self._offset_view[i + 1])
+        rows = slice(start, min(end, start + n))
+        return {name: column[rows] for name, column in self.columns.items()}
+
+    def latest_records(self, postal_code, n=DEFAULT_LATEST):
+        """The newest n transactions of a postal code as display-ready dicts."""
+        rows = self.latest(postal_code, n)
+        return [
+            {"month": f"{month // 12}-{month % 12 + 1:02d}", "flat_type": self.flat_types[flat_type],
+             "flat_model": self.flat_models[flat_model], "storey_range": f"{low:02d} TO {high:02d}",
+             "floor_area_sqm": float(area), "resale_price": float(price)}
+            for month, flat_type, flat_model, low, high, area, price in zip(
+                rows["month"].tolist(), rows["flat_type"].tolist(), rows["flat_model"].tolist(),
+                rows["storey_low"].tolist(), rows["storey_high"].tolist(),
+                rows["floor_area_sqm"].tolist(), rows["resale_price"].tolist())
+        ]
+
+    def recent_median_prices(self, n=DEFAULT_LATEST):
+        """float64[len(postal)] median resale price of each postal code's newest n transactions (NaN if none)."""
+        prices = self.columns["resale_price"]
+        offsets = self.offsets.astype(np.int64)
+        medians = np.full(len(self.postal), np.nan)
+        for i in np.flatnonzero(np.diff(offsets) > 0):
+            medians[i] = np.median(prices[offsets[i]:min(offsets[i + 1], offsets[i] + n)])
+        return medians
+
+    def location(self, postal_code):
+        """(latitude, longitude) of a postal code, or None when unknown."""
+        i = self._position(postal_code)
+        if i < 0 or np.isnan(self.latitude[i]):
+            return None
+        return float(self.latitude[i]), float(self.longitude[i])
+
+    def __len__(self):
+        return len(self.columns["resale_price"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile resale transactions into a memory-mapped store keyed by postal code")
+    parser.add_argument("input", help="CSV or Parquet file of resale transactions with a postal column")
+    parser.add_argument("--postal-data", default=POSTAL_DATA_PATH)
+    parser.add_argument("--output", default=TRANSACTION_STORE_PATH)
+    args = parser.parse_args()
+    path, dropped = build_transaction_store(args.input, args.output, args.postal_data)
+    store = TransactionStore.open(path)
+    located = int(np.isfinite(store.latitude).sum())
+    print(f"Wrote {len(store):,} transactions for {int((np.diff(store.offsets) > 0).sum()):,} of {len(store.postal):,} "
+          f"postal codes ({located:,} with coordinates) to {path} ({os.path.getsize(path):,} bytes); "
+          f"dropped {dropped:,} row(s)")
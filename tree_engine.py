@@ -0,0 +1,215 @@
+# tree_engine.py
+"""Pure-NumPy inference engine for the XGBoost model.
+
+`python tree_engine.py` exports model.bst and scaler.joblib into model_trees.npz:
+flat node tables for every tree plus the scaler's per-column affine transform, and the
+content hashes of both source files so a stale export is refused at load time.
+Loading and predicting from that file needs only NumPy. xgboost, sklearn and joblib
+are imported by the export step alone, so slim containers can serve predictions
+without them.
+
+Every tree is stored as a complete binary tree of the ensemble's depth D: split
+features and thresholds in level order, shape (n_trees, 2**D - 1), and leaf values
+of shape (n_trees, 2**D). A leaf shallower than D is copied into every slot beneath it.
+Trees are then evaluated level by level for all rows and all trees at once. At each level,
+every (tree, row) pair gathers its node's feature and threshold, and its position
+becomes 2 * position + went_right, so no child pointers are stored. Leaf values are summed
+in float32, base score first and tree by tree, which is the same order as xgboost.
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_LOCAL_PATH = os.path.join(BASE_DIR, "model.bst")
+SCALER_PATH = os.path.join(BASE_DIR, "scaler.joblib")
+TREE_MODEL_PATH = os.path.join(BASE_DIR, "model_trees.npz")
+
+# Objectives whose prediction is base_score + sum of leaves (identity link)
+IDENTITY_OBJECTIVES = {"reg:squarederror", "reg:squaredlogerror", "reg:absoluteerror", "reg:pseudohubererror",
+                       "reg:quantileerror", "reg:linear"}
+MAX_DEPTH = 12  # complete-tree layout stores 2**depth leaves per tree
+ROW_CHUNK = 1024
+
+
+def export_booster(booster):
+    """Flatten an xgboost.Booster into complete-tree tables (dict of NumPy arrays)."""
+    model = json.loads(booster.save_raw("json"))
+    learner = model["learner"]
+    objective = learner["objective"]["name"]
+    if objective not in IDENTITY_OBJECTIVES:
+        raise ValueError(f"Objective '{objective}' is not supported by the NumPy engine.")
+    booster_model = learner["gradient_booster"]
+    if booster_model["name"] != "gbtree":
+        raise ValueError(f"Booster '{booster_model['name']}' is not supported by the NumPy engine.")
+    if int(learner["learner_model_param"].get("num_target", "1")) > 1 or int(learner["learner_model_param"]["num_class"]) > 1:
+        raise ValueError("Multi-output models are not supported by the NumPy engine.")
+
+    trees = booster_model["model"]["trees"]
+    for tree in trees:
+        if any(t != 0 for t in tree.get("split_type", [])):
+            raise ValueError("Categorical splits are not supported by the NumPy engine.")
+    depth = max((_tree_depth(tree["left_children"], tree["right_children"]) for tree in trees), default=0)
+    if depth > MAX_DEPTH:
+        raise ValueError(f"Tree depth {depth} exceeds the NumPy engine limit of {MAX_DEPTH}.")
+
+    n_internal, n_leaves = 2 ** depth - 1, 2 ** depth
+    feature = np.zeros((len(trees), n_internal), dtype=np.int32)
+    threshold = np.full((len(trees), n_internal), np.inf, dtype=np.float32)
+    default_left = np.ones((len(trees), n_internal), dtype=bool)
+    leaf_value = np.zeros((len(trees), n_leaves), dtype=np.float32)
+    for t, tree in enumerate(trees):
+        left, right = tree["left_children"], tree["right_children"]
+        conditions = np.asarray(tree["split_conditions"], dtype=np.float32)
+        stack = [(0, 0, 0)]  # (xgboost node id, level, position within level)
+        while stack:
+            node, level, position = stack.pop()
+            if left[node] == -1:
+                span = 2 ** (depth - level)
+                leaf_value[t, position * span:(position + 1) * span] = conditions[node]
+                continue
+            slot = 2 ** level - 1 + position
+            feature[t, slot] = tree["split_indices"][node]
+            threshold[t, slot] = conditions[node]
+            default_left[t, slot] = bool(tree["default_left"][node])
+            stack.append((left[node], level + 1, 2 * position))
+            stack.append((right[node], level + 1, 2 * position + 1))
+
+    return {
+        "feature": feature,
+        "threshold": threshold,
+        "default_left": default_left,
+        "leaf_value": leaf_value,
+        "depth": np.int32(depth),
+        "base_score": np.float32(float(learner["learner_model_param"]["base_score"])),
+        "num_features": np.int32(int(learner["learner_model_param"]["num_feature"])),
+    }
+
+
+def _tree_depth(left, right):
+    depth, frontier = 0, [0]
+    while True:
+        children = [c for node in frontier for c in (left[node], right[node]) if c != -1]
+        if not children:
+            return depth
+        depth += 1
+        frontier = children
+
+
+def export_model(model_path=MODEL_LOCAL_PATH, scaler_path=SCALER_PATH, out_path=TREE_MODEL_PATH):
+    import joblib
+    import xgboost as xgb
+    from predictor import model_fingerprint, scaler_affine
+
+    booster = xgb.Booster()
+    booster.load_model(model_path)
+    tables = export_booster(booster)
+    scale, offset, clip_range = scaler_affine(joblib.load(scaler_path))
+    tables["scale"], tables["offset"] = scale, offset
+    tables["clip_range"] = np.asarray(clip_range if clip_range is not None else (-np.inf, np.inf), dtype=np.float32)
+    # Content hashes of the source files, so loaders can refuse tables exported from an older model
+    tables["source_model"] = np.asarray(model_fingerprint(model_path))
+    tables["source_scaler"] = np.asarray(model_fingerprint(scaler_path))
+    tmp_path = out_path + ".tmp.npz"
+    np.savez(tmp_path, **tables)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+class AffineScaler:
+    """Stand-in for the fitted MinMaxScaler: transform(X) = X * scale_ + min_, clipped to
+    feature_range when clip is set. Uses the same attribute names so scaler_affine() reads it."""
+
+    def __init__(self, scale, offset, clip_range=None):
+        self.scale_ = scale
+        self.min_ = offset
+        self.clip = clip_range is not None
+        self.feature_range = clip_range
+
+    def transform(self, X):
+        X_scaled = np.asarray(X, dtype=np.float32) * self.scale_ + self.min_
+        if self.clip:
+            np.clip(X_scaled, self.feature_range[0], self.feature_range[1], out=X_scaled)
+        return X_scaled
+
+
+class TreeEnsemble:
+    """Array-backed tree ensemble exposing the subset of xgboost.Booster used by predictor.py."""
+
+    def __init__(self, tables):
+        self.depth = int(tables["depth"])
+        self.n_trees = tables["leaf_value"].shape[0]
+        # Flattened so one gather per level serves every tree
+        self.feature = np.ascontiguousarray(tables["feature"]).ravel()
+        self.threshold = np.ascontiguousarray(tables["threshold"]).ravel()
+        self.default_left = np.ascontiguousarray(tables["default_left"]).ravel()
+        self.leaf_value = np.ascontiguousarray(tables["leaf_value"]).ravel()
+        self.base_score = np.float32(tables["base_score"])
+        self._num_features = int(tables["num_features"])
+        self._tree_internal_offset = (np.arange(self.n_trees, dtype=np.int64) * (2 ** self.depth - 1))[:, None]
+        self._tree_leaf_offset = (np.arange(self.n_trees, dtype=np.int64) * 2 ** self.depth)[:, None]
+        self.scaler = None
+        if "scale" in tables:
+            clip_range = tables["clip_range"]
+            clip_range = None if np.isinf(clip_range).all() else tuple(clip_range.tolist())
+            self.scaler = AffineScaler(tables["scale"], tables["offset"], clip_range)
+        # model_fingerprint() of the model.bst and scaler.joblib exported from (None in older exports)
+        self.source_model = str(tables["source_model"]) if "source_model" in tables else None
+        self.source_scaler = str(tables["source_scaler"]) if "source_scaler" in tables else None
+
+    @classmethod
+    def load(cls, path=TREE_MODEL_PATH):
+        with np.load(path) as data:
+            return cls({key: data[key] for key in data.files})
+
+    @classmethod
+    def from_booster(cls, booster):
+        return cls(export_booster(booster))
+
+    def num_features(self):
+        return self._num_features
+
+    def predict(self, X):
+        """Predictions for already-scaled rows X, shape (n, num_features)."""
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self._num_features)
+        out = np.empty(X.shape[0], dtype=np.float32)
+        for start in range(0, X.shape[0], ROW_CHUNK):
+            out[start:start + ROW_CHUNK] = self._predict_chunk(X[start:start + ROW_CHUNK])
+        return out
+
+    def inplace_predict(self, X, validate_features=False):
+        return self.predict(X)
+
+    def _predict_chunk(self, X):
+        n = X.shape[0]
+        X_by_feature = np.ascontiguousarray(X.T).ravel()  # feature-major: X_by_feature[f * n + row]
+        rows = np.arange(n, dtype=np.int64)
+        has_missing = bool(np.isnan(X_by_feature).any())
+        position = np.zeros((self.n_trees, n), dtype=np.int64)
+        for level in range(self.depth):
+            slot = self._tree_internal_offset + (2 ** level - 1) + position
+            x = X_by_feature[self.feature[slot] * n + rows]
+            go_right = ~(x < self.threshold[slot])
+            if has_missing:
+                missing = np.isnan(x)
+                go_right[missing] = ~self.default_left[slot][missing]
+            position = 2 * position + go_right
+        leaves = np.empty((self.n_trees + 1, n), dtype=np.float32)
+        leaves[0] = self.base_score
+        leaves[1:] = self.leaf_value[self._tree_leaf_offset + position]
+        # cumsum runs sequentially in float32: base score first, tree by tree, like xgboost
+        return np.cumsum(leaves, axis=0, dtype=np.float32)[-1]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export model.bst + scaler.joblib into NumPy tree tables")
+    parser.add_argument("--model", default=MODEL_LOCAL_PATH)
+    parser.add_argument("--scaler", default=SCALER_PATH)
+    parser.add_argument("--output", default=TREE_MODEL_PATH)
+    args = parser.parse_args()
+    path = export_model(args.model, args.scaler, args.output)
+    ensemble = TreeEnsemble.load(path)
+    print(f"Wrote {ensemble.n_trees} trees of depth {ensemble.depth} "
+          f"to {path} ({os.path.getsize(path):,} bytes)")